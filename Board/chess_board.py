@@ -1,21 +1,95 @@
 import numpy as np
+import os
 import pdb
+import random
+import sys
+
+# The search engine runs on the FunctionalBoard engine's bitboard positions
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'FunctionalBoard'))
 
 # USER MODULES
 from pieces import Piece, Pawn, Bishop, Knight, Rook, Queen, King
+from pieces import WHITE, BLACK, KING, QUEEN, ROOK, BISHOP, KNIGHT, PAWN
 from display import Color, Characters, PieceDisplay, display_board
+import bitboard
+from fen import STARTING_FEN, position_from_fen, position_to_fen
+from search import Searcher
 
 ascii_delimiter = 97
 HEIGHT = 8
 WIDTH = 8
 
-_piece_to_state_representation = {
-    'King':   1,
-    'Queen':  2,
-    'Rook':   3,
-    'Bishop': 4,
-    'Knight': 5,
-    'Pawn':   6,
+# Time the computer gets to think about each of its moves, in seconds
+SEARCH_TIME = 2.0
+
+# Random numbers for Zobrist hashing: one for each (colour, kind, position),
+# one for black to move and one for each file a pawn open to en-passant
+# can be on (only hashed if an opponent pawn stands beside it, ready to
+# capture, as in the FunctionalBoard engine). A board's key is the XOR of the numbers of everything on it,
+# so a move only has to XOR in and out what it changed. The generator is
+# seeded so keys are the same from one run to the next.
+_zobrist_rng = random.Random(0x5A0B72)
+_zobrist_pieces = {
+    (color, kind): [[_zobrist_rng.getrandbits(64) for _ in range(HEIGHT)]
+                    for _ in range(WIDTH)]
+    for color in (WHITE, BLACK)
+    for kind in (KING, QUEEN, ROOK, BISHOP, KNIGHT, PAWN)
+}
+_zobrist_black_to_move = _zobrist_rng.getrandbits(64)
+_zobrist_en_passant = [_zobrist_rng.getrandbits(64) for _ in range(WIDTH)]
+
+# One random number for each combination of castling rights (CASTLE_* flags
+# of the FunctionalBoard engine), the XOR of one number per right
+_castling_right_keys = [_zobrist_rng.getrandbits(64) for _ in range(4)]
+_zobrist_castling = [0] * (bitboard.CASTLE_ALL + 1)
+for _rights in range(bitboard.CASTLE_ALL + 1):
+    for _bit, _right_key in enumerate(_castling_right_keys):
+        if _rights & (1 << _bit):
+            _zobrist_castling[_rights] ^= _right_key
+
+def _zobrist_piece(piece, position):
+    return _zobrist_pieces[(piece.color, piece.kind)][position[0]][position[1]]
+
+# Kinds of piece a pawn can promote to, and their classes
+_PROMOTION_CLASSES = {
+    QUEEN: Queen,
+    ROOK: Rook,
+    BISHOP: Bishop,
+    KNIGHT: Knight,
+}
+
+# Castling rights that remain after a piece moves from or to each position
+# (indexed by x + WIDTH * y). Moving the king or a rook, or capturing a rook
+# on its starting position, gives up the corresponding rights
+_CASTLING_KEPT = [bitboard.CASTLE_ALL] * (WIDTH * HEIGHT)
+_CASTLING_KEPT[0] ^= bitboard.CASTLE_WHITE_QUEENSIDE
+_CASTLING_KEPT[7] ^= bitboard.CASTLE_WHITE_KINGSIDE
+_CASTLING_KEPT[4] ^= bitboard.CASTLE_WHITE_KINGSIDE | bitboard.CASTLE_WHITE_QUEENSIDE
+_CASTLING_KEPT[56] ^= bitboard.CASTLE_BLACK_QUEENSIDE
+_CASTLING_KEPT[63] ^= bitboard.CASTLE_BLACK_KINGSIDE
+_CASTLING_KEPT[60] ^= bitboard.CASTLE_BLACK_KINGSIDE | bitboard.CASTLE_BLACK_QUEENSIDE
+
+# Castling moves of each player: (right, king's destination, positions that
+# must be empty, positions the king stands on or crosses, which mustn't be
+# attacked)
+_CASTLING_MOVES = {
+    owner: (
+        (kingside, (6, y), ((5, y), (6, y)), ((4, y), (5, y), (6, y))),
+        (queenside, (2, y), ((1, y), (2, y), (3, y)), ((4, y), (3, y), (2, y))),
+    )
+    for (owner, y, kingside, queenside) in (
+        ('white', 0, bitboard.CASTLE_WHITE_KINGSIDE, bitboard.CASTLE_WHITE_QUEENSIDE),
+        ('black', HEIGHT - 1, bitboard.CASTLE_BLACK_KINGSIDE, bitboard.CASTLE_BLACK_QUEENSIDE),
+    )
+}
+
+# Rook move (start, destination) that goes along with the king's move when
+# castling, keyed by the king's destination
+_CASTLING_ROOK_MOVES = {
+    (6, 0): ((7, 0), (5, 0)),
+    (2, 0): ((0, 0), (3, 0)),
+    (6, HEIGHT - 1): ((7, HEIGHT - 1), (5, HEIGHT - 1)),
+    (2, HEIGHT - 1): ((0, HEIGHT - 1), (3, HEIGHT - 1)),
 }
 
 class Board(object):
@@ -55,6 +129,41 @@ class Board(object):
         self.w_king = None
         self.b_king = None
 
+        # Square-to-piece index: the piece standing on every position, or
+        # None, indexed by x + WIDTH * y. Kept in sync with self.board so the
+        # moveset generators can look up what's on a square in O(1)
+        self.squares = [None] * (WIDTH * HEIGHT)
+
+        # Pieces captured from each player
+        self.captured_pieces = {
+            'white': [],
+            'black': [],
+        }
+
+        # Pawn that advanced two squares from its starting position last
+        # turn, and so is open to en-passant (None if there isn't one)
+        self.en_passant = None
+
+        # Castling rights still available, as CASTLE_* flags of the
+        # FunctionalBoard engine
+        self.castling = 0
+
+        # Zobrist key identifying the state of the board. Kept up to date
+        # by make_move() and unmake_move()
+        self.key = 0
+
+        # Attack maps: the number of each player's pieces attacking every
+        # position (indexed by x + WIDTH * y), the pieces attacking each
+        # position, and the positions each piece attacks. Kept up to date
+        # by make_move() and unmake_move(), which only recompute the attacks
+        # of the pieces a move can change
+        self.attack_counts = {
+            'white': [0] * (WIDTH * HEIGHT),
+            'black': [0] * (WIDTH * HEIGHT),
+        }
+        self.attackers = [set() for _ in range(WIDTH * HEIGHT)]
+        self.piece_attacks = {}
+
         # Flag for whose turn it is
         # white: 0
         # black: 1
@@ -65,6 +174,11 @@ class Board(object):
         # seed for numpy random number generator
         self.seed = 1024
 
+        # Search engine choosing the computer's moves, created on first use.
+        # Kept for the whole game, so each search builds on what the last
+        # one found
+        self.searcher = None
+
     def populate_board(self):
         """
         Initialize board with positions of pieces.
@@ -114,33 +228,448 @@ class Board(object):
             self.w_king = self.board[0][4]
             self.b_king = self.board[7][4]
 
-    def present_movesets(self, opponent_movesets, turn='white'):
+        self.castling = bitboard.CASTLE_ALL
+
+        self.index_squares()
+        self.key = self.compute_key()
+        self.refresh_attacks()
+
+    def index_squares(self):
+        """
+        Rebuild the square-to-piece index from self.board
+        """
+        self.squares = [None] * (WIDTH * HEIGHT)
+        for row in self.board:
+            for piece in row:
+                if piece is not None:
+                    (x, y) = piece.position
+                    self.squares[x + WIDTH * y] = piece
+
+    def compute_key(self):
+        """
+        Compute the Zobrist key of the board from scratch
+        """
+        key = 0
+        for pieces in self.pieces_in_play.values():
+            for piece in pieces:
+                key ^= _zobrist_piece(piece, piece.position)
+        if self.player_flag:
+            key ^= _zobrist_black_to_move
+        key ^= self._en_passant_key()
+        key ^= _zobrist_castling[self.castling]
+        return key
+
+    def _en_passant_key(self):
+        """
+        Key of the pawn open to en-passant. It's only hashed if an opponent
+        pawn is beside it, able to capture it, so that boards that only
+        differ by an en-passant capture nobody can make share the same key
+        """
+        pawn = self.en_passant
+        if pawn is None:
+            return 0
+        (x, y) = pawn.position
+        for next_x in (x - 1, x + 1):
+            if 0 <= next_x < WIDTH:
+                piece = self.squares[next_x + WIDTH * y]
+                if piece is not None and piece.kind == PAWN and piece.color != pawn.color:
+                    return _zobrist_en_passant[x]
+        return 0
+
+    def refresh_attacks(self):
+        """
+        Recompute the attack maps from scratch
+        """
+        for counts in self.attack_counts.values():
+            counts[:] = [0] * (WIDTH * HEIGHT)
+        for attackers in self.attackers:
+            attackers.clear()
+        self.piece_attacks = {}
+
+        for pieces in self.pieces_in_play.values():
+            for piece in pieces:
+                self._add_attacks(piece, piece.generate_attacks(self.squares))
+
+    def _add_attacks(self, piece, attacks):
+        counts = self.attack_counts[piece.owner]
+        for (x, y) in attacks:
+            idx = x + WIDTH * y
+            counts[idx] += 1
+            self.attackers[idx].add(piece)
+        self.piece_attacks[piece] = attacks
+
+    def _remove_attacks(self, piece):
+        counts = self.attack_counts[piece.owner]
+        for (x, y) in self.piece_attacks.pop(piece, ()):
+            idx = x + WIDTH * y
+            counts[idx] -= 1
+            self.attackers[idx].discard(piece)
+
+    def is_attacked(self, position, by_player):
+        """
+        Is the position attacked by any of by_player's pieces?
+        """
+        return self.attack_counts[by_player][position[0] + WIDTH * position[1]] > 0
+
+    def in_check(self, player):
+        """
+        Is the king of the given player currently in check?
+        """
+        king = self.w_king if player == 'white' else self.b_king
+        opponent = 'black' if player == 'white' else 'white'
+        return self.is_attacked(king.position, opponent)
+
+    def present_movesets(self, turn='white'):
         """
         Analyzes all possible movesets and presents them to player
+
+        :return moves: list of the player's legal moves, as (piece,
+                       dest_space, promotion) tuples. promotion is the kind
+                       of piece a pawn reaching the last rank promotes to,
+                       or None
         """
+        opponent = 'black' if turn == 'white' else 'white'
+        opponent_attacks = self.attack_counts[opponent]
+        in_check = self.in_check(turn)
         pieces_avail = self.pieces_in_play[turn]
         all_possible_moves = []
         for piece in pieces_avail:
 
             # Kings require special logic, as their moveset is dependent
-            # on the moveset of the opponent's pices (cannot place self
-            # in check)
-            if piece.name == 'King':
-                piece.generate_moveset(self.pieces_in_play, opponent_movesets)
-            else:
-                moveset = piece.generate_moveset(self.pieces_in_play)
-
-            all_possible_moves.extend([(piece, move) for move in moveset])
+            # on the squares the opponent's pieces attack (cannot place self
+            # in check). The attack maps see through the king, so these
+            # moves are all legal
+            if piece.kind == KING:
+                moveset = piece.generate_moveset(self.squares, opponent_attacks)
+                all_possible_moves.extend([(piece, move, None) for move in moveset])
+                continue
+
+            # Any other move can only leave the king in check if the king is
+            # in check already, if the piece is pinned (so it's on a position
+            # a sliding piece of the opponent attacks) or if it captures
+            # en-passant. Those moves are tried on the board
+            (x, y) = piece.position
+            maybe_pinned = any(attacker.color != piece.color and
+                               attacker.kind in (BISHOP, ROOK, QUEEN)
+                               for attacker in self.attackers[x + WIDTH * y])
+
+            for dest_space in piece.generate_moveset(self.squares):
+                if piece.kind == PAWN and dest_space[1] in (0, HEIGHT - 1):
+                    moves = [(piece, dest_space, kind) for kind in _PROMOTION_CLASSES]
+                else:
+                    moves = [(piece, dest_space, None)]
+
+                if (in_check or maybe_pinned or
+                        (piece.kind == PAWN and dest_space[0] != x and
+                         self.squares[dest_space[0] + WIDTH * dest_space[1]] is None)):
+                    undo = self.make_move(moves[0])
+                    legal = not self.in_check(turn)
+                    self.unmake_move(undo)
+                    if not legal:
+                        continue
+
+                all_possible_moves.extend(moves)
+
+        # Castling: the king and rook mustn't have moved (the castling right
+        # is still there), the positions between them must be empty, and the
+        # king can't castle out of, through or into check
+        if self.castling and not in_check:
+            for (right, king_dest, empty, crossed) in _CASTLING_MOVES[turn]:
+                if (self.castling & right and
+                        all(self.squares[x + WIDTH * y] is None for (x, y) in empty) and
+                        not any(opponent_attacks[x + WIDTH * y] for (x, y) in crossed)):
+                    king = self.w_king if turn == 'white' else self.b_king
+                    all_possible_moves.append((king, king_dest, None))
 
         return all_possible_moves
 
+    def make_move(self, move):
+        """
+        Perform a move on the board in place
+
+        :param move: (piece, dest_space, promotion) tuple, as presented by
+                     present_movesets()
+        :return undo: record to pass to unmake_move() in order to take the
+                      move back: (piece, previous position, captured piece or
+                      None, piece promoted to or None, rook moved by castling
+                      or None, previous en-passant pawn, previous turn flag,
+                      previous castling rights, previous key, previous attacks
+                      of the pieces whose attacks changed)
+        """
+        (piece, dest_space, promotion) = move
+        (prev_x, prev_y) = piece.position
+        (curr_x, curr_y) = dest_space
+        prev_en_passant = self.en_passant
+        prev_player_flag = self.player_flag
+        prev_castling = self.castling
+        prev_key = self.key
+        key = prev_key ^ _zobrist_black_to_move ^ self._en_passant_key()
+
+        # Check to see if there is an opposing piece at movement position.
+        # A pawn moving diagonally onto an empty square captures en-passant,
+        # and the pawn it captures sits beside it instead
+        captured = self.squares[curr_x + WIDTH * curr_y]
+        if captured is None and piece.kind == PAWN and curr_x != prev_x:
+            captured = self.squares[curr_x + WIDTH * prev_y]
+
+        # A king moving two positions is castling, and takes the rook along
+        rook = None
+        if piece.kind == KING and abs(curr_x - prev_x) == 2:
+            (rook_start, rook_dest) = _CASTLING_ROOK_MOVES[dest_space]
+            rook = self.squares[rook_start[0] + WIDTH * rook_start[1]]
+
+        # Only the moving and captured pieces, and the pieces attacking a
+        # position a piece leaves or lands on, can attack different
+        # positions after the move. Of those, only sliding pieces can be
+        # blocked, so the other attackers are left as they are
+        changed = {piece}
+        changed_positions = [(prev_x, prev_y), dest_space]
+        if captured is not None:
+            changed.add(captured)
+            changed_positions.append(captured.position)
+        if rook is not None:
+            changed.add(rook)
+            changed_positions.extend((rook_start, rook_dest))
+        for (x, y) in changed_positions:
+            for attacker in self.attackers[x + WIDTH * y]:
+                if attacker.kind in (BISHOP, ROOK, QUEEN):
+                    changed.add(attacker)
+        prev_attacks = [(changed_piece, self.piece_attacks[changed_piece])
+                        for changed_piece in changed]
+        for changed_piece in changed:
+            self._remove_attacks(changed_piece)
+
+        # If so, add to list of captured pieces
+        if captured is not None:
+            (cap_x, cap_y) = captured.position
+            self.board[cap_y][cap_x] = None
+            self.char_board[cap_y][cap_x] = None
+            self.squares[cap_x + WIDTH * cap_y] = None
+            self.pieces_in_play[captured.owner].remove(captured)
+            self.captured_pieces[captured.owner].append(captured)
+            key ^= _zobrist_piece(captured, captured.position)
+
+        self._place(None, (prev_x, prev_y))
+        self._place(piece, dest_space)
+        piece.position = dest_space
+        key ^= _zobrist_piece(piece, (prev_x, prev_y)) ^ _zobrist_piece(piece, dest_space)
+
+        if rook is not None:
+            self._place(None, rook_start)
+            self._place(rook, rook_dest)
+            rook.position = rook_dest
+            key ^= _zobrist_piece(rook, rook_start) ^ _zobrist_piece(rook, rook_dest)
+
+        # A pawn reaching the last rank is replaced by the piece it promotes
+        # to, in the pawn's place in the list of pieces in play (which might
+        # be being iterated over)
+        promoted = None
+        if promotion is not None:
+            promoted = _PROMOTION_CLASSES[promotion](owner=piece.owner, position=dest_space)
+            self._place(promoted, dest_space)
+            pieces = self.pieces_in_play[piece.owner]
+            pieces[pieces.index(piece)] = promoted
+            key ^= _zobrist_piece(piece, dest_space) ^ _zobrist_piece(promoted, dest_space)
+            changed.discard(piece)
+            changed.add(promoted)
+
+        # Special logic for pawns: If the pawn moved two spaces from its
+        # starting position, it is now vulnerable to en-passant (but only
+        # for the next turn)
+        if prev_en_passant is not None:
+            prev_en_passant.two_square_advance = False
+        if piece.kind == PAWN and abs(curr_y - prev_y) == 2:
+            piece.two_square_advance = True
+            self.en_passant = piece
+            key ^= self._en_passant_key()
+        else:
+            self.en_passant = None
+
+        self.castling &= (_CASTLING_KEPT[prev_x + WIDTH * prev_y] &
+                          _CASTLING_KEPT[curr_x + WIDTH * curr_y])
+        key ^= _zobrist_castling[prev_castling] ^ _zobrist_castling[self.castling]
+
+        self.player_flag ^= 1
+        self.key = key
+
+        for changed_piece in changed:
+            if changed_piece is not captured:
+                self._add_attacks(changed_piece, changed_piece.generate_attacks(self.squares))
+
+        return (piece, (prev_x, prev_y), captured, promoted, rook, prev_en_passant,
+                prev_player_flag, prev_castling, prev_key, prev_attacks)
+
+    def unmake_move(self, undo):
+        """
+        Take back a move performed by make_move(), restoring the board to
+        what it was before the move
+        """
+        (piece, prev_position, captured, promoted, rook, prev_en_passant, prev_player_flag,
+         prev_castling, prev_key, prev_attacks) = undo
+        (curr_x, curr_y) = piece.position
+
+        if promoted is not None:
+            self._remove_attacks(promoted)
+            pieces = self.pieces_in_play[piece.owner]
+            pieces[pieces.index(promoted)] = piece
+
+        self._place(None, piece.position)
+        self._place(piece, prev_position)
+        piece.position = prev_position
+
+        if rook is not None:
+            (rook_start, _) = _CASTLING_ROOK_MOVES[(curr_x, curr_y)]
+            self._place(None, rook.position)
+            self._place(rook, rook_start)
+            rook.position = rook_start
+
+        # Put the captured piece back in play (it still remembers its
+        # position on the board)
+        if captured is not None:
+            self._place(captured, captured.position)
+            self.captured_pieces[captured.owner].pop()
+            self.pieces_in_play[captured.owner].append(captured)
+
+        if self.en_passant is not None:
+            self.en_passant.two_square_advance = False
+        if prev_en_passant is not None:
+            prev_en_passant.two_square_advance = True
+        self.en_passant = prev_en_passant
+
+        self.player_flag = prev_player_flag
+        self.castling = prev_castling
+        self.key = prev_key
+
+        for (changed_piece, attacks) in prev_attacks:
+            self._remove_attacks(changed_piece)
+            self._add_attacks(changed_piece, attacks)
+
+    def _place(self, piece, position):
+        """
+        Put a piece (or None) on a position of the board, keeping the
+        display board and square-to-piece index in sync
+        """
+        (x, y) = position
+        self.board[y][x] = piece
+        self.char_board[y][x] = None if piece is None else piece.cli_characterset
+        self.squares[x + WIDTH * y] = piece
+
     def pick_random_move(self, moveset):
         """
         A random move out of possible moveset is chosen
         """
-        idx = np.random.random_integers(0, len(moveset))
+        idx = np.random.randint(len(moveset))
         return moveset[idx]
 
+    def to_position(self):
+        """
+        Convert the board to a bitboard Position of the FunctionalBoard
+        engine. The board doesn't keep track of move counters, so the
+        position has those of a new game
+        """
+        pieces = [0] * bitboard.NUM_PIECE_SETS
+        for owner_pieces in self.pieces_in_play.values():
+            for piece in owner_pieces:
+                (x, y) = piece.position
+                idx = piece.color * bitboard.NUM_PIECE_TYPES + _KIND_TO_PIECE_TYPE[piece.kind]
+                pieces[idx] |= 1 << (x + WIDTH * y)
+
+        # The en-passant square is the one the pawn skipped over
+        en_passant = None
+        if self.en_passant is not None:
+            (x, y) = self.en_passant.position
+            y += -1 if self.en_passant.color == WHITE else 1
+            en_passant = x + WIDTH * y
+
+        return bitboard.Position(pieces,
+                                 side=bitboard.WHITE if self.player_flag == 0 else bitboard.BLACK,
+                                 en_passant=en_passant,
+                                 castling=self.castling)
+
+    @classmethod
+    def from_position(cls, position):
+        """
+        Board set up as a bitboard Position of the FunctionalBoard engine.
+        The board doesn't keep track of move counters, so those are dropped
+        """
+        board = cls()
+        board.board = [[None] * board.width for _ in range(board.height)]
+        board.char_board = [[None] * board.width for _ in range(board.height)]
+
+        for idx, piece_bitboard in enumerate(position.pieces):
+            (color, piece_type) = divmod(idx, bitboard.NUM_PIECE_TYPES)
+            owner = 'white' if color == bitboard.WHITE else 'black'
+            piece_class = _PIECE_TYPE_TO_CLASS[piece_type]
+            for square in bitboard.iter_squares(piece_bitboard):
+                (y, x) = divmod(square, WIDTH)
+                piece = piece_class(owner=owner, position=(x, y))
+                board.board[y][x] = piece
+                board.char_board[y][x] = piece.cli_characterset
+                board.pieces_in_play[owner].append(piece)
+                if piece_class is King:
+                    if owner == 'white':
+                        board.w_king = piece
+                    else:
+                        board.b_king = piece
+
+        board.player_flag = 0 if position.side == bitboard.WHITE else 1
+        board.castling = position.castling
+
+        # The board keeps track of the pawn open to en-passant, rather than
+        # the square behind it
+        if position.en_passant is not None:
+            (y, x) = divmod(position.en_passant, WIDTH)
+            y += 1 if y == 2 else -1
+            pawn = board.board[y][x]
+            if pawn is not None and pawn.kind == PAWN:
+                pawn.two_square_advance = True
+                board.en_passant = pawn
+
+        board.index_squares()
+        board.key = board.compute_key()
+        board.refresh_attacks()
+        return board
+
+    @classmethod
+    def from_fen(cls, fen=STARTING_FEN):
+        """
+        Board set up as described by a FEN string (see FunctionalBoard's
+        fen.py). Move counters are ignored
+
+        :raise ValueError: if the string isn't valid FEN
+        """
+        return cls.from_position(position_from_fen(fen))
+
+    def to_fen(self):
+        """
+        FEN string describing the board. Its move counters are those of a
+        new game
+        """
+        return position_to_fen(self.to_position())
+
+    def pick_search_move(self, moveset):
+        """
+        Search for the best move out of the possible moveset, on the
+        board converted to a bitboard Position
+        """
+        # Squares are numbered the same way by both engines, and castling
+        # is a king move of two squares in both
+        root_moves = {}
+        for (piece, dest_space, promotion) in moveset:
+            move = bitboard.encode_move(piece.position[0] + WIDTH * piece.position[1],
+                                        dest_space[0] + WIDTH * dest_space[1],
+                                        0 if promotion is None else _KIND_TO_PIECE_TYPE[promotion])
+            root_moves[move] = (piece, dest_space, promotion)
+
+        if self.searcher is None:
+            self.searcher = Searcher(max_time=SEARCH_TIME)
+        move = self.searcher.choose_move(self.to_position(), root_moves=root_moves)
+
+        # The search didn't come up with a move: fall back to any of them
+        if not move:
+            return self.pick_random_move(moveset)
+        return root_moves[move]
+
     def player_chosen_move(self, moveset):
         """
         Have the player choose a move to take
@@ -148,9 +677,11 @@ class Board(object):
         choice_idx = ascii_delimiter
         mod = None
         choice_dict = {}
-        for (piece, dest_space) in moveset:
+        for (piece, dest_space, promotion) in moveset:
             curr_position_in_grid = convert_int_to_grid_coords(piece.position)
             dest_space_in_grid = convert_int_to_grid_coords(dest_space)
+            if promotion is not None:
+                dest_space_in_grid += '=' + _PROMOTION_CLASSES[promotion].name
             if mod:
                 print("{0}) {1} {2} -> {3}".format(chr(mod) + chr(choice_idx),
                                                    piece.name,
@@ -162,9 +693,9 @@ class Board(object):
                                                    curr_position_in_grid,
                                                    dest_space_in_grid))
             if mod:
-                choice_dict[chr(mod) + chr(choice_idx)] = (piece, dest_space)
+                choice_dict[chr(mod) + chr(choice_idx)] = (piece, dest_space, promotion)
             else:
-                choice_dict[chr(choice_idx)] = (piece, dest_space)
+                choice_dict[chr(choice_idx)] = (piece, dest_space, promotion)
             choice_idx += 1
             if (choice_idx - ascii_delimiter) > 25 and not mod:
                 choice_idx = ascii_delimiter
@@ -214,110 +745,119 @@ class Board(object):
         display_board(self.char_board, index=True)
 
         # Initialize game
-        checkmate = False
-        turn = None
-        opponent_movesets = []
-        while not checkmate:
-
-            # Switch to next player's turn
-            if turn == 'white': turn = 'black'
-            elif not turn: turn = 'white'
-            else: turn = 'white'
-
-            # Switch off the 'two_square_advance' flag for
-            # all pieces in play
-            for piece in self.pieces_in_play[turn]:
-                if piece.name == 'Pawn':
-                    self.two_square_advance = False
+        turn = 'white'
+        history = []
+        while True:
 
-            movesets = self.present_movesets(opponent_movesets, turn)
+            # The game is over once the player to move has no legal move
+            # left: checkmate if their king is in check, stalemate if not
+            movesets = self.present_movesets(turn)
+            if not movesets:
+                break
 
             if player_color == turn:
-                (piece, dest_grid_space) = self.player_chosen_move(movesets)
+                move = self.player_chosen_move(movesets)
             else:
-                (piece, dest_grid_space) = self.pick_random_move(movesets)
-                pdb.set_trace()
-
-
-            # Check to see if there is an opposing piece at movement position
-            # If so, add to list of captured pieces
-            if turn == 'white':
-                opponent = 'black'
-            else:
-                opponent = 'white'
-
-            opponent_pieces = self.pieces_in_play[opponent]
-            for opp_piece in opponent_pieces:
-                if opp_piece.position == dest_grid_space:
-
-                    # Add to captured pieces dict
-                    self.captured_pieces[opponent].append(opp_piece)
+                move = self.pick_search_move(movesets)
 
-                    # Remove from pieces in play dict
-                    self.pieces_in_play[opponent].remove(opp_piece)
-                    break
 
-            prev_x = piece.position[0]
-            prev_y = piece.position[1]
-
-            curr_x = dest_grid_space[0]
-            curr_y = dest_grid_space[1]
-
-            # Special logic for pawns: If the pawn moved two spaces from its
-            # starting position, it is now vulnerable to en-passant
-            if piece.name == 'Pawn':
-                piece.two_square_advance = True
-
-
-            self.board[curr_y][curr_x] = piece
-            self.board[prev_y][prev_x] = None
-
-            self.char_board[curr_y][curr_x] = piece.cli_characterset
-            self.char_board[prev_y][prev_x] = None
-
-            piece.position = dest_grid_space
+            # Perform the move, keeping the undo record so the move can be
+            # taken back
+            history.append(self.make_move(move))
 
             # Print status of board after move
             display_board(self.char_board, index=True)
 
+            # Switch to next player's turn
+            turn = 'black' if turn == 'white' else 'white'
 
-            # Generate the new moveset for the moved piece so that we
-            # can check whether or not the move places the opposing king
-            # in checkmate
-            pdb.set_trace()
-            new_moveset = piece.generate_moveset(self.pieces_in_play)
-
-            # Replace old moveset in movesets
-            for move in new_moveset: movesets.append((piece, move))
-            movesets.remove((piece, dest_grid_space))
-
-
-            # Check to see if the king of the player whose turn it is
-            # has been placed in checkmate
-            if turn == 'white': checkmate = self.w_king.check_checkmate(self.pieces_in_play,
-                                                                        movesets)
-            else: checkmate = self.b_king.check_checkmate(self.pieces_in_play,
-                                                          movesets)
-
-            opponent_movesets = movesets
-
-        print("Checkmate! {} Has won!".format(turn))
-        if turn == player_color: print("Congratulations!")
+        if self.in_check(turn):
+            self.checkmate = True
+            winner = 'black' if turn == 'white' else 'white'
+            print("Checkmate! {} Has won!".format(winner))
+            if winner == player_color: print("Congratulations!")
+        else:
+            print("Stalemate! The game is a draw")
 
-    def generate_state_of_board(self):
+    def generate_state_of_board(self, dtype=np.float32):
         """
         Initializes vector to feed into DNN based on the state of the board at
         a given moment in time
+
+        :return state_vector: (NUM_PLANES, 8, 8) array (see encode_boards())
         """
-        state_vector = np.zeros((8,8))
-        for i, row in enumerate(self.board):
-            for j, grid_space in enumerate(row):
-                if grid_space:
-                    state_representation = _piece_to_state_representation[grid_space.name]
-                    if grid_space.owner == 'black': state_representation = -state_representation
-                    state_vector[i][j] = state_representation
+        return encode_boards([self], dtype=dtype)[0]
+
+# Planes of the tensors fed to the DNN, laid out the same way as the
+# FunctionalBoard engine's (see FunctionalBoard/tensors.py), so networks can
+# be trained on positions from either engine:
+#
+#     planes 0-11: occupancy of each kind of piece, black pieces first, and
+#                  for each colour pawn, knight, bishop, rook, queen, king
+#     plane 12:    side to move (all ones if white is to move)
+#     plane 13:    en-passant square (a single one, if there is one)
+#
+# The piece planes follow the FunctionalBoard engine's piece types, so the
+# same table also converts pieces for to_position()
+_KIND_TO_PIECE_TYPE = {
+    PAWN: 0,
+    KNIGHT: 1,
+    BISHOP: 2,
+    ROOK: 3,
+    QUEEN: 4,
+    KING: 5,
+}
+_PIECE_TYPE_TO_CLASS = (Pawn, Knight, Bishop, Rook, Queen, King)
+
+NUM_PIECE_PLANES = 12
+SIDE_TO_MOVE_PLANE = 12
+EN_PASSANT_PLANE = 13
+NUM_PLANES = 14
 
-        return state_representation
+def boards_from_fens(fens):
+    """
+    Boards set up as described by an iterable of FEN strings (such as the
+    lines of a file). Blank lines are skipped
+    """
+    return [Board.from_fen(fen) for fen in fens if fen.strip()]
+
+def encode_boards(boards, dtype=np.float32):
+    """
+    Encode a batch of boards as an (N, NUM_PLANES, 8, 8) tensor. Only the
+    positions of the pieces are gathered board by board; the tensor is
+    filled with a single scatter into its flattened buffer
+
+    :param boards: sequence of Boards
+    :param dtype:  dtype of the tensor
+    """
+    num_boards = len(boards)
+    tensor = np.zeros((num_boards, NUM_PLANES, HEIGHT, WIDTH), dtype=dtype)
+    board_size = NUM_PLANES * HEIGHT * WIDTH
+    plane_size = HEIGHT * WIDTH
+
+    # Flat index of every (board, plane, y, x) to set
+    indices = []
+    white_to_move = []
+    for n, board in enumerate(boards):
+        offset = n * board_size
+        for pieces in board.pieces_in_play.values():
+            for piece in pieces:
+                (x, y) = piece.position
+                plane = piece.color * 6 + _KIND_TO_PIECE_TYPE[piece.kind]
+                indices.append(offset + plane * plane_size + y * WIDTH + x)
+
+        # The en-passant square is the one the pawn skipped over
+        if board.en_passant is not None:
+            (x, y) = board.en_passant.position
+            y += -1 if board.en_passant.color == WHITE else 1
+            indices.append(offset + EN_PASSANT_PLANE * plane_size + y * WIDTH + x)
+
+        white_to_move.append(board.player_flag == 0)
+
+    tensor.reshape(-1)[indices] = 1
+    tensor[np.array(white_to_move, dtype=bool), SIDE_TO_MOVE_PLANE] = 1
+
+    return tensor
 
 def convert_int_to_grid_coords(int_coords):
     """
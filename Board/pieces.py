@@ -12,403 +12,280 @@ from display import Color, PieceDisplay, Characters
 HEIGHT = 8
 WIDTH = 8
 
+def _build_step_table(steps):
+    """
+    Build a table mapping each (x, y) position on the board to the positions
+    reachable from it with one of the given (dx, dy) steps
+    """
+    table = {}
+    for x, y in itertools.product(range(WIDTH), range(HEIGHT)):
+        table[(x, y)] = [
+            (x + dx, y + dy) for (dx, dy) in steps
+            if 0 <= x + dx < WIDTH and 0 <= y + dy < HEIGHT
+        ]
+    return table
+
+# Squares a knight or king can reach from each position on the board.
+# Computed once here, rather than every time a moveset is generated
+KNIGHT_MOVES = _build_step_table(
+    [(dx, dy) for dx, dy in itertools.product((-2, -1, 1, 2), repeat=2)
+     if abs(dx) != abs(dy)]
+)
+KING_MOVES = _build_step_table(
+    [(dx, dy) for dx, dy in itertools.product((-1, 0, 1), repeat=2)
+     if (dx, dy) != (0, 0)]
+)
+
+def _build_ray_table(directions):
+    """
+    Build a table mapping each (x, y) position on the board to the rays a
+    sliding piece can move along from it. Each ray lists the positions in
+    order of distance from the piece and stops at the edge of the board
+    """
+    table = {}
+    for x, y in itertools.product(range(WIDTH), range(HEIGHT)):
+        rays = []
+        for (dx, dy) in directions:
+            ray = []
+            ray_x, ray_y = x + dx, y + dy
+            while 0 <= ray_x < WIDTH and 0 <= ray_y < HEIGHT:
+                ray.append((ray_x, ray_y))
+                ray_x, ray_y = ray_x + dx, ray_y + dy
+            if ray:
+                rays.append(ray)
+        table[(x, y)] = rays
+    return table
+
+_ROOK_DIRECTIONS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+_BISHOP_DIRECTIONS = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+
+ROOK_RAYS = _build_ray_table(_ROOK_DIRECTIONS)
+BISHOP_RAYS = _build_ray_table(_BISHOP_DIRECTIONS)
+QUEEN_RAYS = _build_ray_table(_ROOK_DIRECTIONS + _BISHOP_DIRECTIONS)
+
+
+# Small-int codes for the colour and kind of a piece. Colours match the
+# values of display.Color
+BLACK = 0
+WHITE = 1
+
+KING = 1
+QUEEN = 2
+ROOK = 3
+BISHOP = 4
+KNIGHT = 5
+PAWN = 6
+
+OWNERS = ('black', 'white')
+OWNER_CODES = {'black': BLACK, 'white': WHITE}
+_DISPLAY_COLORS = (Color.BLACK, Color.WHITE)
+
 
 class Piece(object):
+    """
+    Pieces are kept compact, as boards are copied and stored in bulk: each
+    instance only holds its position and colour code (plus the en-passant
+    flag for pawns). Everything else (the piece's kind and name, owner and
+    opponent strings, display tuple) is shared by the class or derived from
+    the colour code when asked for.
+    """
+    __slots__ = ('position', 'color')
+
+    # Overridden by every kind of piece
+    kind = None
+    name = None
+    display = PieceDisplay.EMPTY
+
     def __init__(self,
-                 owner,
-                 position):
+                 owner='white',
+                 position=(0,0)):
 
         # Tuple containing the position of the piece on the board
         self.position = position
 
-        # piece owner
-        self.owner = owner
+        # piece owner, as a colour code
+        self.color = OWNER_CODES[owner]
 
-        if self.owner == 'white': self.opponent = 'black'
-        else: self.opponent = 'white'
+    @property
+    def owner(self):
+        return OWNERS[self.color]
 
-class King(Piece):
-    def __init__(self,
-                 owner='white',
-                 position=(0,0)):
+    @property
+    def opponent(self):
+        return OWNERS[self.color ^ 1]
 
-        super().__init__(owner=owner, position=position)
-        self.name = 'King'
-        if self.owner == 'white': self.cli_characterset = (Color.WHITE, PieceDisplay.KING)
-        else: self.cli_characterset = (Color.BLACK, PieceDisplay.KING)
+    @property
+    def cli_characterset(self):
+        return (_DISPLAY_COLORS[self.color], self.display)
 
-    def generate_moveset(self, pieces_in_play, opponent_movesets):
-        """
-        Generate possible moves for piece
-        For King, it's one space in any direction, so long as it's unoccuped
-        by a friendly piece and it doesn't put the king in check
+    def __repr__(self):
+        return '{}(owner={!r}, position={!r})'.format(type(self).__name__, self.owner, self.position)
+
+    def _slide(self, ray_table, squares):
         """
-        arr_x = [self.position[0], self.position[0] + 1, self.position[0] - 1]
-        arr_y = [self.position[1], self.position[1] + 1, self.position[1] - 1]
-        moveset = list(itertools.product(arr_x, arr_y))
+        Generate the moveset of a sliding piece (bishop, rook, queen) by
+        walking its precomputed rays. A piece owned by the same player blocks
+        its position and all positions further down the ray. An opponent
+        piece can be captured, but blocks the positions behind it
 
-        # Filter for illegal moves
+        :param squares: the board's square-to-piece index (see Board.squares)
+        """
+        moveset = []
+        for ray in ray_table[self.position]:
+            for pos in ray:
+                piece = squares[pos[0] + WIDTH * pos[1]]
+                if piece is None:
+                    moveset.append(pos)
+                    continue
+                if piece.color != self.color:
+                    moveset.append(pos)
+                break
 
-        # Filter for spots already occuptied by a piece owned by player
-        player_piece_coords = pieces_in_play[self.owner]
-        moveset = list(filter(lambda x: x != (p_coord for p_coord in player_piece_coords), moveset))
+        return moveset
 
-        # Filter spots threatened by the other player's pieces (can't place king in check)
-        for (_, threatened_spaces) in opponent_movesets:
-            moveset = list(filter(lambda x: x not in threatened_spaces, moveset))
+    def _slide_attacks(self, ray_table, squares):
+        """
+        Positions attacked by a sliding piece: each ray up to and including
+        the first piece in the way. The opponent's king doesn't block the
+        ray, so the king can't step back along the line it's checked on
+        """
+        attacks = []
+        for ray in ray_table[self.position]:
+            for (x, y) in ray:
+                attacks.append((x, y))
+                piece = squares[x + WIDTH * y]
+                if piece is not None and not (piece.kind == KING and
+                                              piece.color != self.color):
+                    break
 
-        # Filter for moves outside board space
-        moveset = list(filter(lambda pos: pos[0] < WIDTH and pos[0] >= 0 \
-                         and pos[1] < HEIGHT and pos[1] >= 0, moveset))
+        return attacks
 
-        return moveset
+class King(Piece):
+    __slots__ = ()
+    kind = KING
+    name = 'King'
+    display = PieceDisplay.KING
 
-    def check_checkmate(self, pieces_in_play, opponent_movesets):
+    def generate_moveset(self, squares, opponent_attacks):
         """
-        Method to check if the king has been placed in checkmate
+        Generate possible moves for piece
+        For King, it's one space in any direction, so long as it's unoccuped
+        by a friendly piece and it doesn't put the king in check
+
+        :param squares:          the board's square-to-piece index
+        :param opponent_attacks: the opponent's attack map, as kept by the
+                                 Board: the number of the opponent's pieces
+                                 attacking each position, indexed by
+                                 x + WIDTH * y
         """
-        # Generate king's moveset. If there are moves available to the king,
-        # then he is not in checkmate
-        moveset = self.generate_moveset(pieces_in_play, opponent_movesets)
-        if not moveset:
-            # See if the king is currently being threatened by an opponent's piece
-            for (_, threatened_spaces) in opponent_movesets:
-                if self.position in threatened_spaces:
-                    return True
+        # Filter for spots already occuptied by a piece owned by player, and
+        # spots threatened by the other player's pieces (can't place king in
+        # check)
+        moveset = []
+        for pos in KING_MOVES[self.position]:
+            idx = pos[0] + WIDTH * pos[1]
+            piece = squares[idx]
+            if (piece is None or piece.color != self.color) and not opponent_attacks[idx]:
+                moveset.append(pos)
+
+        return moveset
 
-        return False
+    def generate_attacks(self, squares):
+        return KING_MOVES[self.position]
 
 class Knight(Piece):
-    def __init__(self,
-                 owner='white',
-                 position=(0,0)):
-        super().__init__(owner=owner, position=position)
-        self.name = 'Knight'
-        if self.owner == 'white': self.cli_characterset = (Color.WHITE, PieceDisplay.KNIGHT)
-        else: self.cli_characterset = (Color.BLACK, PieceDisplay.KNIGHT)
+    __slots__ = ()
+    kind = KNIGHT
+    name = 'Knight'
+    display = PieceDisplay.KNIGHT
 
     def generate_moveset(self,
-                         pieces_in_play,
+                         squares,
                          ):
         """
         Generate possible moves for piece
         """
-        arr_x1 = [self.position[0] + 2, self.position[0] - 2]
-        arr_y1 = [self.position[1] + 1, self.position[1] - 1]
-
-        arr_x2 = [self.position[0] + 1, self.position[0] - 1]
-        arr_y2 = [self.position[1] + 2, self.position[1] - 2]
-        moveset = list(itertools.product(arr_x1, arr_y1)) + list(itertools.product(arr_x2, arr_y2))
-
-        # Filter for illegal moves (For knights, we don't have to account for collision)
-
-        # Filter for moves outside board space
-        moveset = list(filter(lambda pos: pos[0] < WIDTH and pos[0] >= 0 \
-                              and pos[1] < HEIGHT and pos[1] >= 0, moveset))
+        # Filter for illegal moves (For knights, we don't have to account for
+        # collision, and moves outside board space are already left out of
+        # the table)
 
         # Filter for spots already occupied by a piece owned by player
-        owner_pieces = pieces_in_play[self.owner]
-
-        occupied_player_spaces = [piece.position for piece in owner_pieces]
-        moveset = list(filter(lambda pos: pos not in occupied_player_spaces, moveset))
+        moveset = []
+        for pos in KNIGHT_MOVES[self.position]:
+            piece = squares[pos[0] + WIDTH * pos[1]]
+            if piece is None or piece.color != self.color:
+                moveset.append(pos)
 
         return moveset
 
+    def generate_attacks(self, squares):
+        return KNIGHT_MOVES[self.position]
+
 class Bishop(Piece):
-    def __init__(self,
-                 owner='white',
-                 position=(0,0)):
-        super().__init__(owner=owner, position=position)
-        self.name = 'Bishop'
-        if self.owner == 'white': self.cli_characterset = (Color.WHITE, PieceDisplay.BISHOP)
-        else: self.cli_characterset = (Color.BLACK, PieceDisplay.BISHOP)
+    __slots__ = ()
+    kind = BISHOP
+    name = 'Bishop'
+    display = PieceDisplay.BISHOP
 
     def generate_moveset(self,
-                         pieces_in_play,
+                         squares,
                          ):
         """
         Generate possible moves for Bishop
         """
-        curr_x = self.position[0]
-        curr_y = self.position[1]
-        arr_x1 = [curr_x + i for i in range(1,8)]
-        arr_y1 = [curr_y + i for i in range(1,8)]
-        arr_x2 = [curr_x - i for i in range(1,8)]
-        arr_y2 = [curr_y - i for i in range(1,8)]
-
-        # Divide moveset into 4-axis of diagonal movement for now (makes later
-        # filtering simpler)
-        diag1 = list(zip(arr_x1, arr_y1))
-        diag2 = list(zip(arr_x1, arr_y2))
-        diag3 = list(zip(arr_x2, arr_y1))
-        diag4 = list(zip(arr_x2, arr_y2))
-
-        # Filter for illegal moves
-
-        # Filter for positions blocked by other pieces. A piece owned by same player
-        # also blocks all positions further down diagonal axis as well
-        owner_pieces = pieces_in_play[self.owner]
-        grid_coords = [piece.position for piece in owner_pieces]
-        for grid_coord in grid_coords:
-#            piece_x = player_piece.position[0]
-#            piece_y = player_piece.position[1]
-#            if abs(piece_x - curr_x) == abs(piece_y - curr_y):
-            if grid_coord in diag1:
-                idx = diag1.index(grid_coord)
-                diag1 = diag1[:idx]
-            elif grid_coord in diag2:
-                idx = diag2.index(grid_coord)
-                diag2 = diag2[:idx]
-            elif grid_coord in diag3:
-                idx = diag3.index(grid_coord)
-                diag3 = diag3[:idx]
-            elif grid_coord in diag4:
-                idx = diag4.index(grid_coord)
-                diag4 = diag4[:idx]
-
-        # Filter for pieces owned by opponent
-        # Note that an opponent piece
-        # does not prevent a bishop from moving to their position, but  blocks other positions
-        # further down its diagonal axis in the moveset
-        for opponent_piece in pieces_in_play[self.opponent]:
-            if opponent_piece.position in diag1:
-                idx = diag1.index(opponent_piece.position)
-                diag1 = diag1[:idx+1]
-            elif opponent_piece.position in diag2:
-                idx = diag2.index(opponent_piece.position)
-                diag2 = diag2[:idx+1]
-            elif opponent_piece.position in diag3:
-                idx = diag3.index(opponent_piece.position)
-                diag3 = diag3[:idx+1]
-            elif opponent_piece.position in diag4:
-                idx = diag4.index(opponent_piece.position)
-                diag4 = diag4[:idx+1]
-
-        # Compose moveset from invdividual diagonal axex
-        moveset = diag1 + diag2 + diag3 + diag4
-
-        # Filter for moves outside board space
-        moveset = list(filter(lambda pos: pos[0] < WIDTH and pos[0] >= 0 \
-                         and pos[1] < HEIGHT and pos[1] >= 0, moveset))
+        return self._slide(BISHOP_RAYS, squares)
 
-        return moveset
+    def generate_attacks(self, squares):
+        return self._slide_attacks(BISHOP_RAYS, squares)
 
 class Rook(Piece):
-    def __init__(self,
-                 owner='white',
-                 position=(0,0)):
-        super().__init__(owner=owner, position=position)
-        self.name = 'Rook'
-        if self.owner == 'white': self.cli_characterset = (Color.WHITE, PieceDisplay.ROOK)
-        else: self.cli_characterset = (Color.BLACK, PieceDisplay.ROOK)
-
-    def generate_moveset(self, pieces_in_play):
-        curr_x = self.position[0]
-        curr_y = self.position[1]
+    __slots__ = ()
+    kind = ROOK
+    name = 'Rook'
+    display = PieceDisplay.ROOK
 
-        arr_x1 = [curr_x + x for x in range(1,8)]
-        arr_y1 = [curr_y + y for y in range(1,8)]
-        arr_x2 = [curr_x - x for x in range(1,8)]
-        arr_y2 = [curr_y - y for y in range(1,8)]
-
-        # Generate seperate movesets for movements along horizontal axes and
-        # vertical axes
-        hz_axis1 = [(x, curr_y) for x in arr_x1]
-        hz_axis2 = [(x, curr_y) for x in arr_x2]
-        vt_axis1 = [(curr_x, y) for y in arr_y1]
-        vt_axis2 = [(curr_x, y) for y in arr_y2]
-
-        # Check to see if path is blocked by a player piece
-        for player_piece in pieces_in_play[self.owner]:
-            ppiece_x = player_piece.position[0]
-            ppiece_y = player_piece.position[1]
-
-            if ppiece_y == curr_y:
-                if (ppiece_x, ppiece_y) in hz_axis1:
-                    idx = hz_axis1.index((ppiece_x, ppiece_y))
-                    hz_axis1 = hz_axis1[:idx]
-                elif (ppiece_x, ppiece_y) in hz_axis2:
-                    idx = hz_axis2.index((ppiece_x, ppiece_y))
-                    hz_axis2 = hz_axis2[:idx]
-
-            elif ppiece_x == curr_x:
-                if (ppiece_x, ppiece_y) in vt_axis1:
-                    idx = vt_axis1.index((ppiece_x, ppiece_y))
-                    vt_axis1 = vt_axis1[:idx]
-                elif (ppiece_x, ppiece_y) in vt_axis2:
-                    idx = vt_axis2.index((ppiece_x, ppiece_y))
-                    vt_axis2 = vt_axis2[:idx]
-
-        # Check to see if path is blocked by opponent piece. Note that
-        # the rook can move to the position of that opponent piece, but
-        # not past it
-        for opponent_piece in pieces_in_play[self.opponent]:
-            opiece_x = opponent_piece.position[0]
-            opiece_y = opponent_piece.position[1]
-
-            if opiece_y == curr_y:
-                if (opiece_x, opiece_y) in hz_axis1:
-                    idx = hz_axis1.index((opiece_x, opiece_y))
-                    hz_axis1 = hz_axis1[:(idx+1)]
-                elif (opiece_x, opiece_y) in hz_axis2:
-                    idx = hz_axis2.index((opiece_x, opiece_y))
-                    hz_axis2 = hz_axis2[:(idx+1)]
-
-            elif opiece_x == curr_x:
-                if (opiece_x, opiece_y) in vt_axis1:
-                    idx = vt_axis1.index((opiece_x, opiece_y))
-                    vt_axis1 = vt_axis1[:(idx+1)]
-                elif (opiece_x, opiece_y) in vt_axis2:
-                    idx = vt_axis2.index((opiece_x, opiece_y))
-                    vt_axis2 = vt_axis2[:(idx+1)]
-
-        # Compose moveset from individual axes
-        moveset = hz_axis1 + hz_axis2 + vt_axis1 + vt_axis2
-
-        # Filter for moves that would place piece off board
-        moveset = list(filter(lambda pos: pos[0] < WIDTH and pos[0] >= 0 \
-                          and pos[1] < HEIGHT and pos[1] >= 0, moveset))
+    def generate_moveset(self, squares):
+        """
+        Generate possible moves for Rook
+        """
+        return self._slide(ROOK_RAYS, squares)
 
-        return moveset
+    def generate_attacks(self, squares):
+        return self._slide_attacks(ROOK_RAYS, squares)
 
 class Queen(Piece):
-    def __init__(self,
-                 owner='white',
-                 position=(0,0)):
-        super().__init__(owner=owner, position=position)
-        self.name = 'Queen'
-        if self.owner == 'white': self.cli_characterset = (Color.WHITE, PieceDisplay.QUEEN)
-        else: self.cli_characterset = (Color.BLACK, PieceDisplay.QUEEN)
+    __slots__ = ()
+    kind = QUEEN
+    name = 'Queen'
+    display = PieceDisplay.QUEEN
 
-    def generate_moveset(self, pieces_in_play):
-
-        curr_x = self.position[0]
-        curr_y = self.position[1]
-
-        arr_x1 = [curr_x + i for i in range(1,8)]
-        arr_y1 = [curr_y + i for i in range(1,8)]
-        arr_x2 = [curr_x - i for i in range(1,8)]
-        arr_y2 = [curr_y - i for i in range(1,8)]
-
-        # Divide moveset into 4-axis of diagonal movement for now (makes later
-        # filtering simpler)
-        diag1 = list(zip(arr_x1, arr_y1))
-        diag2 = list(zip(arr_x1, arr_y2))
-        diag3 = list(zip(arr_x2, arr_y1))
-        diag4 = list(zip(arr_x2, arr_y2))
-
-        # Generate seperate movesets for movements along horizontal axes and
-        # vertical axes
-        hz_axis1 = [(x, curr_y) for x in arr_x1]
-        hz_axis2 = [(x, curr_y) for x in arr_x2]
-        vt_axis1 = [(curr_x, y) for y in arr_y1]
-        vt_axis2 = [(curr_x, y) for y in arr_y2]
-
-
-        # Filter for illegal moves
-
-        # Filter for positions blocked by other pieces. A piece owned by same player
-        # also blocks all positions further down diagonal axis as well
-        for player_piece in pieces_in_play[self.owner]:
-            ppiece_x = player_piece.position[0]
-            ppiece_y = player_piece.position[1]
-#            if abs(piece_x - curr_x) == abs(piece_y - curr_y):
-
-            # Diagonal movesets
-            if player_piece.position in diag1:
-                idx = diag1.index(player_piece.position)
-                diag1 = diag1[:idx]
-            elif player_piece.position in diag2:
-                idx = diag2.index(player_piece.position)
-                diag2 = diag2[:idx]
-            elif player_piece.position in diag3:
-                idx = diag3.index(player_piece.position)
-                diag3 = diag3[:idx]
-            elif player_piece.position in diag4:
-                idx = diag4.index(player_piece.position)
-                diag4 = diag4[:idx]
-
-            elif ppiece_y == curr_y:
-                if (ppiece_x, ppiece_y) in hz_axis1:
-                    idx = hz_axis1.index((ppiece_x, ppiece_y))
-                    hz_axis1 = hz_axis1[:idx]
-                elif (ppiece_x, ppiece_y) in hz_axis2:
-                    idx = hz_axis2.index((ppiece_x, ppiece_y))
-                    hz_axis2 = hz_axis2[:idx]
-
-            elif ppiece_x == curr_x:
-                if (ppiece_x, ppiece_y) in vt_axis1:
-                    idx = vt_axis1.index((ppiece_x, ppiece_y))
-                    vt_axis1 = vt_axis1[:idx]
-                elif (ppiece_x, ppiece_y) in vt_axis2:
-                    idx = vt_axis2.index((ppiece_x, ppiece_y))
-                    vt_axis2 = vt_axis2[:idx]
-
-        # Filter for pieces owned by opponent
-        # Note that an opponent piece
-        # does not prevent a bishop from moving to their position, but  blocks other positions
-        # further down its diagonal axis in the moveset
-        for opponent_piece in pieces_in_play[self.opponent]:
-            opiece_x = opponent_piece.position[0]
-            opiece_y = opponent_piece.position[1]
-
-            # Diagonal movesets
-            if opponent_piece.position in diag1:
-                idx = diag1.index(opponent_piece.position)
-                diag1 = diag1[:idx+1]
-            elif opponent_piece.position in diag2:
-                idx = diag2.index(opponent_piece.position)
-                diag2 = diag2[:idx+1]
-            elif opponent_piece.position in diag3:
-                idx = diag3.index(opponent_piece.position)
-                diag3 = diag3[:idx+1]
-            elif opponent_piece.position in diag4:
-                idx = diag4.index(player_piece.position)
-                diag4 = diag4[:idx+1]
-
-            if opiece_y == curr_y:
-                if (opiece_x, opiece_y) in hz_axis1:
-                    idx = hz_axis1.index((opiece_x, opiece_y))
-                    hz_axis1 = hz_axis1[:(idx+1)]
-                elif (opiece_x, opiece_y) in hz_axis2:
-                    idx = hz_axis2.index((opiece_x, opiece_y))
-                    hz_axis2 = hz_axis2[:(idx+1)]
-
-            elif opiece_x == curr_x:
-                if (opiece_x, opiece_y) in vt_axis1:
-                    idx = vt_axis1.index((opiece_x, opiece_y))
-                    vt_axis1 = vt_axis1[:(idx+1)]
-                elif (opiece_x, opiece_y) in vt_axis2:
-                    idx = vt_axis2.index((opiece_x, opiece_y))
-                    vt_axis2 = vt_axis2[:(idx+1)]
-
-        # Compose moveset from invdividual diagonal axex
-        moveset = diag1 + diag2 + diag3 + diag4
-
-        # Compose moveset from individual vertical and horizontal axes
-        moveset = moveset + hz_axis1 + hz_axis2 + vt_axis1 + vt_axis2
-
-        # Filter for moves outside board space
-        moveset = list(filter(lambda pos: pos[0] < WIDTH and pos[0] >= 0 \
-                         and pos[1] < HEIGHT and pos[1] >= 0, moveset))
+    def generate_moveset(self, squares):
+        """
+        Generate possible moves for Queen (the rook's and the bishop's
+        rays combined)
+        """
+        return self._slide(QUEEN_RAYS, squares)
 
-        return moveset
+    def generate_attacks(self, squares):
+        return self._slide_attacks(QUEEN_RAYS, squares)
 
 class Pawn(Piece):
+    __slots__ = ('two_square_advance',)
+    kind = PAWN
+    name = 'Pawn'
+    display = PieceDisplay.PAWN
+
     def __init__(self,
                  owner='white',
                  position=(0,0)):
         super().__init__(owner=owner, position=position)
-        self.name = 'Pawn'
-        if self.owner == 'white': self.cli_characterset = (Color.WHITE, PieceDisplay.PAWN)
-        else: self.cli_characterset = (Color.BLACK, PieceDisplay.PAWN)
 
         # Pawn requires flag to let players know if it's previous move was
         # advancing two squares from its starting position. This enables
         # an opponent pawn to perform an en-passant capture on it
         self.two_square_advance = False
 
-    def generate_moveset(self, pieces_in_play):
+    def generate_moveset(self, squares):
         """
         Generate possible moves for a pawn.
         """
@@ -417,75 +294,58 @@ class Pawn(Piece):
 
         # The movesets generated by white and black pawns will be inverse each other
         # (pawns can only move in one direction)
-        if self.owner == 'white':
-            # If the pawn is still at the 2nd rank of the board, it can move
-            # forward twice
-            if curr_y == 1:
-                moveset = [
-                    (curr_x, curr_y + 1),
-                    (curr_x, curr_y + 2)
-                ]
-            else:
-                moveset = [(curr_x, curr_y + 1)]
-
-            # Check to see if there's an opponent piece at a diagonal to the pawn.
-            # If so, the pawn can capture it
-            for opiece in pieces_in_play[self.opponent]:
-                if opiece.position == (curr_x + 1, curr_y + 1) or \
-                        opiece.position == (curr_x - 1, curr_y + 1):
-                    moveset.append(opiece.position)
-
-                # Is the opponent's piece a pawn, and just moved two
-                # spaces from its start? If so, we might be able to
-                # capture it en-passant
-                if opiece.name == 'Pawn' and opiece.two_square_advance == True:
-                    moveset.append((opiece.position[0], curr_y + 1))
-
-
-        elif self.owner == 'black':
-            # If the pawn is still at the 2nd rank of the board, it can move
-            # forward twice
-            if curr_y == 6:
-                moveset = [
-                    (curr_x, curr_y - 1),
-                    (curr_x, curr_y - 2)
-                ]
-            else:
-                moveset = [(curr_x, curr_y -1)]
+        if self.color == WHITE:
+            step = 1
+            start_y = 1
+        else:
+            step = -1
+            start_y = 6
+
+        moveset = []
+        next_y = curr_y + step
+        if not 0 <= next_y < HEIGHT:
+            return moveset
+
+        # The pawn can only advance onto empty squares. If the pawn is still
+        # at the 2nd rank of the board, it can move forward twice
+        if squares[curr_x + WIDTH * next_y] is None:
+            moveset.append((curr_x, next_y))
+            if curr_y == start_y and squares[curr_x + WIDTH * (next_y + step)] is None:
+                moveset.append((curr_x, next_y + step))
+
+        for next_x in (curr_x - 1, curr_x + 1):
+            if not 0 <= next_x < WIDTH:
+                continue
 
             # Check to see if there's an opponent piece at a diagonal to the pawn.
             # If so, the pawn can capture it
-            for opiece in pieces_in_play[self.opponent]:
-                if opiece.position == (curr_x + 1, curr_y - 1) or \
-                        opiece.position == (curr_x - 1, curr_y - 1):
-                    moveset.append(opiece.position)
-
-                # Is the opponent's piece a pawn, and just moved two
-                # spaces from its start? If so, we might be able to
-                # capture it en-passant
-                if opiece.name == 'Pawn' and opiece.two_square_advance == True:
-                    moveset.append((opiece.position[0], curr_y - 1))
-
-        # Check to see if a piece owned by the player is blocking the path
-        # of the pawn
-        for ppiece in pieces_in_play[self.owner]:
-            if ppiece.position in moveset:
-                idx = moveset.index(ppiece.position)
-                moveset.pop(idx)
-
-        # Check to see if a piece owned by the opponent is blocking the
-        # path of the pawn
-        for opiece in pieces_in_play[self.opponent]:
-            if opiece.position in moveset:
-                idx = moveset.index(opiece.position)
-                moveset.pop(idx)
-
-        # Filter for moves outside board space
-        moveset = list(filter(lambda pos: pos[0] < WIDTH and pos[0] >= 0 and \
-                         pos[1] < HEIGHT and pos[1] >= 0, moveset))
+            opiece = squares[next_x + WIDTH * next_y]
+            if opiece is not None:
+                if opiece.color != self.color:
+                    moveset.append((next_x, next_y))
+                continue
+
+            # Is the opponent's piece beside us a pawn, and just moved two
+            # spaces from its start? If so, we might be able to capture it
+            # en-passant
+            opiece = squares[next_x + WIDTH * curr_y]
+            if (opiece is not None and opiece.color != self.color and
+                    opiece.kind == PAWN and opiece.two_square_advance == True):
+                moveset.append((next_x, next_y))
 
         return moveset
 
+    def generate_attacks(self, squares):
+        """
+        Pawns attack the two positions diagonally in front of them, whether
+        or not there's anything to capture there
+        """
+        (x, y) = self.position
+        y += 1 if self.color == WHITE else -1
+        if not 0 <= y < HEIGHT:
+            return []
+        return [(x + dx, y) for dx in (-1, 1) if 0 <= x + dx < WIDTH]
+
 if __name__ == '__main__':
 
     w_rook = Rook(owner='white',
@@ -497,17 +357,11 @@ if __name__ == '__main__':
     bk_queen = Queen(owner='black',
                      position=(3,4))
 
-    pieces_in_play = {
-        'white': [
-            w_rook,
-        ],
-        'black': [
-            bk_knight,
-            bk_queen,
-        ]
-    }
+    squares = [None] * (WIDTH * HEIGHT)
+    for piece in (w_rook, bk_knight, bk_queen):
+        squares[piece.position[0] + WIDTH * piece.position[1]] = piece
 
-    moveset = bk_queen.generate_moveset(pieces_in_play)
+    moveset = bk_queen.generate_moveset(squares)
 
     print("moveset: ", moveset)
 
@@ -0,0 +1,210 @@
+"""
+Attack tables shared by the move generators and the Position
+
+Squares are numbered as in bitboard.py (a1 is bit 0, h8 is bit 63). Every
+table here only depends on the geometry of the board, so it is computed
+once at import time.
+"""
+# Colors, as in bitboard.py (which builds on this module)
+_BLACK = 0
+_WHITE = 1
+
+# Masks for commonly used sets of squares
+FULL_BOARD = 0xFFFFFFFFFFFFFFFF
+FILE_A = 0x0101010101010101
+FILE_B = FILE_A << 1
+FILE_G = FILE_A << 6
+FILE_H = FILE_A << 7
+RANK_1 = 0xFF
+RANK_2 = RANK_1 << 8
+RANK_3 = RANK_1 << 16
+RANK_4 = RANK_1 << 24
+RANK_5 = RANK_1 << 32
+RANK_6 = RANK_1 << 40
+RANK_7 = RANK_1 << 48
+RANK_8 = RANK_1 << 56
+
+NOT_FILE_A = FULL_BOARD ^ FILE_A
+NOT_FILE_H = FULL_BOARD ^ FILE_H
+NOT_FILE_AB = FULL_BOARD ^ (FILE_A | FILE_B)
+NOT_FILE_GH = FULL_BOARD ^ (FILE_G | FILE_H)
+
+# Directions a sliding piece can move in, as (shift, mask) pairs. The mask
+# removes squares that wrapped around to the other side of the board.
+# Opposite directions are listed next to each other (see
+# _build_line_tables())
+_ROOK_DIRECTIONS = (
+    (8, FULL_BOARD),
+    (-8, FULL_BOARD),
+    (1, NOT_FILE_A),
+    (-1, NOT_FILE_H),
+)
+_BISHOP_DIRECTIONS = (
+    (9, NOT_FILE_A),
+    (-9, NOT_FILE_H),
+    (7, NOT_FILE_H),
+    (-7, NOT_FILE_A),
+)
+
+
+##################
+# Attack helpers #
+##################
+
+def _ray_attacks(bitboard, shift, mask, occupied):
+    """
+    Squares attacked along one direction by every slider in bitboard.
+    Rays stop at (and include) the first occupied square
+    """
+    empty = ~occupied
+    attacks = 0
+    if shift > 0:
+        bitboard = (bitboard << shift) & mask
+        while bitboard:
+            attacks |= bitboard
+            bitboard = ((bitboard & empty) << shift) & mask
+    else:
+        shift = -shift
+        bitboard = (bitboard >> shift) & mask
+        while bitboard:
+            attacks |= bitboard
+            bitboard = ((bitboard & empty) >> shift) & mask
+
+    return attacks
+
+def rook_attacks(bitboard, occupied):
+    attacks = 0
+    for shift, mask in _ROOK_DIRECTIONS:
+        attacks |= _ray_attacks(bitboard, shift, mask, occupied)
+    return attacks
+
+def bishop_attacks(bitboard, occupied):
+    attacks = 0
+    for shift, mask in _BISHOP_DIRECTIONS:
+        attacks |= _ray_attacks(bitboard, shift, mask, occupied)
+    return attacks
+
+def knight_attacks(bitboard):
+    # A knight's move is composed of a 2-square move along one axis
+    # and a 1-square move along a perpendicular axis
+    one_file = ((bitboard >> 1) & NOT_FILE_H) | ((bitboard << 1) & NOT_FILE_A)
+    two_files = ((bitboard >> 2) & NOT_FILE_GH) | ((bitboard << 2) & NOT_FILE_AB)
+    return ((one_file << 16) | (one_file >> 16) |
+            (two_files << 8) | (two_files >> 8)) & FULL_BOARD
+
+def king_attacks(bitboard):
+    attacks = ((bitboard << 1) & NOT_FILE_A) | ((bitboard >> 1) & NOT_FILE_H)
+    bitboard |= attacks
+    attacks |= (bitboard << 8) | (bitboard >> 8)
+    return attacks & FULL_BOARD
+
+def pawn_attacks(bitboard, color):
+    """
+    Squares attacked diagonally by the pawns of a given color
+    """
+    if color == _WHITE:
+        return ((bitboard << 9) & NOT_FILE_A) | ((bitboard << 7) & NOT_FILE_H)
+    return ((bitboard >> 7) & NOT_FILE_A) | ((bitboard >> 9) & NOT_FILE_H)
+
+# Squares attacked by a knight, king or pawn standing on each square of the
+# board. These never change, so compute them once instead of on every call
+KNIGHT_ATTACKS = [knight_attacks(1 << square) for square in range(64)]
+KING_ATTACKS = [king_attacks(1 << square) for square in range(64)]
+PAWN_ATTACKS = [
+    [pawn_attacks(1 << square, _BLACK) for square in range(64)],
+    [pawn_attacks(1 << square, _WHITE) for square in range(64)],
+]
+
+def _build_slider_table(directions):
+    """
+    For each square, build the mask of squares whose occupancy can block a
+    slider moving in the given directions (the last square of each ray never
+    blocks anything further along), along with a table mapping every possible
+    occupancy of that mask to the squares the slider attacks.
+
+    A dict lookup on the masked occupancy does the job of the multiply and
+    shift used to index magic bitboards, without having to search for the
+    magic multipliers.
+    """
+    masks = []
+    tables = []
+    for square in range(64):
+        square_bit = 1 << square
+        mask = 0
+        for shift, wrap in directions:
+            ray = _ray_attacks(square_bit, shift, wrap, 0)
+            if ray:
+                edge = ray.bit_length() - 1 if shift > 0 else (ray & -ray).bit_length() - 1
+                mask |= ray ^ (1 << edge)
+
+        # Walk every subset of the mask (Carry-Rippler trick)
+        table = {}
+        blockers = 0
+        while True:
+            attacks = 0
+            for shift, wrap in directions:
+                attacks |= _ray_attacks(square_bit, shift, wrap, blockers)
+            table[blockers] = attacks
+
+            blockers = (blockers - mask) & mask
+            if not blockers:
+                break
+
+        masks.append(mask)
+        tables.append(table)
+
+    return masks, tables
+
+ROOK_MASKS, ROOK_TABLES = _build_slider_table(_ROOK_DIRECTIONS)
+BISHOP_MASKS, BISHOP_TABLES = _build_slider_table(_BISHOP_DIRECTIONS)
+
+def rook_attacks_from(square, occupied):
+    """
+    Squares attacked by a rook standing on a square, given the occupied
+    squares of the board
+    """
+    return ROOK_TABLES[square][occupied & ROOK_MASKS[square]]
+
+def bishop_attacks_from(square, occupied):
+    return BISHOP_TABLES[square][occupied & BISHOP_MASKS[square]]
+
+def queen_attacks_from(square, occupied):
+    return (ROOK_TABLES[square][occupied & ROOK_MASKS[square]] |
+            BISHOP_TABLES[square][occupied & BISHOP_MASKS[square]])
+
+
+def _build_line_tables():
+    """
+    For every pair of squares on a common rank, file or diagonal, build the
+    mask of the squares strictly between them and the mask of the whole
+    line through both of them (from edge to edge of the board)
+    """
+    between = [[0] * 64 for _ in range(64)]
+    line = [[0] * 64 for _ in range(64)]
+    for square in range(64):
+        square_bit = 1 << square
+        for directions in (_ROOK_DIRECTIONS, _BISHOP_DIRECTIONS):
+            for i in range(0, 4, 2):
+                # Directions come in opposite pairs
+                forward = directions[i]
+                backward = directions[i + 1]
+                assert forward[0] + backward[0] == 0
+                full_line = (square_bit |
+                             _ray_attacks(square_bit, forward[0], forward[1], 0) |
+                             _ray_attacks(square_bit, backward[0], backward[1], 0))
+                for (shift, wrap) in (forward, backward):
+                    passed = 0
+                    target = _ray_attacks(square_bit, shift, wrap, 0)
+                    bit = square_bit
+                    while True:
+                        bit = ((bit << shift) if shift > 0 else (bit >> -shift)) & wrap
+                        if not bit or not bit & target:
+                            break
+                        other = bit.bit_length() - 1
+                        between[square][other] = passed
+                        line[square][other] = full_line
+                        passed |= bit
+
+    return between, line
+
+BETWEEN, LINE = _build_line_tables()
@@ -7,6 +7,35 @@ import enum
 import random
 
 # Custom Modules
+import bitboard
+from attacks import (
+    BETWEEN,
+    LINE,
+)
+from bitboard import (
+    Position,
+    FULL_BOARD,
+    NUM_PIECE_SETS,
+    NUM_PIECE_TYPES,
+    CASTLE_WHITE_KINGSIDE,
+    CASTLE_WHITE_QUEENSIDE,
+    CASTLE_BLACK_KINGSIDE,
+    CASTLE_BLACK_QUEENSIDE,
+    PAWN,
+    KNIGHT,
+    BISHOP,
+    ROOK,
+    QUEEN,
+    KING,
+    encode_move,
+    iter_squares,
+    move_from,
+    move_promotion,
+    move_to_coords,
+    piece_index,
+    square_coords,
+    square_index,
+)
 from movesets import (
     GenerateRookMoveset,
     GenerateKnightMoveset,
@@ -14,6 +43,9 @@ from movesets import (
     GenerateQueenMoveset,
     GeneratePawnMoveset,
     GenerateKingMoveset,
+    checks_and_pins,
+    in_check,
+    leaves_king_safe,
 )
 
 ascii_delimiter = 97
@@ -82,6 +114,28 @@ MoveGenerators = {
     (Color.BLACK, Piece.QUEEN):  GenerateQueenMoveset(owner='black'),
 }
 
+# Piece enum <-> piece type used to index the bitboards of a Position
+PieceToType = {
+    Piece.PAWN:   bitboard.PAWN,
+    Piece.KNIGHT: bitboard.KNIGHT,
+    Piece.BISHOP: bitboard.BISHOP,
+    Piece.ROOK:   bitboard.ROOK,
+    Piece.QUEEN:  bitboard.QUEEN,
+    Piece.KING:   bitboard.KING,
+}
+
+TypeToPiece = {piece_type: piece for piece, piece_type in PieceToType.items()}
+
+# Moveset generators for each player, in the order generate_movesets()
+# visits the sets of pieces
+_PlayerGenerators = {
+    color.value: [
+        (piece_type, MoveGenerators[(color, piece)])
+        for piece_type, piece in sorted(TypeToPiece.items())
+    ]
+    for color in Color
+}
+
 ColorStrToEnum = {
     "white": Color.WHITE,
     "black": Color.BLACK,
@@ -166,110 +220,163 @@ def display_captured_pieces(captured_pieces, color):
 
     print(capture_str)
 
-def player_movesets(board,
-                    opponent_moveset,
-                    player='white',
-                    en_passant=None):
-
-    # Generate all possible movesets
-    movesets = []
+def board_to_position(board,
+                      player_color=Color.WHITE,
+                      en_passant=None,
+                      castling=None):
+    """
+    Convert a list board (as returned by board_begin()) into a bitboard
+    Position
+
+    :param board:        a BOARD_HEIGHT x BOARD_WIDTH array that contains
+                         all pieces in their specific position on the board
+    :param player_color: Color of the player whose turn it is
+    :param en_passant:   Either None if no pawn is open to en-passant,
+                         or a tuple containing the position of the pawn that
+                         is open to en-passant
+    :param castling:     CASTLE_* flags of the castling rights still available.
+                         If None, a right is assumed to be available whenever
+                         the king and rook are still on their starting squares
+    """
+    pieces = [0] * NUM_PIECE_SETS
     for i, row in enumerate(board):
         for j, tile in enumerate(row):
+            if not tile:
+                continue
+            (color, piece) = tile
+            pieces[piece_index(color.value, PieceToType[piece])] |= 1 << square_index(i, j)
+
+    # The list board keeps track of the pawn that can be captured, while
+    # the position keeps track of the square the capturing pawn moves to
+    if en_passant:
+        (row, col) = en_passant
+        (color, _) = board[row][col]
+        en_passant = square_index(row - 1 if color == Color.WHITE else row + 1, col)
+
+    if castling is None:
+        castling = 0
+        for right, king_square, rook_square, color in (
+                (CASTLE_WHITE_KINGSIDE, (0, 4), (0, 7), Color.WHITE),
+                (CASTLE_WHITE_QUEENSIDE, (0, 4), (0, 0), Color.WHITE),
+                (CASTLE_BLACK_KINGSIDE, (7, 4), (7, 7), Color.BLACK),
+                (CASTLE_BLACK_QUEENSIDE, (7, 4), (7, 0), Color.BLACK)):
+            if board[king_square[0]][king_square[1]] == (color, Piece.KING) and \
+                    board[rook_square[0]][rook_square[1]] == (color, Piece.ROOK):
+                castling |= right
+
+    return Position(pieces,
+                    side=player_color.value,
+                    en_passant=en_passant,
+                    castling=castling)
+
+def position_to_board(position):
+    """
+    Convert a bitboard Position back into a list board
+    """
+    board = [[None] * 8 for _ in range(8)]
+    for square, idx in enumerate(position.squares):
+        if idx is None:
+            continue
+        (row, col) = square_coords(square)
+        (color, piece_type) = divmod(idx, NUM_PIECE_TYPES)
+        board[row][col] = (Color(color), TypeToPiece[piece_type])
 
-            (_, piece) = tile
-            # Pawns require special params for there moveset
-            # generation
-            if piece == Piece.PAWN:
-                moveset_generator = MoveGenerators.get(tile)
-                piece_moveset = moveset_generator((i,j),
-                                                  board,
-                                                  en_passant)
-
-            # Kings also require special params for there
-            # moveset generation
-            if piece == Piece.KING:
-                # Is the king in check (i.e., is it's position in the
-                # opponent's moveset? If so, it needs to move. Discard
-                # all other moves in player moveset and fill with possible
-                # moves for king
-                if (i, j) in [end_pos for (_, end_pos) in opponent_moveset]:
-                   pass
-
-                moveset_generator = MoveGenerators.get(tile)
-                piece_moveset = moveset_generator((i, j),
-                                                  board,
-                                                  opponent_moveset)
+    return board
 
-            else:
-                moveset_generator = MoveGenerators.get(tile)
-                if moveset_generator: piece_moveset = moveset_generator((i, j),
-                                                                        board)
+def move_piece_on_board(board, move):
+    """
+    Perform a move (as generated by generate_movesets()) on a list board.
+    When castling the rook is moved as well, and a pawn captured en-passant
+    is removed from the board
+
+    :return captured: (Color, Piece) of the captured piece, or None
+    """
+    (curr_row, curr_col), (new_row, new_col) = move_to_coords(move)
+    (color, piece) = board[curr_row][curr_col]
+    captured = board[new_row][new_col]
 
-            movesets.append(piece_moveset)
+    # A pawn moving diagonally onto an empty square captures en-passant
+    if piece == Piece.PAWN and curr_col != new_col and not captured:
+        captured = board[curr_row][new_col]
+        board[curr_row][new_col] = None
 
-def generate_movesets(board,
-                      opponent_moveset,
-                      player_color='white',
-                      en_passant=None):
+    # A king moving two squares is castling
+    if piece == Piece.KING and abs(new_col - curr_col) == 2:
+        (rook_col, rook_new_col) = (7, 5) if new_col > curr_col else (0, 3)
+        board[curr_row][rook_new_col] = board[curr_row][rook_col]
+        board[curr_row][rook_col] = None
+
+    promotion = move_promotion(move)
+    if promotion:
+        piece = TypeToPiece[promotion]
+
+    board[new_row][new_col] = (color, piece)
+    board[curr_row][curr_col] = None
+
+    return captured
+
+def generate_movesets(position, player_color=None):
     """
     Generate all movesets available, given a certain state
     of the board
-    """
-    # Initialize a list to keep track of all possible moves available to player
-    possible_moves = []
-    for i, row in enumerate(board):
-        for j, tile in enumerate(row):
 
-            # See if the tile actually represents a piece in play.
-            # If not, continue to next tile
-            if not tile:
-                continue
+    :param position:     bitboard Position
+    :param player_color: Color of the player to generate moves for. Defaults
+                         to the player whose turn it is
 
-            (color, piece) = tile
+    :return possible_moves: list of moves, packed as by bitboard.encode_move()
+    """
+    color = position.side if player_color is None else player_color.value
+
+    # Work out which moves can't leave the king in check up front: when in
+    # check, pieces other than the king can only capture the checking piece
+    # or block it, and a pinned piece can only move along its pin
+    king_square = position.king_square(color)
+    (checkers, pinned) = checks_and_pins(position, color)
+    if not checkers:
+        check_mask = FULL_BOARD
+    elif checkers & (checkers - 1):
+        # Double check: only the king can move
+        check_mask = 0
+    else:
+        check_mask = checkers | BETWEEN[king_square][checkers.bit_length() - 1]
+
+    # En-passant captures remove a pawn from a square other than the
+    # destination, so they're checked by playing them out
+    if position.en_passant is not None and position.side == color:
+        en_passant = 1 << position.en_passant
+    else:
+        en_passant = 0
 
-            # If the piece belongs to the other player, move on
-            if color != player_color:
-                continue
+    # Initialize a list to keep track of all possible moves available to player
+    possible_moves = []
+    for piece_type, moveset_generator in _PlayerGenerators[color]:
+        for square in iter_squares(position.pieces[piece_index(color, piece_type)]):
+            piece_moveset = moveset_generator(square, position)
 
-            moveset_generator = MoveGenerators.get(tile)
-
-            # Keep King's movesets seperate from the rest of the pieces.
-            # The moveset available to the king will be dependent on the
-            # movesets
-            if piece == Piece.KING:
-
-                piece_moveset = moveset_generator((i, j),
-                                                  board,
-                                                  opponent_moveset)
-
-                # Is the king in check (i.e., is it's position in the
-                # opponent's moveset? If so, it needs to move. Discard
-                # all other moves in player moveset, fill with possible
-                # moves for king, and return those moves
-                if (i, j) in [end_pos for (_, end_pos) in opponent_moveset]:
-                    possible_moves.clear()
-                    possible_moves.extend([((i, j), move) for move in piece_moveset])
-                    return possible_moves
-
-            # The pawn's moveset varies from the rest of the pieces, as it
-            # relies on the previous state of the board (did an opposing
-            # pawn just move two spaces from start?)
-            elif piece == Piece.PAWN:
-                piece_moveset = moveset_generator((i, j),
-                                                  board,
-                                                  en_passant=en_passant)
+            # Discard moves that would place the player's own king in check
+            if piece_type == KING:
+                safe = piece_moveset if not checkers else 0
             else:
-                piece_moveset = moveset_generator((i, j),
-                                                  board)
-
-            possible_moves.extend([((i, j), move) for move in piece_moveset])
+                if (pinned >> square) & 1:
+                    piece_moveset &= LINE[king_square][square]
+                safe = piece_moveset & check_mask & ~en_passant
+
+            for dest in iter_squares(piece_moveset):
+                if (not (safe >> dest) & 1 and
+                        not leaves_king_safe(position, color, square, dest)):
+                    continue
+
+                # A pawn reaching the last rank has to be promoted
+                if piece_type == PAWN and (dest < 8 or dest >= 56):
+                    for promotion in (QUEEN, ROOK, BISHOP, KNIGHT):
+                        possible_moves.append(encode_move(square, dest, promotion))
+                else:
+                    possible_moves.append(square | (dest << 6))
 
     return possible_moves
 
-def human_turn(board,
-               opponent_moveset,
-               player_color='white',
-               en_passant=None):
+def human_turn(position, player_color=None):
     """
     Generates all moves available to player based on state of
     board and presents them as options to the command line
@@ -277,88 +384,52 @@ def human_turn(board,
     choice_idx = ascii_delimiter
     mod = None
     moveset_dictionary = {}
-    for i, row in enumerate(board):
-        for j, tile in enumerate(row):
-
-            # If the tile is not an actual piece, move on
-            if not tile:
-                continue
-
-            (color, piece) = tile
-
-            # If the piece is not the player's, move on
-            if color != player_color:
-                continue
-
-            # Generate moves for player pieces
-            moveset_generator = MoveGenerators.get(tile)
-
-            if piece == Piece.KING:
-                piece_moveset = moveset_generator((i, j),
-                                                  board,
-                                                  opponent_moveset)
-            elif piece == Piece.PAWN:
-                piece_moveset = moveset_generator((i, j),
-                                                  board,
-                                                  en_passant=en_passant)
-            else:
-                piece_moveset = moveset_generator((i, j),
-                                                  board)
-
-            # Convert current position of piece into grid coordinates
-            pos_in_grid_coords = convert_int_to_grid_coords((i, j))
-            for move in piece_moveset:
-                dest_in_grid_coords = convert_int_to_grid_coords(move)
-
-                # Present choices to players as dictionary with ordered character
-                # indices as keys
-                if mod:
-                    print("{0}) {1} {2} -> {3}".format(chr(mod) + chr(choice_idx),
-                                                       Names.get(tile),
-                                                       pos_in_grid_coords,
-                                                       dest_in_grid_coords))
-                else:
-                    print("{0}) {1} {2} -> {3}".format(chr(choice_idx),
-                                                       Names.get(tile),
-                                                       pos_in_grid_coords,
-                                                       dest_in_grid_coords))
-                if mod:
-                    moveset_dictionary[chr(mod) + chr(choice_idx)] = ((i, j), move)
-                else:
-                    moveset_dictionary[chr(choice_idx)] = ((i, j), move)
-                choice_idx += 1
-                if (choice_idx - ascii_delimiter) > 25 and not mod:
-                    choice_idx = ascii_delimiter
-                    mod = ascii_delimiter
-                elif (choice_idx - ascii_delimiter) > 25:
-                    choice_idx = ascii_delimiter
-                mod += 1
+    for move in generate_movesets(position, player_color):
+        (i, j), (new_i, new_j) = move_to_coords(move)
+        (color, piece_type) = position.piece_at(move_from(move))
+        tile = (Color(color), TypeToPiece[piece_type])
+
+        # Convert positions into grid coordinates (which expect (col, row))
+        pos_in_grid_coords = convert_int_to_grid_coords((j, i))
+        dest_in_grid_coords = convert_int_to_grid_coords((new_j, new_i))
+
+        # Present choices to players as dictionary with ordered character
+        # indices as keys
+        if mod:
+            key = chr(mod) + chr(choice_idx)
+        else:
+            key = chr(choice_idx)
+        print("{0}) {1} {2} -> {3}".format(key,
+                                           Names.get(tile),
+                                           pos_in_grid_coords,
+                                           dest_in_grid_coords))
+        moveset_dictionary[key] = move
+
+        choice_idx += 1
+        if (choice_idx - ascii_delimiter) > 25 and not mod:
+            choice_idx = ascii_delimiter
+            mod = ascii_delimiter
+        elif (choice_idx - ascii_delimiter) > 25:
+            choice_idx = ascii_delimiter
+            mod += 1
 
     return moveset_dictionary
 
-def check_for_checkmate(board,
-                        player_moveset,
-                        player_color='white'):
+def check_for_checkmate(position,
+                        player_color=None):
     """
     Checks for checkmate after player has made their turn
 
-    returns True if the king is in checkmate. Else, False
+    returns True if the king of player_color (by default, the player
+    whose turn it is) is in checkmate. Else, False
     """
-    # Check if king is threatened by player pieces
-    player_enum_color = ColorStrToEnum[player_color]
-    for i, row in enumerate(board):
-        king_coords = (i, row.index((player_enum_color, Piece.KING)))
+    color = position.side if player_color is None else player_color.value
 
-    if king_coords in [threat_spaces for (_, threat_spaces) in player_moveset]:
+    # The king has to be threatened, and no move can get it out of check
+    if not in_check(position, color):
+        return False
 
-        # Check if the king is able to make any moves. If not, this is checkmate
-        moveset_generator = MoveGenerators((player_color, Piece.KING))
-        if not moveset_generator(king_coords,
-                                 board,
-                                 player_moveset):
-            return True
-
-    return False
+    return not generate_movesets(position, Color(color))
 
 def convert_int_to_grid_coords(int_coords):
     """
@@ -404,7 +475,6 @@ if __name__ == '__main__':
     board = board_begin()
 
     # Initialize game loop
-    opponent_moveset = None
     en_passant = None
     captured_pieces = {
         Color.WHITE : [],
@@ -420,94 +490,57 @@ if __name__ == '__main__':
     checkmate = False
     while not checkmate:
 
+        # Convert the board into a position to generate moves on
+        position = board_to_position(board,
+                                     player_color=turn,
+                                     en_passant=en_passant)
+
         # Allow player to move
         if turn == player_enum_color:
             # Generate moves available to player
-            player_move_dict = player_movesets(board,
-                                               opponent_moveset,
-                                               player=ColorEnumToStr[turn],
-                                               en_passant=en_passant)
+            player_move_dict = human_turn(position)
 
             while True:
-                for key, value in player_move_dict:
-                    (row, col) = value[0]
-                    piece = board[row][col]
-                    print("{0}) {1}: {2} -> {3}".format(key,
-                                                        piece,
-                                                        value[0],
-                                                        value[1]
-                                                        ))
-
                 chosen_key = input("Chose move: ")
 
                 try:
                     move = player_move_dict[chosen_key]
+                    break
                 except KeyError:
                     print("Sorry, that input was not understood. Try again.")
 
-            # Perform player chosen move
-            (curr_row, curr_col), (new_row, new_col) = move
-            player_piece = board[curr_row][curr_col]
-
-            # Is there an opposing piece at that position?
-            # If so, place it in captured pieces list
-            if board[new_row][new_col]:
-                (color, piece_type) = board[new_row][new_col]
-                captured_pieces[color].append(piece_type)
-
-            # Move piece to new position and clear old position
-            board[new_row][new_col] = player_piece
-            board[curr_row][curr_col] = None
-
         # Process computer player movement (literally just a random
         # movement generator for now)
         else:
-            computer_movesets = generate_movesets(board, opponent_moveset,
-                                                  player_color=turn,
-                                                  en_passant=en_passant)
-            r = random.randint(len(computer_movesets))
-            (curr_row, curr_col), (new_row, new_col) = computer_movesets[r]
-
-            # Perform randomly chosen move
-            computer_piece = board[curr_row][curr_col]
-
-            # Is there an opposing piece at that position?
-            # If so, place it in captured pieces list
-            if board[new_row][new_col]:
-                (color, piece_type) = board[new_row][new_col]
-                captured_pieces[color].append(piece_type)
-
-            # move piece to new position and clear old position
-            # Move piece to new position and clear old position
-            board[new_row][new_col] = computer_piece
-            board[curr_row][curr_col] = None
-
-            # Generate this player's moveset after piece was moved
-            # and store it for next turn, so that we can generate
-            # the other player's new moveset
-
-
-
+            computer_movesets = generate_movesets(position)
+            move = random.choice(computer_movesets)
+
+        # Perform chosen move. Is there an opposing piece at that position?
+        # If so, place it in captured pieces list
+        captured = move_piece_on_board(board, move)
+        if captured:
+            (color, piece_type) = captured
+            captured_pieces[color].append(piece_type)
+
+        # Did a pawn just move two spaces from its starting position?
+        (curr_row, _), (new_row, new_col) = move_to_coords(move)
+        if board[new_row][new_col][1] == Piece.PAWN and abs(new_row - curr_row) == 2:
+            en_passant = (new_row, new_col)
+        else:
+            en_passant = None
 
         # display state of board
         display_board(board)
-        capt_white_pieces = captured_pieces[Color.WHITE]
-        capt_black_pieces = captured_pieces[Color.BLACK]
-        display_captured_pieces(capt_white_pieces, Color.WHITE)
-        display_captured_pieces(capt_black_pieces, Color.BLACK)
+        display_captured_pieces(captured_pieces, Color.WHITE)
+        display_captured_pieces(captured_pieces, Color.BLACK)
 
         # Switch turns
         turn = switch[turn]
 
-
-
-
-
-
-
-
-
-
+        # Has the player who just moved checkmated their opponent?
+        checkmate = check_for_checkmate(board_to_position(board,
+                                                          player_color=turn,
+                                                          en_passant=en_passant))
 
     board = board_begin()
     display_board(board, index=True)
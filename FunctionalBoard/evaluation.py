@@ -0,0 +1,127 @@
+"""
+Static evaluation of a position: material plus piece-square tables
+
+Scores are in centipawns, from the point of view of the side to move.
+"""
+from bitboard import (
+    BLACK,
+    WHITE,
+    PAWN,
+    KNIGHT,
+    BISHOP,
+    ROOK,
+    QUEEN,
+    KING,
+    NUM_PIECE_TYPES,
+)
+
+# Material value of each piece type, indexed by piece type
+PIECE_VALUES = (100, 320, 330, 500, 900, 20000)
+
+# Piece-square tables, as seen from white's side of the board: the first
+# row is the 8th rank, the last row the 1st rank
+_PAWN_TABLE = (
+      0,   0,   0,   0,   0,   0,   0,   0,
+     50,  50,  50,  50,  50,  50,  50,  50,
+     10,  10,  20,  30,  30,  20,  10,  10,
+      5,   5,  10,  25,  25,  10,   5,   5,
+      0,   0,   0,  20,  20,   0,   0,   0,
+      5,  -5, -10,   0,   0, -10,  -5,   5,
+      5,  10,  10, -20, -20,  10,  10,   5,
+      0,   0,   0,   0,   0,   0,   0,   0,
+)
+_KNIGHT_TABLE = (
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20,   0,   0,   0,   0, -20, -40,
+    -30,   0,  10,  15,  15,  10,   0, -30,
+    -30,   5,  15,  20,  20,  15,   5, -30,
+    -30,   0,  15,  20,  20,  15,   0, -30,
+    -30,   5,  10,  15,  15,  10,   5, -30,
+    -40, -20,   0,   5,   5,   0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50,
+)
+_BISHOP_TABLE = (
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,  10,  10,   5,   0, -10,
+    -10,   5,   5,  10,  10,   5,   5, -10,
+    -10,   0,  10,  10,  10,  10,   0, -10,
+    -10,  10,  10,  10,  10,  10,  10, -10,
+    -10,   5,   0,   0,   0,   0,   5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20,
+)
+_ROOK_TABLE = (
+      0,   0,   0,   0,   0,   0,   0,   0,
+      5,  10,  10,  10,  10,  10,  10,   5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+      0,   0,   0,   5,   5,   0,   0,   0,
+)
+_QUEEN_TABLE = (
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,   5,   5,   5,   0, -10,
+     -5,   0,   5,   5,   5,   5,   0,  -5,
+      0,   0,   5,   5,   5,   5,   0,  -5,
+    -10,   5,   5,   5,   5,   5,   0, -10,
+    -10,   0,   5,   0,   0,   0,   0, -10,
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+)
+_KING_TABLE = (
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+     20,  20,   0,   0,   0,   0,  20,  20,
+     20,  30,  10,   0,   0,  10,  30,  20,
+)
+
+def _build_square_values():
+    """
+    Value of each piece set (indexed as Position.pieces) on each square
+    (indexed as in bitboard.py), material included. Black's tables are
+    white's mirrored vertically
+    """
+    tables = (_PAWN_TABLE, _KNIGHT_TABLE, _BISHOP_TABLE, _ROOK_TABLE, _QUEEN_TABLE, _KING_TABLE)
+    square_values = [None] * (2 * NUM_PIECE_TYPES)
+    for piece_type in (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING):
+        table = tables[piece_type]
+        value = PIECE_VALUES[piece_type]
+        white = [0] * 64
+        black = [0] * 64
+        for square in range(64):
+            (row, col) = divmod(square, 8)
+            white[square] = value + table[(7 - row) * 8 + col]
+            black[square] = value + table[row * 8 + col]
+        square_values[WHITE * NUM_PIECE_TYPES + piece_type] = white
+        square_values[BLACK * NUM_PIECE_TYPES + piece_type] = black
+    return square_values
+
+SQUARE_VALUES = _build_square_values()
+
+
+def evaluate(position):
+    """
+    Static evaluation of the position
+
+    :return score: in centipawns, positive if the side to move is ahead
+    """
+    score = 0
+    for idx, bitboard in enumerate(position.pieces):
+        values = SQUARE_VALUES[idx]
+        total = 0
+        while bitboard:
+            lsb = bitboard & -bitboard
+            total += values[lsb.bit_length() - 1]
+            bitboard ^= lsb
+        if idx >= NUM_PIECE_TYPES:
+            score += total
+        else:
+            score -= total
+
+    return score if position.side == WHITE else -score
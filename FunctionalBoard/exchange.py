@@ -0,0 +1,118 @@
+"""
+Static exchange evaluation (SEE): the material a capture wins or loses once
+every piece attacking the target square has had the chance to recapture,
+without searching the moves
+
+Both sides capture with their least valuable attacker first, and either can
+stop capturing when going on would lose material. Pieces that move off the
+square's lines uncover the sliders behind them (x-rays), so the attackers
+are recomputed from the occupancy left after every capture.
+"""
+from attacks import (
+    KNIGHT_ATTACKS,
+    KING_ATTACKS,
+    PAWN_ATTACKS,
+    bishop_attacks_from,
+    rook_attacks_from,
+)
+from bitboard import (
+    BLACK,
+    WHITE,
+    PAWN,
+    KNIGHT,
+    BISHOP,
+    ROOK,
+    QUEEN,
+    KING,
+    NUM_PIECE_TYPES,
+)
+from evaluation import PIECE_VALUES
+
+_ATTACKER_ORDER = (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING)
+
+
+def attackers_to(position, square, occupied):
+    """
+    Pieces of either side attacking the square, given the occupied squares.
+    Only pieces still on an occupied square count
+    """
+    pieces = position.pieces
+    black = BLACK * NUM_PIECE_TYPES
+    white = WHITE * NUM_PIECE_TYPES
+    rooks = (pieces[black + ROOK] | pieces[black + QUEEN] |
+             pieces[white + ROOK] | pieces[white + QUEEN])
+    bishops = (pieces[black + BISHOP] | pieces[black + QUEEN] |
+               pieces[white + BISHOP] | pieces[white + QUEEN])
+
+    # A pawn attacks the square if a pawn of the other color standing on
+    # the square would attack the pawn
+    attackers = ((PAWN_ATTACKS[BLACK][square] & pieces[white + PAWN]) |
+                 (PAWN_ATTACKS[WHITE][square] & pieces[black + PAWN]) |
+                 (KNIGHT_ATTACKS[square] & (pieces[black + KNIGHT] | pieces[white + KNIGHT])) |
+                 (KING_ATTACKS[square] & (pieces[black + KING] | pieces[white + KING])) |
+                 (rook_attacks_from(square, occupied) & rooks) |
+                 (bishop_attacks_from(square, occupied) & bishops))
+    return attackers & occupied
+
+def see(position, move):
+    """
+    Static exchange evaluation of a move
+
+    :return gain: material (in centipawns) the side to move wins by making
+                  the move and then trading on its destination square,
+                  negative if it loses material
+    """
+    from_square = move & 63
+    to_square = (move >> 6) & 63
+    promotion = move >> 12
+    pieces = position.pieces
+    squares = position.squares
+
+    moving = squares[from_square] % NUM_PIECE_TYPES
+    occupied = position.occupied ^ (1 << from_square)
+    victim = squares[to_square]
+    if victim is not None:
+        gain = PIECE_VALUES[victim % NUM_PIECE_TYPES]
+    elif moving == PAWN and to_square == position.en_passant:
+        gain = PIECE_VALUES[PAWN]
+        occupied ^= 1 << (to_square - 8 if position.side == WHITE else to_square + 8)
+    else:
+        gain = 0
+
+    # The piece left standing on the square, and what it's worth
+    if promotion:
+        gain += PIECE_VALUES[promotion] - PIECE_VALUES[PAWN]
+        on_square = PIECE_VALUES[promotion]
+    else:
+        on_square = PIECE_VALUES[moving]
+
+    gains = [gain]
+    side = position.side ^ 1
+    occupancy = position.occupancy
+    while True:
+        attackers = attackers_to(position, to_square, occupied) & occupancy[side]
+        if not attackers:
+            break
+
+        # Least valuable attacker
+        offset = side * NUM_PIECE_TYPES
+        for piece_type in _ATTACKER_ORDER:
+            candidates = attackers & pieces[offset + piece_type]
+            if candidates:
+                break
+
+        # The king can only recapture if nothing defends the square
+        if (piece_type == KING and
+                attackers_to(position, to_square, occupied) & occupancy[side ^ 1]):
+            break
+
+        gains.append(on_square - gains[-1])
+        on_square = PIECE_VALUES[piece_type]
+        occupied ^= candidates & -candidates
+        side ^= 1
+
+    # Each side stops capturing when it would lose by going on
+    for i in range(len(gains) - 1, 0, -1):
+        gains[i - 1] = -max(-gains[i - 1], gains[i])
+
+    return gains[0]
@@ -0,0 +1,193 @@
+"""
+Forsyth-Edwards Notation (FEN): reading and writing positions as text
+
+    rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1
+
+The six fields are the piece placement (8th rank first, a-file first in
+each rank), the side to move, the castling rights, the en-passant square,
+the halfmove clock and the fullmove number. The last two can be left out
+(as in EPD records), and default to 0 and 1.
+
+All the lookup tables are built once, at import, so converting thousands
+of FENs in bulk (positions_from_fens) costs no more than the conversions
+themselves.
+"""
+# Custom Modules
+from bitboard import (
+    BLACK,
+    WHITE,
+    PAWN,
+    KNIGHT,
+    BISHOP,
+    ROOK,
+    QUEEN,
+    KING,
+    NUM_PIECE_TYPES,
+    CASTLE_WHITE_KINGSIDE,
+    CASTLE_WHITE_QUEENSIDE,
+    CASTLE_BLACK_KINGSIDE,
+    CASTLE_BLACK_QUEENSIDE,
+    Position,
+)
+
+STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+_PIECE_LETTERS = {
+    PAWN: 'p',
+    KNIGHT: 'n',
+    BISHOP: 'b',
+    ROOK: 'r',
+    QUEEN: 'q',
+    KING: 'k',
+}
+
+# Letter of each set of pieces (indexed as Position.pieces), and back
+_SET_LETTERS = [None] * (2 * NUM_PIECE_TYPES)
+for _piece_type, _letter in _PIECE_LETTERS.items():
+    _SET_LETTERS[BLACK * NUM_PIECE_TYPES + _piece_type] = _letter
+    _SET_LETTERS[WHITE * NUM_PIECE_TYPES + _piece_type] = _letter.upper()
+_LETTER_SETS = {letter: idx for idx, letter in enumerate(_SET_LETTERS)}
+
+# Ranks of the placement field are expanded to one character per square,
+# digits becoming that many dots
+_EXPAND_RANK = str.maketrans({str(n): '.' * n for n in range(1, 9)})
+
+# Square of each character of an expanded placement field
+_PLACEMENT_SQUARES = [(7 - i // 8) * 8 + i % 8 for i in range(64)]
+
+_CASTLING_LETTERS = (
+    ('K', CASTLE_WHITE_KINGSIDE),
+    ('Q', CASTLE_WHITE_QUEENSIDE),
+    ('k', CASTLE_BLACK_KINGSIDE),
+    ('q', CASTLE_BLACK_QUEENSIDE),
+)
+_CASTLING_FLAGS = dict(_CASTLING_LETTERS)
+
+_SIDES = {'w': WHITE, 'b': BLACK}
+
+_SQUARE_NAMES = [col + row for row in '12345678' for col in 'abcdefgh']
+_SQUARES = {name: square for square, name in enumerate(_SQUARE_NAMES)}
+
+
+def square_name(square):
+    """
+    Name of a square (indexed as in bitboard.py), e.g. 'e4'
+    """
+    return _SQUARE_NAMES[square]
+
+def parse_square(name):
+    """
+    Square (indexed as in bitboard.py) of a name such as 'e4'
+    """
+    try:
+        return _SQUARES[name]
+    except KeyError:
+        raise ValueError("Invalid square: {0!r}".format(name))
+
+def parse_fen(fen):
+    """
+    Split a FEN string into its fields
+
+    :return (pieces, side, castling, en passant, halfmove clock, fullmove
+             number): as the arguments of Position()
+    """
+    fields = fen.split()
+    if not 4 <= len(fields) <= 6:
+        raise ValueError("Invalid FEN, expected 4 to 6 fields: {0!r}".format(fen))
+
+    ranks = fields[0].translate(_EXPAND_RANK).split('/')
+    if len(ranks) != 8 or any(len(rank) != 8 for rank in ranks):
+        raise ValueError("Invalid FEN piece placement: {0!r}".format(fields[0]))
+    pieces = [0] * (2 * NUM_PIECE_TYPES)
+    for i, char in enumerate(''.join(ranks)):
+        if char != '.':
+            try:
+                pieces[_LETTER_SETS[char]] |= 1 << _PLACEMENT_SQUARES[i]
+            except KeyError:
+                raise ValueError("Invalid FEN piece: {0!r}".format(char))
+    # Move generation relies on each side having exactly one king
+    for color in (WHITE, BLACK):
+        kings = pieces[color * NUM_PIECE_TYPES + KING]
+        if not kings or kings & (kings - 1):
+            raise ValueError("Invalid FEN piece placement, {0} must have one king: {1!r}".format(
+                'white' if color == WHITE else 'black', fields[0]))
+
+    try:
+        side = _SIDES[fields[1]]
+    except KeyError:
+        raise ValueError("Invalid FEN side to move: {0!r}".format(fields[1]))
+
+    castling = 0
+    if fields[2] != '-':
+        for char in fields[2]:
+            try:
+                castling |= _CASTLING_FLAGS[char]
+            except KeyError:
+                raise ValueError("Invalid FEN castling rights: {0!r}".format(fields[2]))
+
+    en_passant = None if fields[3] == '-' else parse_square(fields[3])
+
+    halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+    fullmove_number = int(fields[5]) if len(fields) > 5 else 1
+
+    return pieces, side, castling, en_passant, halfmove_clock, fullmove_number
+
+def position_from_fen(fen):
+    """
+    Position described by a FEN string
+
+    :raise ValueError: if the string isn't valid FEN
+    """
+    (pieces, side, castling, en_passant, halfmove_clock, fullmove_number) = parse_fen(fen)
+    return Position(pieces,
+                    side=side,
+                    en_passant=en_passant,
+                    castling=castling,
+                    halfmove_clock=halfmove_clock,
+                    fullmove_number=fullmove_number)
+
+def position_to_fen(position):
+    """
+    FEN string describing a Position
+    """
+    squares = position.squares
+    ranks = []
+    for row in range(7, -1, -1):
+        rank = ''
+        empty = 0
+        for square in range(row * 8, row * 8 + 8):
+            idx = squares[square]
+            if idx is None:
+                empty += 1
+            else:
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                rank += _SET_LETTERS[idx]
+        if empty:
+            rank += str(empty)
+        ranks.append(rank)
+
+    castling = ''.join(letter for letter, flag in _CASTLING_LETTERS if position.castling & flag)
+    return "{0} {1} {2} {3} {4} {5}".format(
+        '/'.join(ranks),
+        'w' if position.side == WHITE else 'b',
+        castling or '-',
+        '-' if position.en_passant is None else _SQUARE_NAMES[position.en_passant],
+        position.halfmove_clock,
+        position.fullmove_number)
+
+def positions_from_fens(fens):
+    """
+    Positions described by an iterable of FEN strings (such as the lines of
+    a file). Blank lines are skipped
+
+    :return positions: list of Positions
+    """
+    return [position_from_fen(fen) for fen in fens if fen.strip()]
+
+def positions_to_fens(positions):
+    """
+    FEN strings describing an iterable of Positions
+    """
+    return [position_to_fen(position) for position in positions]
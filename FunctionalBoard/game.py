@@ -1,89 +1,39 @@
-import random
-
 # Custom Modules
-from board import Piece, Color, MoveGenerators, board_begin
-
-def board_state_generator(board, en_passant=None):
+from bitboard import NUM_PIECE_TYPES, move_from, move_to_coords
+from board import (
+    Piece,
+    Color,
+    Names,
+    TypeToPiece,
+    ascii_delimiter,
+    board_begin,
+    board_to_position,
+    check_for_checkmate,
+    convert_int_to_grid_coords,
+    generate_movesets,
+)
+from search import Searcher
+
+# Time the computer gets to think about each of its moves, in seconds
+COMPUTER_MOVE_TIME = 2.0
+
+def board_state_generator(position):
     """
     Function to generate the movesets available to a player,
     given state of board
 
-    :param board:      a BOARD_HEIGHT x BOARD_WIDTH array that contains
-                       all pieces in their specific position on the board
-    :param en_passant: Either None if no pawn is open to en-passant,
-                       or a tuple containing the position of the pawn that
-                       is open to en-passant
+    :param position: bitboard Position holding all pieces in their specific
+                     position on the board, along with the en-passant square
 
     :return white_moveset: movesets available to white
     :return black_moveset: movesets available to black
     """
-    white_movesets = []
-    black_movesets = []
-    for row in range(BOARD_HEIGHT):
-        for col in range(BOARD_WIDTH):
-
-            # Traverse board and generate the moveset for all pieces
-            # If there is not a piece at position at board, continue
-            # to next position
-            if not board[row][col]:
-                continue
-
-            (pcolor, piece) = board[row][col]
-
-            moveset_generator = MoveGenerators[(pcolor, piece)]
-            # Pawns require a unique input (en-passant), as the ability
-            # of a pawn to perform en-passant relies on if a pawn was
-            # moved last turn in a specific manner
-            if piece == Piece.PAWN:
-                moveset = moveset_generator((row, col), board,
-                                            en_passant=en_passant)
-
-            # Save moveset generation for king for last, as that is dependent
-            # on the moveset of the other player (a king cannot place itself
-            # in check)
-            elif piece == Piece.KING:
-                if pcolor == Color.WHITE:
-                    white_king_pos = (row, col)
-                else:
-                    black_king_pos = (row, col)
-
-            else:
-                moveset = moveset_generator((row, col), board)
-
-            # Add to corresponding player's moveset
-            if pcolor == Color.WHITE:
-                white_movesets.extend(moveset)
-
-            else:
-                black_movesets.extend(moveset)
-
-    # Now generate kings' movesets
-    wk_row, wk_col = white_king_pos
-    wking = board[wk_row][wk_col]
-    wk_moveset_gen = MoveGenerators[wking]
-    wk_moveset = wk_moveset_gen((wk_row, wk_col),
-                                board,
-                                white_movesets,
-                                black_movesets)
-    white_movesets.extend(wk_moveset)
-
-    bk_row, bk_col = black_king_pos
-    bking = board[bk_row][bk_col]
-    bk_moveset_gen = MoveGenerators[bking]
-    bk_moveset = bk_moveset_gen((bk_row, bk_col),
-                                board,
-                                black_movesets,
-                                white_movesets)
-
-    # Cross reference black movesets and see if any of the pieces
-    # place the white king in check (remember...we generated the
-    # white king's moveset without knowing if any of the black king's
-    # moves would place it in check
-    white_movesets = filter(lambda move: (move not in wk_moveset), white_movesets)
-    wk_moveset = wk_moveset_gen((wk_row, wk_col),
-                                board,
-                                white_movesets,
-                                black_movesets)
+    # The king of each player can't move onto any square threatened by the
+    # other player's pieces, and no other piece can leave it in check. The
+    # threats are checked against the position directly, so the two
+    # movesets no longer need to be cross-referenced against each other
+    white_movesets = generate_movesets(position, Color.WHITE)
+    black_movesets = generate_movesets(position, Color.BLACK)
 
     return white_movesets, black_movesets
 
@@ -96,8 +46,8 @@ def checkForEnPassant(board, chosen_move):
     Check if the piece we just moved will be open to en-passant
     next turn
     """
-    (curr_row, curr_col), (new_row, new_col) = chosen_move
-    (color, piece_type) = board[curr_row, curr_col]
+    (curr_row, curr_col), (new_row, new_col) = move_to_coords(chosen_move)
+    (color, piece_type) = board[curr_row][curr_col]
     if piece_type == Piece.PAWN:
         # Did the pawn move two spaces from starting position?
         # If so, return coordinates of pawn open to en-passant
@@ -106,12 +56,14 @@ def checkForEnPassant(board, chosen_move):
 
     return None
 
-def checkForCheckmate(white_movesets,
-                      black_movesets):
-   pass
+def checkForCheckmate(position):
+    """
+    Checks if the player whose turn it is has been checkmated
+    """
+    return check_for_checkmate(position)
 
 
-def human_turn(moveset):
+def human_turn(position, moveset):
     """
     Generates all moves available to player based on state of
     board and presents them as options to the command line
@@ -120,53 +72,48 @@ def human_turn(moveset):
     mod = None
     moveset_dictionary = {}
     for move in moveset:
-        curr_coords = move[0]
-        dest_coords = move[1]
-        curr_pos_in_grid = convert_int_to_grid_coords(curr_coords)
-        dest_pos_in_grid = convert_int_to_grid_coords(dest_coords)
+        (curr_row, curr_col), (dest_row, dest_col) = move_to_coords(move)
+        curr_pos_in_grid = convert_int_to_grid_coords((curr_col, curr_row))
+        dest_pos_in_grid = convert_int_to_grid_coords((dest_col, dest_row))
+
+        (color, piece_type) = position.piece_at(move_from(move))
+        tile = (Color(color), TypeToPiece[piece_type])
 
         # Present choices to players as dictionary with ordered character
         # indices as keys
         if mod:
-            print("{0}) {1} {2} -> {3}".format(chr(mod) + chr(choice_idx),
-                                               Names.get(tile),
-                                               curr_pos_in_grid,
-                                               dest_pos_in_grid))
+            key = chr(mod) + chr(choice_idx)
         else:
-            print("{0}) {1} {2} -> {3}".format(chr(choice_idx),
-                                               Names.get(tile),
-                                               curr_pos_in_grid,
-                                               dest_pos_in_grid))
-        if mod:
-            moveset_dictionary[chr(mod) + chr(choice_idx)] = move
-        else:
-            moveset_dictionary[chr(choice_idx)] = move
+            key = chr(choice_idx)
+        print("{0}) {1} {2} -> {3}".format(key,
+                                           Names.get(tile),
+                                           curr_pos_in_grid,
+                                           dest_pos_in_grid))
+        moveset_dictionary[key] = move
+
         choice_idx += 1
         if (choice_idx - ascii_delimiter) > 25 and not mod:
             choice_idx = ascii_delimiter
             mod = ascii_delimiter
         elif (choice_idx - ascii_delimiter) > 25:
             choice_idx = ascii_delimiter
-        mod += 1
+            mod += 1
 
     return moveset_dictionary
 
-def choose_random_move(moveset):
-    """
-    The most basic of AI...as in its not an AI...
-    """
-    num_moves = len(moveset)
-    r = random.randint(num_moves)
-    return moveset[r]
-
 if __name__ == '__main__':
 
+    # Which color is the human playing as? (None lets the computer
+    # play against itself)
+    player = {
+        'white': Color.WHITE,
+        'black': Color.BLACK,
+    }.get(input("Choose color (white/black/none): ").lower())
+
     # Initialize game board
-    board = board_begin()
+    position = board_to_position(board_begin())
 
     # init vars for game
-    white_movesets = []
-    black_movesets = []
     captured_pieces = {
         Color.WHITE : [],
         Color.BLACK: [],
@@ -176,17 +123,28 @@ if __name__ == '__main__':
         Color.BLACK : Color.WHITE,
     }
     turn = Color.WHITE
-    en_passant = None
 
-    # Run loop for game
-    checkmate = False
-    while not checkmate:
+    # Undo records of every move performed, so moves can be taken back
+    history = []
+
+    # The computer's moves are searched for. The same searcher is kept for
+    # the whole game, so each search builds on what the last one found
+    searcher = Searcher(max_time=COMPUTER_MOVE_TIME)
+
+    # Generate state of the board before first player makes move
+    white_movesets, black_movesets = board_state_generator(position)
+
+    # Run loop for game, until the player to move has no legal move left
+    while True:
 
+        moveset = white_movesets if turn == Color.WHITE else black_movesets
+        if not moveset:
+            break
 
         if turn == Color.WHITE:
             # Is it the player's turn?
             if player == Color.WHITE:
-                moveset_dict = human_turn(white_movesets)
+                moveset_dict = human_turn(position, white_movesets)
                 while(True):
                     move_key = input("Input chosen move: ")
                     try:
@@ -196,15 +154,16 @@ if __name__ == '__main__':
                         print("Input not understood. Try again.")
                         confirmation = input("Reprint possible moves? (y/n): ")
                         if confirmation.lower() == 'y' or confirmation.lower() == 'yes':
-                            moveset_dict = human_turn(white_movesets)
+                            moveset_dict = human_turn(position, white_movesets)
 
             else:
-                chosen_move = choose_random_move(white_movesets)
+                chosen_move = searcher.choose_move(position,
+                                                   history=[undo[5] for undo in history])
 
         else:
             # Is it the player's turn?
             if player == Color.BLACK:
-                moveset_dict = human_turn(black_movesets)
+                moveset_dict = human_turn(position, black_movesets)
                 while(True):
                     move_key = input("Input chosen move: ")
                     try:
@@ -214,35 +173,36 @@ if __name__ == '__main__':
                         print("Input not understood. Try again.")
                         confirmation = input("Reprint possible moves? (y/n): ")
                         if confirmation.lower() == 'y' or confirmation.lower() == 'yes':
-                            moveset_dict = human_turn(black_movesets)
+                            moveset_dict = human_turn(position, black_movesets)
 
             else:
-                chosen_move = choose_random_move(black_movesets)
-
-        # Is the piece we're moving a pawn? If so, does it open itself
-        # to en-passant?
-        en_passant = checkForEnPassant(board, chosen_move)
-
-        # Enact move
-        (curr_row, curr_col), (new_row, new_col) = chosen_move
-        piece = board[curr_row][curr_col]
-
-        # Is there an opponent piece where we are moving to? If so, remove it
-        # and add it to list of captured pieces
-        if board[new_row][new_col]:
-            (color, piece_type) = board[new_row][new_col]
-            captured_pieces[color].append(piece_type)
-
-        # move piece to chosen position
-        board[new_row][new_col] = piece
-
-        # place an empty square at position piece was moved from
-        board[curr_row][curr_col] = None
-
-        # Perform check for checkmate
-        checkmate = checkForCheckmate(board)
+                chosen_move = searcher.choose_move(position,
+                                                   history=[undo[5] for undo in history])
+
+        # The search comes up with no move (0) only when there's no legal
+        # move to play, which can't be played as a move: the game is over
+        if not chosen_move:
+            break
+
+        # Enact move. Is there an opponent piece where we are moving to? If
+        # so, add it to list of captured pieces (the position itself keeps
+        # track of pawns open to en-passant)
+        undo = position.make_move(chosen_move)
+        history.append(undo)
+        captured = undo[1]
+        if captured is not None:
+            (color, piece_type) = divmod(captured, NUM_PIECE_TYPES)
+            captured_pieces[Color(color)].append(TypeToPiece[piece_type])
+
+        turn = flip_turn[turn]
 
         # Generate state of the board before player makes move
         # (i.e., the movesets available to both players)
-        white_movesets, black_movesets = board_state_generator(board,
-                                                               en_passant=en_passant)
+        white_movesets, black_movesets = board_state_generator(position)
+
+    # Perform check for checkmate. A player with no legal move who isn't in
+    # check is stalemated
+    if checkForCheckmate(position):
+        print("Checkmate! {} has won!".format(flip_turn[turn].name.lower()))
+    else:
+        print("Stalemate! The game is a draw")
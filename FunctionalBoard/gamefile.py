@@ -0,0 +1,305 @@
+"""
+Compact binary files of game records (see selfplay.GameRecord)
+
+Each move is stored in 16 bits, packed as by bitboard.encode_move() (from
+square, to square and promotion), and each game as a small fixed header
+followed by its array of moves. Games are gathered into blocks of about
+block_size bytes, and every block is compressed on its own (with zlib or
+lzma), so reading a game only means decompressing its block. An index at
+the end of the file gives the offset of every block and the place of every
+game in its block, and the file is read through mmap: opening it reads
+just the index, and any game can then be read at random.
+
+File layout (all integers little-endian):
+
+    header:  magic b'CHGR', version (u16), codec (u16)
+    blocks:  compressed blocks, one after the other
+    index:   for every block: file offset (u64), compressed size (u32),
+             size (u32)
+             for every game: block number (u32), offset in the block (u32)
+    footer:  index offset (u64), number of blocks (u32), number of games
+             (u32), magic b'CHGR'
+
+A game in a block:
+
+    index (u64), seed (u64), result (i8), termination code (u8), length of
+    the starting FEN (u16, 0 for the usual starting position), number of
+    moves (u32), the starting FEN (ASCII), the moves (u16 each)
+"""
+import collections
+import lzma
+import mmap
+import os
+import struct
+import zlib
+
+import numpy as np
+
+# Custom Modules
+from selfplay import (
+    CHECKMATE,
+    STALEMATE,
+    FIFTY_MOVES,
+    REPETITION,
+    INSUFFICIENT_MATERIAL,
+    MAX_PLIES,
+    GameRecord,
+)
+
+MAGIC = b'CHGR'
+VERSION = 1
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_LZMA = 2
+CODECS = {
+    'none': CODEC_NONE,
+    'zlib': CODEC_ZLIB,
+    'lzma': CODEC_LZMA,
+}
+
+DEFAULT_BLOCK_SIZE = 1 << 16
+
+# Terminations, by their code. 0 is for games without one (such as games
+# read from PGN)
+TERMINATIONS = (None, CHECKMATE, STALEMATE, FIFTY_MOVES, REPETITION, INSUFFICIENT_MATERIAL, MAX_PLIES)
+_TERMINATION_CODES = {termination: code for code, termination in enumerate(TERMINATIONS)}
+
+_FILE_HEADER = struct.Struct('<4sHH')
+_FOOTER = struct.Struct('<QII4s')
+_GAME_HEADER = struct.Struct('<QQbBHI')
+
+_BLOCK_ENTRY = np.dtype([('offset', '<u8'), ('size', '<u4'), ('raw_size', '<u4')])
+_GAME_ENTRY = np.dtype([('block', '<u4'), ('offset', '<u4')])
+
+# Record of a game that starts from a position other than the usual one
+StartedGameRecord = collections.namedtuple('StartedGameRecord', GameRecord._fields + ('fen',))
+
+
+def _compress(codec, data, level):
+    if codec == CODEC_ZLIB:
+        return zlib.compress(data, 6 if level is None else level)
+    if codec == CODEC_LZMA:
+        return lzma.compress(data, preset=6 if level is None else level)
+    return bytes(data)
+
+def _decompress(codec, data):
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data)
+    if codec == CODEC_LZMA:
+        return lzma.decompress(data)
+    return bytes(data)
+
+
+class GameWriter(object):
+    """
+    Write game records to a file. Close it (or use it as a context manager)
+    to write the index, without which the file can't be read
+
+    :param path:       path of the file, overwritten if it exists
+    :param codec:      'zlib', 'lzma' or 'none'
+    :param level:      compression level (the codec's default if None)
+    :param block_size: size in bytes of the games gathered into a block
+                       before it's compressed. Bigger blocks compress
+                       better, smaller ones are quicker to read a game from
+    """
+    def __init__(self, path, codec='zlib', level=None, block_size=DEFAULT_BLOCK_SIZE):
+        self.codec = CODECS[codec]
+        self.level = level
+        self.block_size = block_size
+        self._file = open(path, 'wb')
+        self._file.write(_FILE_HEADER.pack(MAGIC, VERSION, self.codec))
+
+        self._block = bytearray()
+        self._blocks = []
+        self._games = []
+
+    def __len__(self):
+        return len(self._games)
+
+    def write(self, record, fen=None):
+        """
+        Add a game
+
+        :param record: GameRecord (or anything with index, seed, result,
+                       termination and moves fields)
+        :param fen:    FEN of the position the game starts from, if it's not
+                       the usual starting position. Defaults to the record's
+                       own fen field, if it has one
+        """
+        if fen is None:
+            fen = getattr(record, 'fen', None)
+        fen = (fen or '').encode('ascii')
+        moves = np.asarray(record.moves, dtype='<u2')
+
+        self._games.append((len(self._blocks), len(self._block)))
+        self._block += _GAME_HEADER.pack(record.index or 0,
+                                         record.seed or 0,
+                                         record.result,
+                                         _TERMINATION_CODES.get(record.termination, 0),
+                                         len(fen),
+                                         len(moves))
+        self._block += fen
+        self._block += moves.tobytes()
+
+        if len(self._block) >= self.block_size:
+            self._flush()
+
+    def write_all(self, records):
+        for record in records:
+            self.write(record)
+
+    def _flush(self):
+        if not self._block:
+            return
+        data = _compress(self.codec, self._block, self.level)
+        self._blocks.append((self._file.tell(), len(data), len(self._block)))
+        self._file.write(data)
+        self._block = bytearray()
+
+    def close(self):
+        if self._file is None:
+            return
+        self._flush()
+        index_offset = self._file.tell()
+        self._file.write(np.array(self._blocks, dtype=_BLOCK_ENTRY).tobytes())
+        self._file.write(np.array(self._games, dtype=_GAME_ENTRY).tobytes())
+        self._file.write(_FOOTER.pack(index_offset, len(self._blocks), len(self._games), MAGIC))
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class GameReader(object):
+    """
+    Random access to the games of a file written by GameWriter
+
+        with GameReader('games.bin') as games:
+            record = games[12345]
+
+    Games are GameRecords, or StartedGameRecords (with a fen field) for
+    games that don't start from the usual starting position. Their moves
+    are read-only NumPy uint16 arrays
+
+    :param path:          path of the file
+    :param cached_blocks: number of decompressed blocks kept, for reading
+                          nearby games
+    """
+    def __init__(self, path, cached_blocks=4):
+        self._file = open(path, 'rb')
+        self._map = None
+        try:
+            self._read_index(path)
+        except Exception:
+            # Don't leave a rejected file open
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._file.close()
+            raise
+
+        self._cache = collections.OrderedDict()
+        self._cached_blocks = cached_blocks
+
+    def _read_index(self, path):
+        """
+        Map the file, check its header and footer, and read its index
+        """
+        size = os.fstat(self._file.fileno()).st_size
+        if size < _FILE_HEADER.size + _FOOTER.size:
+            raise ValueError("Not a game record file (too short): {0}".format(path))
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, codec) = _FILE_HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a game record file: {0}".format(path))
+        if version != VERSION:
+            raise ValueError("Unsupported game record file version: {0}".format(version))
+        self.codec = codec
+
+        (index_offset, num_blocks, num_games, magic) = _FOOTER.unpack_from(
+            self._map, len(self._map) - _FOOTER.size)
+        if magic != MAGIC:
+            raise ValueError("Game record file has no index (was it closed?): {0}".format(path))
+
+        # Copies, so the map can be closed
+        games_offset = index_offset + num_blocks * _BLOCK_ENTRY.itemsize
+        self.blocks = np.frombuffer(self._map, dtype=_BLOCK_ENTRY, count=num_blocks,
+                                    offset=index_offset).copy()
+        self.games = np.frombuffer(self._map, dtype=_GAME_ENTRY, count=num_games,
+                                   offset=games_offset).copy()
+
+    def __len__(self):
+        return len(self.games)
+
+    def _block(self, block):
+        data = self._cache.get(block)
+        if data is not None:
+            self._cache.move_to_end(block)
+            return data
+
+        (offset, size, _) = self.blocks[block]
+        data = _decompress(self.codec, self._map[int(offset):int(offset) + int(size)])
+        self._cache[block] = data
+        if len(self._cache) > self._cached_blocks:
+            self._cache.popitem(last=False)
+        return data
+
+    def _read(self, data, offset):
+        (index, seed, result, termination, fen_length, num_moves) = _GAME_HEADER.unpack_from(
+            data, offset)
+        offset += _GAME_HEADER.size
+        fen = data[offset:offset + fen_length].decode('ascii')
+        offset += fen_length
+        moves = np.frombuffer(data, dtype='<u2', count=num_moves, offset=offset)
+        fields = (index, seed, result, TERMINATIONS[termination], moves)
+        if fen:
+            return StartedGameRecord(*fields, fen=fen)
+        return GameRecord(*fields)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self.games)
+        if not 0 <= i < len(self.games):
+            raise IndexError("Game index out of range")
+        (block, offset) = self.games[i]
+        return self._read(self._block(int(block)), int(offset))
+
+    def __iter__(self):
+        """
+        Every game, in file order, decompressing each block once
+        """
+        for (block, offset) in self.games:
+            yield self._read(self._block(int(block)), int(offset))
+
+    def sample(self, num_games, rng=None):
+        """
+        Games picked at random (without replacement), read block by block
+
+        :param rng: NumPy random Generator (a new one if None)
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        picks = rng.choice(len(self.games), size=num_games, replace=False)
+        games = {}
+        for i in sorted(picks, key=lambda i: self.games[i]['block']):
+            games[i] = self[int(i)]
+        return [games[i] for i in picks]
+
+    def close(self):
+        if self._map is None:
+            return
+        self._cache.clear()
+        self._map.close()
+        self._file.close()
+        self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,192 @@
+"""
+Batched neural network evaluation for search workers
+
+Evaluating one position at a time wastes most of what a forward pass can
+do, so an InferenceServer runs the network in a process of its own and
+batches the positions search workers send it: it waits for a first
+request, then gathers more until it has max_batch positions or max_wait_us
+microseconds have gone by, and runs one forward pass over the lot.
+
+    server = InferenceServer(MLP(seed=1), max_batch=64, max_wait_us=500)
+    clients = [server.client() for _ in range(workers)]
+    server.start()
+    ... hand a client to each worker (process or thread) ...
+    (policy, value) = client.predict(planes)
+    server.stop()
+
+Workers send positions encoded as by tensors.py (or by the Board engine's
+generate_state_of_board()). A NetworkEvaluator turns a model, or a
+client, into an evaluator for MCTS (see mcts.py).
+"""
+import multiprocessing
+import queue
+import time
+
+import numpy as np
+
+# Custom Modules
+from tensors import encode_positions
+
+DEFAULT_MAX_BATCH = 64
+DEFAULT_MAX_WAIT_US = 500
+
+
+def _serve(model, requests, conns, max_batch, max_wait, batches, positions):
+    """
+    Server process: gather requests into batches and answer them, until
+    a None request says to stop
+    """
+    stopping = False
+    while not stopping:
+        request = requests.get()
+        if request is None:
+            break
+        batch = [request]
+        count = len(request[1])
+
+        deadline = time.perf_counter() + max_wait
+        while count < max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                stopping = True
+                break
+            batch.append(request)
+            count += len(request[1])
+
+        planes = np.concatenate([planes for (_, planes) in batch])
+        policies = []
+        values = []
+        for start in range(0, count, max_batch):
+            (policy, value) = model.predict(planes[start:start + max_batch])
+            policies.append(policy)
+            values.append(value)
+        policy = np.concatenate(policies)
+        value = np.concatenate(values)
+
+        start = 0
+        for (client_id, client_planes) in batch:
+            end = start + len(client_planes)
+            conns[client_id].send((policy[start:end], value[start:end]))
+            start = end
+
+        with batches.get_lock():
+            batches.value += 1
+        with positions.get_lock():
+            positions.value += count
+
+
+class InferenceClient(object):
+    """
+    A worker's connection to an InferenceServer. Each worker (process or
+    thread) needs its own, as answers come back on it in order
+    """
+    def __init__(self, client_id, requests, conn):
+        self.client_id = client_id
+        self._requests = requests
+        self._conn = conn
+
+    def predict(self, planes):
+        """
+        Evaluate a batch of encoded positions on the server
+
+        :param planes: (N, NUM_PLANES, 8, 8) array
+        :return (policy, value): as the model's predict()
+        """
+        self._requests.put((self.client_id, np.ascontiguousarray(planes, dtype=np.float32)))
+        return self._conn.recv()
+
+
+class InferenceServer(object):
+    """
+    :param model:       network with a predict(planes) -> (policy, value)
+                        method, such as network.MLP
+    :param max_batch:   largest number of positions in a forward pass
+    :param max_wait_us: longest a request waits for others to batch with,
+                        in microseconds
+    """
+    def __init__(self, model, max_batch=DEFAULT_MAX_BATCH, max_wait_us=DEFAULT_MAX_WAIT_US):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait_us = max_wait_us
+        self._requests = multiprocessing.Queue()
+        self._conns = []
+        self._process = None
+
+        # Number of forward passes run and positions evaluated
+        self._batches = multiprocessing.Value('q', 0)
+        self._positions = multiprocessing.Value('q', 0)
+
+    def client(self):
+        """
+        New client to hand to a worker. Clients have to be made before the
+        server is started
+        """
+        if self._process is not None:
+            raise RuntimeError("Clients have to be made before the server is started")
+        (server_conn, client_conn) = multiprocessing.Pipe()
+        self._conns.append(server_conn)
+        return InferenceClient(len(self._conns) - 1, self._requests, client_conn)
+
+    def start(self):
+        self._process = multiprocessing.Process(target=_serve,
+                                                args=(self.model,
+                                                      self._requests,
+                                                      self._conns,
+                                                      self.max_batch,
+                                                      self.max_wait_us / 1e6,
+                                                      self._batches,
+                                                      self._positions),
+                                                daemon=True)
+        self._process.start()
+
+    def stop(self):
+        if self._process is None:
+            return
+        self._requests.put(None)
+        self._process.join()
+        self._process = None
+
+    def stats(self):
+        batches = self._batches.value
+        positions = self._positions.value
+        return {
+            'batches': batches,
+            'positions': positions,
+            'mean_batch': positions / batches if batches else 0.0,
+        }
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class NetworkEvaluator(object):
+    """
+    Evaluator for MCTS (see mcts.py) asking a network for priors and values
+
+    :param predictor: anything with a predict(planes) -> (policy, value)
+                      method: a model, to run it in the worker itself, or
+                      an InferenceClient, to batch with other workers
+    """
+    def __init__(self, predictor):
+        self.predictor = predictor
+
+    def __call__(self, positions, move_lists):
+        (policy, values) = self.predictor.predict(encode_positions(positions))
+
+        # Softmax of the logits of the legal moves
+        priors = []
+        for (logits, moves) in zip(policy, move_lists):
+            legal = logits[np.array(moves, dtype=np.int64) & 4095]
+            legal = np.exp(legal - legal.max())
+            priors.append(legal / legal.sum())
+        return priors, values
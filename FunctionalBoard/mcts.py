@@ -0,0 +1,482 @@
+"""
+Monte-Carlo tree search with PUCT selection: an alternative to the
+alpha-beta search of search.py
+
+The tree is grown one leaf per simulation. A simulation walks down from
+the root, at each node picking the child with the best sum of its mean
+value Q and an exploration bonus U that is large for moves with a high
+prior probability and few visits:
+
+    U = c_puct * prior * sqrt(parent visits) / (1 + child visits)
+
+The leaf it reaches is expanded, and its value is backed up the path,
+from the point of view of the side that moved at each node.
+
+Priors and values come from an evaluator, called on a batch of leaves at
+a time (see static_evaluator, PlayoutEvaluator, or a neural network).
+The leaves of a batch are selected one after the other before any is
+evaluated, so every node on a selected path takes a virtual loss: a
+visit that counts as a lost game until the real value is backed up, which
+steers the next selections in the batch down other paths.
+
+Nodes aren't Python objects but rows of preallocated NumPy arrays, about
+20 bytes each, so tens of millions fit in memory:
+
+    visits:       number of simulations through the node
+    value_sum:    total of their values, for the side that made the move
+    prior:        prior probability of the move
+    first_child:  row of the first child (children are contiguous rows),
+                  -1 if not expanded yet
+    num_children: number of children, 0 for an unexpanded node or a
+                  finished game (whose first_child is 0)
+    move:         move leading to the node, packed as in bitboard.py
+
+Between moves of a game, the subtree under the move played is kept and
+compacted to the front of the arrays, so the next search starts from
+what was learnt about it.
+"""
+import math
+import time
+
+import numpy as np
+
+# Custom Modules
+from board import generate_movesets
+from evaluation import evaluate
+from movesets import in_check
+from playouts import Playouts
+
+DEFAULT_CAPACITY = 1 << 20
+DEFAULT_SIMULATIONS = 800
+DEFAULT_C_PUCT = 1.5
+DEFAULT_BATCH_SIZE = 8
+DEFAULT_VIRTUAL_LOSS = 1
+
+# First play urgency: an unvisited child is valued as its parent, less this
+FPU_REDUCTION = 0.2
+
+# Centipawns scaled into a value in (-1, 1) by static_evaluator
+VALUE_SCALE = 400.0
+
+
+def static_evaluator(positions, move_lists):
+    """
+    Evaluator for MCTS: uniform priors, and the static evaluation of the
+    position squashed into (-1, 1)
+
+    :param positions:  positions to evaluate
+    :param move_lists: legal moves of each position
+    :return (priors, values): prior of each move of each position, and the
+                              value of each position for its side to move
+    """
+    priors = [np.full(len(moves), 1.0 / len(moves), dtype=np.float32) for moves in move_lists]
+    values = np.tanh(np.array([evaluate(position) for position in positions]) / VALUE_SCALE)
+    return priors, values
+
+
+class PlayoutEvaluator(object):
+    """
+    Evaluator for MCTS valuing a position by the mean result of random
+    playouts from it (see playouts.py), with uniform priors
+
+    :param playouts_per_leaf: number of playouts from each position
+    :param max_plies:         length at which a playout is a draw
+    :param seed:              seed of the random moves
+    """
+    def __init__(self, playouts_per_leaf=32, max_plies=100, seed=None):
+        self.playouts_per_leaf = playouts_per_leaf
+        self.max_plies = max_plies
+        self.rng = np.random.default_rng(seed)
+
+    def __call__(self, positions, move_lists):
+        priors = [np.full(len(moves), 1.0 / len(moves), dtype=np.float32)
+                  for moves in move_lists]
+        repeated = [position for position in positions for _ in range(self.playouts_per_leaf)]
+        playouts = Playouts.from_positions(repeated,
+                                           max_plies=self.max_plies,
+                                           seed=self.rng.integers(1 << 63))
+        results = playouts.run().reshape(len(positions), self.playouts_per_leaf).mean(axis=1)
+
+        # Results are from white's point of view
+        sides = np.array([position.side for position in positions])
+        values = np.where(sides == 1, results, -results)
+        return priors, values
+
+
+class MCTS(object):
+    """
+    :param capacity:     number of nodes the tree can hold
+    :param c_puct:       weight of the exploration bonus
+    :param batch_size:   number of leaves evaluated together
+    :param virtual_loss: visits (each a lost game) added along a path while
+                         its leaf waits for its value
+    :param evaluator:    function(positions, move_lists) -> (priors, values)
+                         as static_evaluator
+    """
+    def __init__(self,
+                 capacity=DEFAULT_CAPACITY,
+                 c_puct=DEFAULT_C_PUCT,
+                 batch_size=DEFAULT_BATCH_SIZE,
+                 virtual_loss=DEFAULT_VIRTUAL_LOSS,
+                 evaluator=static_evaluator):
+        self.capacity = capacity
+        self.c_puct = c_puct
+        self.batch_size = batch_size
+        self.virtual_loss = virtual_loss
+        self.evaluator = evaluator
+
+        self.visits = np.zeros(capacity, dtype=np.int32)
+        self.value_sum = np.zeros(capacity, dtype=np.float32)
+        self.prior = np.zeros(capacity, dtype=np.float32)
+        self.first_child = np.full(capacity, -1, dtype=np.int32)
+        self.num_children = np.zeros(capacity, dtype=np.uint8)
+        self.move = np.zeros(capacity, dtype=np.uint16)
+
+        # Nodes in use: the root is row 0, when there is one
+        self.size = 0
+        self._root_position = None
+        self._keys = []
+
+        # Statistics of the last search
+        self.simulations = 0
+        self.collisions = 0
+        self.full = False
+
+    def clear(self):
+        self.first_child[:self.size] = -1
+        self.num_children[:self.size] = 0
+        self.size = 0
+        self._root_position = None
+
+    def _new_root(self, position):
+        self.clear()
+        self.visits[0] = 0
+        self.value_sum[0] = 0.0
+        self.prior[0] = 1.0
+        self.move[0] = 0
+        self.size = 1
+        self._root_position = position.copy()
+
+    def _children(self, node):
+        start = int(self.first_child[node])
+        return start, start + int(self.num_children[node])
+
+    def _find_child(self, node, move):
+        (start, end) = self._children(node)
+        for child in range(start, end):
+            if self.move[child] == move:
+                return child
+        return None
+
+    def _find_descendant(self, position, max_plies=2):
+        """
+        Node of the tree holding the position, if it's at most max_plies
+        below the root
+        """
+        root_position = self._root_position
+        frontier = [(0, [])]
+        for _ in range(max_plies):
+            next_frontier = []
+            for (node, moves) in frontier:
+                (start, end) = self._children(node)
+                for child in range(start, end):
+                    next_frontier.append((child, moves + [int(self.move[child])]))
+            for (node, moves) in next_frontier:
+                undos = [root_position.make_move(move) for move in moves]
+                found = root_position.key == position.key
+                for undo in reversed(undos):
+                    root_position.unmake_move(undo)
+                if found:
+                    return node
+            frontier = next_frontier
+        return None
+
+    def _reroot(self, node):
+        """
+        Make the node the root, keeping its subtree and dropping the rest.
+        The subtree is compacted to the front of the arrays, in the same
+        order, so every block of children stays contiguous. Children are
+        always stored after their parent, so the new root ends up in row 0
+        """
+        kept = [np.array([node], dtype=np.int64)]
+        frontier = kept[0]
+        while len(frontier):
+            counts = self.num_children[frontier].astype(np.int64)
+            expanded = counts > 0
+            starts = self.first_child[frontier][expanded].astype(np.int64)
+            counts = counts[expanded]
+            if not len(counts):
+                break
+            # Rows of every child of the frontier, block after block
+            block_offsets = np.cumsum(counts) - counts
+            frontier = (np.repeat(starts - block_offsets, counts) +
+                        np.arange(counts.sum(), dtype=np.int64))
+            kept.append(frontier)
+
+        kept = np.sort(np.concatenate(kept))
+        size = len(kept)
+        new_rows = np.full(self.size, -1, dtype=np.int64)
+        new_rows[kept] = np.arange(size)
+
+        for array in (self.visits, self.value_sum, self.prior, self.first_child,
+                      self.num_children, self.move):
+            array[:size] = array[kept]
+        expanded = self.num_children[:size] > 0
+        self.first_child[:size][expanded] = new_rows[self.first_child[:size][expanded]]
+        self.first_child[size:self.size] = -1
+        self.num_children[size:self.size] = 0
+        self.size = size
+
+    def set_root(self, position, history=None):
+        """
+        Start searching from the position. If it's already in the tree,
+        just below the root, its subtree is kept
+
+        :param history: keys of the positions played before this one in the
+                        game, for spotting repetitions
+        """
+        self._keys = list(history or [])
+        if self.size:
+            if position.key == self._root_position.key:
+                return
+            node = self._find_descendant(position)
+            if node is not None:
+                self._reroot(node)
+                self._root_position = position.copy()
+                return
+        self._new_root(position)
+
+    def advance(self, move):
+        """
+        Play a move at the root, keeping its subtree
+        """
+        if not self.size:
+            return
+        child = self._find_child(0, move)
+        self._keys.append(self._root_position.key)
+        self._root_position.make_move(move)
+        if child is None:
+            self._new_root(self._root_position)
+        else:
+            self._reroot(child)
+
+    def _is_draw(self, position, keys):
+        """
+        Drawn by the fifty-move rule or repetition?
+
+        :param keys: keys of the positions of the game, up to and including
+                     this one
+        """
+        if position.halfmove_clock >= 100:
+            return True
+        key = position.key
+        stop = max(len(keys) - position.halfmove_clock - 2, -1)
+        for i in range(len(keys) - 3, stop, -2):
+            if keys[i] == key:
+                return True
+        return False
+
+    def _select(self, position, keys):
+        """
+        Walk down from the root to a leaf, adding a virtual loss along the
+        way. The walk stops early at a node drawn by repetition or the
+        fifty-move rule
+
+        :return (path, undos, drawn): rows of the nodes from the root to the
+                                      leaf, the undo records of the moves
+                                      made on the position to reach it, and
+                                      whether the game is drawn at the leaf
+        """
+        visits = self.visits
+        value_sum = self.value_sum
+        virtual_loss = self.virtual_loss
+        node = 0
+        path = [0]
+        undos = []
+        visits[0] += virtual_loss
+        while self.num_children[node]:
+            (start, end) = self._children(node)
+            child_visits = visits[start:end]
+            parent_q = -value_sum[node] / visits[node] if visits[node] else 0.0
+            q = np.where(child_visits > 0,
+                         value_sum[start:end] / np.maximum(child_visits, 1),
+                         parent_q - FPU_REDUCTION)
+            u = (self.c_puct * math.sqrt(max(int(visits[node]), 1)) *
+                 self.prior[start:end] / (1 + child_visits))
+            node = start + int(np.argmax(q + u))
+
+            visits[node] += virtual_loss
+            value_sum[node] -= virtual_loss
+            path.append(node)
+            undos.append(position.make_move(int(self.move[node])))
+            keys.append(position.key)
+
+            # Whether the game is drawn here depends on the positions played
+            # before the node (in the game as well as the tree), which change
+            # when the root moves on, so it's only scored for this simulation
+            # and never stored on the node. The root itself is never drawn:
+            # it's the position a move is needed for
+            if self._is_draw(position, keys):
+                return path, undos, True
+        return path, undos, False
+
+    def _revert_virtual_loss(self, path):
+        virtual_loss = self.virtual_loss
+        for node in path:
+            self.visits[node] -= virtual_loss
+            if node:
+                self.value_sum[node] += virtual_loss
+
+    def _backup(self, path, value):
+        """
+        Take the virtual loss back off the path, and add the leaf's value,
+        for the side to move at the leaf
+        """
+        visits = self.visits
+        value_sum = self.value_sum
+        virtual_loss = self.virtual_loss
+        # The leaf's value counts against the side that moved into it
+        value = -value
+        for node in reversed(path):
+            visits[node] += 1 - virtual_loss
+            if node:
+                value_sum[node] += value + virtual_loss
+            else:
+                value_sum[node] += value
+            value = -value
+
+    def _expand(self, node, moves, priors):
+        start = self.size
+        end = start + len(moves)
+        if end > self.capacity:
+            self.full = True
+            return
+        self.first_child[start:end] = -1
+        self.num_children[start:end] = 0
+        self.visits[start:end] = 0
+        self.value_sum[start:end] = 0.0
+        self.prior[start:end] = priors
+        self.move[start:end] = moves
+        self.first_child[node] = start
+        self.num_children[node] = len(moves)
+        self.size = end
+
+    def search(self, position, num_simulations=DEFAULT_SIMULATIONS, max_time=None, history=None):
+        """
+        Run simulations from the position, reusing what's left in the tree
+        from searching it before
+
+        :param num_simulations: number of simulations to run
+        :param max_time:        time budget in seconds (None for no limit)
+        :param history:         keys of the positions played before this one
+                                in the game, for spotting repetitions
+        :return move: most visited move at the root, 0 if there are none
+        """
+        self.set_root(position, history)
+        deadline = None if max_time is None else time.perf_counter() + max_time
+        self.simulations = 0
+        self.collisions = 0
+        self.full = False
+        root_position = self._root_position.copy()
+
+        while self.simulations < num_simulations and not self.full:
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+
+            # Select a batch of leaves
+            batch = []
+            finished = []
+            pending = set()
+            for _ in range(min(self.batch_size, num_simulations - self.simulations)):
+                keys = self._keys + [root_position.key]
+                (path, undos, drawn) = self._select(root_position, keys)
+                leaf = path[-1]
+                if leaf in pending:
+                    # Already on its way to the evaluator: take the virtual
+                    # loss back, and evaluate what we have
+                    self.collisions += 1
+                    self._revert_virtual_loss(path)
+                    for undo in reversed(undos):
+                        root_position.unmake_move(undo)
+                    break
+
+                if drawn:
+                    finished.append((path, 0.0))
+                elif self.first_child[leaf] >= 0:
+                    # The game is over at the leaf
+                    finished.append((path, self._finished_value(root_position)))
+                else:
+                    moves = generate_movesets(root_position)
+                    if moves:
+                        pending.add(leaf)
+                        batch.append((path, root_position.copy(), moves))
+                    else:
+                        # Checkmate or stalemate
+                        self.first_child[leaf] = 0
+                        finished.append((path, self._finished_value(root_position)))
+                for undo in reversed(undos):
+                    root_position.unmake_move(undo)
+
+            for (path, value) in finished:
+                self._backup(path, value)
+            self.simulations += len(finished)
+
+            if batch:
+                (priors, values) = self.evaluator([position for (_, position, _) in batch],
+                                                  [moves for (_, _, moves) in batch])
+                for ((path, _, moves), leaf_priors, value) in zip(batch, priors, values):
+                    self._expand(path[-1], moves, leaf_priors)
+                    self._backup(path, float(value))
+                self.simulations += len(batch)
+
+        return self.best_move()
+
+    def _finished_value(self, position):
+        """
+        Value of a game with no legal move left, for the side to move: lost
+        if checkmated, drawn if stalemated
+        """
+        if in_check(position, position.side):
+            return -1.0
+        return 0.0
+
+    def best_move(self):
+        """
+        Most visited move at the root, 0 if there are none
+        """
+        if not self.size or not self.num_children[0]:
+            return 0
+        (start, end) = self._children(0)
+        return int(self.move[start + int(np.argmax(self.visits[start:end]))])
+
+    def root_statistics(self):
+        """
+        :return statistics: (move, visits, mean value, prior) of every root
+                            move, most visited first
+        """
+        if not self.size:
+            return []
+        (start, end) = self._children(0)
+        statistics = []
+        for child in range(start, end):
+            visits = int(self.visits[child])
+            statistics.append((int(self.move[child]),
+                               visits,
+                               float(self.value_sum[child]) / visits if visits else 0.0,
+                               float(self.prior[child])))
+        statistics.sort(key=lambda stat: -stat[1])
+        return statistics
+
+    def principal_variation(self, max_length=32):
+        """
+        Line of most visited moves from the root
+        """
+        pv = []
+        node = 0
+        while self.size and self.num_children[node] and len(pv) < max_length:
+            (start, end) = self._children(node)
+            node = start + int(np.argmax(self.visits[start:end]))
+            if not self.visits[node]:
+                break
+            pv.append(int(self.move[node]))
+        return pv
@@ -1,375 +1,292 @@
+"""
+Moveset generators for the bitboard position (see bitboard.py)
+
+Every generator is called with the index of the square the piece is
+standing on and the Position, and returns a bitboard of the squares the
+piece can move to. Whether a move would leave the player's own king in
+check is left to the caller (see checks_and_pins() and leaves_king_safe()),
+so the generators only have to deal with how each piece moves. The one
+exception is the king, which is kept off the squares in the opponent's
+attack map.
+"""
+from bitboard import (
+    BLACK,
+    WHITE,
+    PAWN,
+    KNIGHT,
+    BISHOP,
+    ROOK,
+    QUEEN,
+    KING,
+    NUM_PIECE_TYPES,
+    FULL_BOARD,
+    RANK_3,
+    RANK_6,
+    CASTLE_WHITE_KINGSIDE,
+    CASTLE_WHITE_QUEENSIDE,
+    CASTLE_BLACK_KINGSIDE,
+    CASTLE_BLACK_QUEENSIDE,
+)
+from attacks import (
+    KNIGHT_ATTACKS,
+    KING_ATTACKS,
+    PAWN_ATTACKS,
+    ROOK_MASKS,
+    ROOK_TABLES,
+    BISHOP_MASKS,
+    BISHOP_TABLES,
+    BETWEEN,
+    rook_attacks_from,
+    bishop_attacks_from,
+    queen_attacks_from,
+)
+
 _BOARD_WIDTH = 8
 _BOARD_HEIGHT = 8
 
-
+_OwnerToColor = {
+    'white': WHITE,
+    'black': BLACK,
+}
+
+# Squares that have to be empty (and, for the king, not threatened) in
+# order to castle, keyed by castling right
+_CASTLING = (
+    # (right, color, king destination, empty squares, squares king passes)
+    (CASTLE_WHITE_KINGSIDE, WHITE, 6, 0x60, (5, 6)),
+    (CASTLE_WHITE_QUEENSIDE, WHITE, 2, 0x0E, (3, 2)),
+    (CASTLE_BLACK_KINGSIDE, BLACK, 62, 0x60 << 56, (61, 62)),
+    (CASTLE_BLACK_QUEENSIDE, BLACK, 58, 0x0E << 56, (59, 58)),
+)
+
+
+##################
+# Attack helpers #
+##################
+
+def _attacked(pieces, square, by_color, occupied, keep=FULL_BOARD):
+    """
+    Is the square attacked by any of by_color's pieces, given the occupied
+    squares? Pieces outside of keep (e.g., just captured) are ignored
+    """
+    offset = by_color * NUM_PIECE_TYPES
+
+    if KNIGHT_ATTACKS[square] & pieces[offset + KNIGHT] & keep:
+        return True
+    if KING_ATTACKS[square] & pieces[offset + KING]:
+        return True
+    # A pawn attacks the square if a pawn of the other color standing on
+    # the square would attack the pawn
+    if PAWN_ATTACKS[by_color ^ 1][square] & pieces[offset + PAWN] & keep:
+        return True
+    queens = pieces[offset + QUEEN]
+    if (ROOK_TABLES[square][occupied & ROOK_MASKS[square]] &
+            (pieces[offset + ROOK] | queens) & keep):
+        return True
+    if (BISHOP_TABLES[square][occupied & BISHOP_MASKS[square]] &
+            (pieces[offset + BISHOP] | queens) & keep):
+        return True
+
+    return False
+
+def is_square_attacked(position, square, by_color):
+    """
+    Checks if a square is threatened by any of the pieces of by_color. The
+    position keeps an up to date attack map for each side, so this is a
+    single lookup
+    """
+    return bool((position.attacks[by_color] >> square) & 1)
+
+def in_check(position, color):
+    """
+    Is the king of the given color currently in check?
+    """
+    return bool((position.attacks[color ^ 1] >> position.king_square(color)) & 1)
+
+def checks_and_pins(position, color):
+    """
+    Find the pieces giving check to the king of the given color, and the
+    pieces of that color pinned against their king. A pinned piece can only
+    move along the line between its king and the pinning piece.
+
+    :return (checkers, pinned): bitboards of the checking (opponent's) pieces
+                                and of the pinned (own) pieces
+    """
+    pieces = position.pieces
+    occupied = position.occupied
+    king_square = position.king_square(color)
+    offset = (color ^ 1) * NUM_PIECE_TYPES
+    rooks = pieces[offset + ROOK] | pieces[offset + QUEEN]
+    bishops = pieces[offset + BISHOP] | pieces[offset + QUEEN]
+
+    checkers = 0
+    if (position.attacks[color ^ 1] >> king_square) & 1:
+        checkers = ((KNIGHT_ATTACKS[king_square] & pieces[offset + KNIGHT]) |
+                    (PAWN_ATTACKS[color][king_square] & pieces[offset + PAWN]) |
+                    (rook_attacks_from(king_square, occupied) & rooks) |
+                    (bishop_attacks_from(king_square, occupied) & bishops))
+
+    # Sliders that would attack the king on an empty board are pinning a
+    # piece if exactly one piece, of ours, stands in between
+    pinned = 0
+    snipers = ((ROOK_TABLES[king_square][0] & rooks) |
+               (BISHOP_TABLES[king_square][0] & bishops))
+    own = position.occupancy[color]
+    between = BETWEEN[king_square]
+    while snipers:
+        lsb = snipers & -snipers
+        snipers ^= lsb
+        blockers = between[lsb.bit_length() - 1] & occupied
+        if blockers and not blockers & (blockers - 1) and blockers & own:
+            pinned |= blockers
+
+    return checkers, pinned
+
+def leaves_king_safe(position, color, from_square, to_square):
+    """
+    Checks that moving the piece at from_square to to_square does not leave
+    the king of its owner in check. The position itself is left untouched:
+    only the occupancy masks the attack generators need are updated.
+    """
+    from_bit = 1 << from_square
+    captured = 1 << to_square
+    occupied = (position.occupied ^ from_bit) | captured
+
+    moving = position.squares[from_square]
+    offset = color * NUM_PIECE_TYPES
+    if moving == offset + KING:
+        king_square = to_square
+    else:
+        king_square = position.king_square(color)
+
+        # An en-passant capture removes a pawn that isn't standing on
+        # the destination square
+        if moving == offset + PAWN and to_square == position.en_passant:
+            captured = 1 << (to_square - 8 if color == WHITE else to_square + 8)
+            occupied ^= captured
+
+    return not _attacked(position.pieces,
+                         king_square,
+                         color ^ 1,
+                         occupied,
+                         keep=FULL_BOARD ^ captured)
+
+
+##############
+# Generators #
+##############
 
 class GenerateRookMoveset(object):
-    def __init__(self, color):
-        self.color = color
+    def __init__(self, owner='white'):
+        self.owner = owner
+        self.color = _OwnerToColor[owner]
 
-    def __call__(self, curr_position, board):
+    def __call__(self, curr_position, position):
         """
-        :param curr_position: tuple containing the piece's current
-                              grid coordinates (y, x)
-        :return moveset: list of tuples containing possible final
-                         coordinates of piece after move
+        :param curr_position: index of the square the piece is on
+        :param position:      Position the piece is moving in
+        :return moveset: bitboard of the squares the piece can move to
         """
-        curr_y = curr_position[0]
-        curr_x = curr_position[1]
-
-        # Vertical movements
-        vertical_moves = [(y, curr_x) for y in range(curr_y+1, _BOARD_HEIGHT)] + \
-                            [(y, curr_x) for y in range(0, curr_y)]
-
-        # Horizontal movements
-        horizontal_moves = [(curr_y, x) for x in range(curr_x+1, _BOARD_WIDTH)] + \
-                            [(curr_y, x) for x in range(0, curr_x)]
-
-        # Filter for collisions with other pieces
-        for i in range(_BOARD_HEIGHT):
-            for j in range(_BOARD_WIDTH):
-
-                # Check if the position is in the piece's moveset.
-                # If not, move on
-                if (i, j) not in vertical_moves or (i, j) not in horizontal_moves:
-                    continue
-
-                # Check to see if there's a piece at the position
-                # being evaluated
-                piece = board[i][j]
-                if not piece:
-                    continue
-
-                (color, piece_type) = piece
-
-                # Check if the piece is the player's king. If it is, store coords
-                # for later
-                if (color, piece_type) = (self.color, PIECE.KING):
-                    king_coords = (row, col)
-
-                # If there is a collision, remove that position from
-                # moveset as well as other positions further along
-                # axis. (NOTE: we can move to a position occupied by
-                # an opponent's piece, but not a position further along
-                # that axis)
-                if (i, j) in vertical_moves:
-                    idx = vertical_moves.index((i, j))
-
-                    if color == self.color:
-                        vertical_moves = vertical_moves[:idx]
-                    else:
-                        vertical_moves = vertical_moves[:idx+1]
-
-                elif (i, j) in horizontal_moves:
-                    idx = horizontal_moves.index((i, j))
-
-                    if color == self.color:
-                        horizontal_moves = horizontal_moves[:idx]
-                    else:
-                        vertical_moves = vertical_moves[:idx+1]
-
-                else:
-                    continue
-
-        moveset = vertical_moves + horizontal_moves
-
-        # Filter for movesets that would place the player's King in check
-        for _, (new_y, new_x) in moveset:
-
-            # Create a new "state of the board" with the piece moved to that
-            # position
-            move_state = []
-            for element in board:
-                move_state.append(element)
-            move_state[curr_y][curr_x] = None
-            move_state[new_y][new_x] = (self.color, PIECE.ROOK)
-
-            if CheckForCheck(
-
-
-        return moveset
+        # Rays stop at the first piece in the way. We can move to a square
+        # occupied by an opponent's piece, but not one occupied by our own
+        return (rook_attacks_from(curr_position, position.occupied) &
+                ~position.occupancy[self.color])
 
 class GenerateBishopMoveset(object):
     def __init__(self, owner='white'):
         self.owner = owner
+        self.color = _OwnerToColor[owner]
 
-    def __call__(self, curr_position, board):
+    def __call__(self, curr_position, position):
         """
-        : param curr_position: tuple containing the piece's current grid
-                               coordinates (y,x)
-        : return moveset: list of tuples containing coordinates that the
-                          piece can move to in the next turn
+        :param curr_position: index of the square the piece is on
+        :param position:      Position the piece is moving in
+        :return moveset: bitboard of the squares the piece can move to
         """
-        curr_y = curr_position[0]
-        curr_x = curr_position[1]
-
-        # Northeast axis
-        if (_BOARD_HEIGHT - curr_y) > (_BOARD_WIDTH - curr_x):
-            diagonal_NE = [(curr_y+i, curr_x+i) for i in range(1, _BOARD_WIDTH - curr_x+1)]
-        else:
-            diagonal_NE = [(curr_y+i, curr_x+i) for i in range(1, _BOARD_HEIGHT - curr_y+1)]
-
-        # Northwest axis
-        if (_BOARD_HEIGHT - curr_y) > curr_x:
-            diagonal_NW = [(curr_y+i, curr_x-i) for i in range(1, curr_x+1)]
-        else:
-            diagonal_NW = [(curr_y+i, curr_x-1) for i in range(1, _BOARD_HEIGHT - curr_y+1)]
-
-        # Southeast axis
-        if curr_y > (_BOARD_WIDTH - curr_x):
-            diagonal_SE = [(curr_y-i, curr_x+i) for i in range(1, _BOARD_WIDTH - curr_x+1)]
-        else:
-            diagonal_SE = [(curr_y-i, curr_x+i) for i in range(1, curr_y+1)]
-
-        # Southwest aaxis
-        if curr_y > curr_x:
-            diagonal_SW = [(curr_y-i, curr_x-i) for i in range(1, curr_x+1)]
-        else:
-            diagonal_SW = [(curr_y-i, curr_x-i) for i in range(1, curr_y+1)]
-
-        # Filter for collisions
-        for i in range(len(_BOARD_HEIGHT)):
-            for j in range(len(_BOARD_WIDTH)):
-
-                # Check if the position is in the piece's moveset. If
-                # not, move on to another position
-                if (i,j) not in diagonal_NE or (i,j) not in diagonal_NW \
-                        or (i,j) not in diagonal_SE or (i,j) not in diagonal_SW:
-                    continue
-
-                piece = board[i][j]
-                (color, _) = piece
-
-                # If there is a collision, remove that position from
-                # moveset as well as other positions further along
-                # axis. (NOTE: we can move to a position occupied by
-                # an opponent's piece, but not a position further along
-                # that axis)
-                if color == self.owner:
-
-                    if (i, j) in diagonal_NE:
-                        idx = diagonal_NE.index((i, j))
-
-                        if color == self.owner:
-                            diagonal_NE = diagonal_NE[:idx]
-                        else:
-                            diagonal_NE = diagonal_NE[:idx+1]
-
-                    elif (i, j) in diagonal_NW:
-                        idx = diagonal_NW.index((i, j))
-
-                        if color == self.owner:
-                            diagonal_NW = diagonal_NW[:idx]
-                        else:
-                            diagonal_NW = diagonal_NW[:idx+1]
-
-                    elif (i, j) in diagonal_SE:
-                        idx = diagonal_SE.index((i, j))
-
-                        if color == self.owner:
-                            diagonal_SE = diagonal_SE[:idx]
-                        else:
-                            diagonal_SE = diagonal_SE[:idx+1]
-
-                    elif (i, j) in diagonal_SW:
-                        idx = diagonal_NE.index((i, j))
-
-                        if color == self.owner:
-                            diagonal_SW = diagonal_SW[:idx]
-                        else:
-                            diagonal_SW = diagonal_SW[:idx+1]
-
-                    else:
-                        continue
-
-        moveset = diagonal_NE + diagonal_NW + diagonal_SE + diagonal_SW
-
-        return moveset
+        return (bishop_attacks_from(curr_position, position.occupied) &
+                ~position.occupancy[self.color])
 
 class GenerateQueenMoveset(object):
     def __init__(self, owner='white'):
         self.owner = owner
+        self.color = _OwnerToColor[owner]
 
-        # Initialize Bishop and Rook moveset generator objects
-        # The Queen's moveset will simply be an sum of the sets
-        # generated by the two objects
-        self.rook_moveset_generator(owner=owner)
-        self.bishop_moveset_generator(owner=owner)
-
-    def __call__(self, curr_position, board):
+    def __call__(self, curr_position, position):
         # The queen's moveset is simply a combination of the rook's and the
-        # bishop's, so just generate both of those and sum them to create
-        # the queen's moveset
-        rook_moveset = self.rook_moveset_generator(curr_position, board)
-        bishop_moveset = self.bishop_moveset_generator(curr_position, board)
-
-        moveset = bishop_moveset + rook_moveset
-
-        return moveset
+        # bishop's
+        return (queen_attacks_from(curr_position, position.occupied) &
+                ~position.occupancy[self.color])
 
 class GenerateKnightMoveset(object):
     def __init__(self, owner='white'):
         self.owner = owner
+        self.color = _OwnerToColor[owner]
 
-    def __call__(self, curr_position, board, owner="white"):
-
-        (curr_y, curr_x) = curr_position
-
-        # A knight's move is composed of a 2-square move along one axis
-        # and a 1-square move along a perpendicular axis
-
-        moveset = [
-            (curr_y+2, curr_x+1),
-            (curr_y+2, curr_x-1),
-            (curr_y+1, curr_x+2),
-            (curr_y+1, curr_x-2),
-            (curr_y-1, curr_x+2),
-            (curr_y-1, curr_x-2),
-            (curr_y-2, curr_x+1),
-            (curr_y-2, curr_x-1)
-        ]
-
-        # Filter for positions off board
-        moveset = [(y,x)for (y,x) in moveset if x < _BOARD_WIDTH or x >= 0 \
-                         and y < _BOARD_HEIGHT or y >=0]
-
-        # Filter for positions that are occupied by a piece owner by
-        # player
-        for move in moveset:
-            y = move[0]
-            x = move[1]
-
-            piece = board[y][x]
-
-            if not piece:
-                continue
-
-            (color, _) = piece
-
-            # If the spot is occupied by a piece with the same color
-            # as the owner of the knight, remove that move from the
-            # generated moveset
-            if color == owner:
-                moveset.remove(move)
-
-        return moveset
+    def __call__(self, curr_position, position):
+        # Filter for positions that are occupied by a piece owned by
+        # player (knights jump, so nothing else blocks them)
+        return KNIGHT_ATTACKS[curr_position] & ~position.occupancy[self.color]
 
 class GeneratePawnMoveset(object):
-    def __init__(self,
-                 owner='white'):
-
+    def __init__(self, owner='white'):
         self.owner = owner
+        self.color = _OwnerToColor[owner]
 
-    def __call__(self, curr_position, board, en_passant=None):
+    def __call__(self, curr_position, position):
         """
-        :param en_passant: Either a tuple with the position
-                           of pawn open to en-passant, or
-                           a 'None' value if no pawns are open to en-passant
+        Pawns advance one square (two from their starting rank) onto empty
+        squares, and capture diagonally. The en-passant square is read from
+        the position. Promotions are left to the caller, which expands any
+        move onto the last rank into one move per promotion piece.
         """
+        square_bit = 1 << curr_position
+        empty = ~position.occupied
+        opponent = position.occupancy[self.color ^ 1]
 
-        # A pawn's initial moveset is pretty easy to generate. Just
-        # one move forward, except if at starting square,
-        # which allows the pawn to move two squares ahead
-        (curr_y, curr_x) = curr_position
-
-        if self.owner == 'white' and curr_y == 1:
-            moveset = [(curr_y+1, curr_x), (curr_y+2, curr_x)]
-
-        elif self.owner == 'white':
-            moveset = [(curr_y+1, curr_x)]
-
-        elif self.owner == 'black' and curr_y == 7:
-            moveset = [(curr_y-1, curr_x), (curr_y-2, curr_x)]
-
-        elif self.owner == 'black':
-            moveset = [(curr_y-1, curr_x)]
-
-        # Check board to see if there are any possible collisions.
-        # Note that if there is an opponent piece at a diagonal,
-        # the pawn can move to capture it
-        for move in moveset:
-            (y, x) = move
-            piece = board[y][x]
-
-            if not piece:
-                continue
-            else:
-                moveset.remove(move)
-
-        # Check if there are opponent pieces at diagonals
-        if self.owner == 'white':
-            y = curr_y + 1
+        if self.color == WHITE:
+            single_push = (square_bit << 8) & empty
+            double_push = ((single_push & RANK_3) << 8) & empty
         else:
-            y = curr_y - 1
-
-        for x in (-1, 1):
-            piece = board[y][x]
-            if piece:
-                (color, _) = piece
-                if color != self.owner:
-                    moveset.append((y, x))
-
-        # Check if the pawn can perform an en-passant move
-        if en_passant:
-            (y, x) = en_passant
-            if y == curr_y:
-                if x + 1 == curr_x or x - 1 == curr_x:
-                    if self.owner == 'white':
-                        moveset.append((curr_y+1, x))
-                    else:
-                        moveset.append((curr_y-1, x))
+            single_push = (square_bit >> 8) & empty
+            double_push = ((single_push & RANK_6) >> 8) & empty
 
-        return moveset
+        # Check if there are opponent pieces at diagonals, or if the pawn
+        # can capture en-passant
+        targets = opponent
+        if position.en_passant is not None and position.side == self.color:
+            targets |= 1 << position.en_passant
+
+        return single_push | double_push | (PAWN_ATTACKS[self.color][curr_position] & targets)
 
 class GenerateKingMoveset(object):
     def __init__(self, owner='white'):
         self.owner = owner
+        self.color = _OwnerToColor[owner]
 
-    def __call__(self,
-                 curr_position,
-                 board,
-                 player_moveset,
-                 opponent_moveset):
+    def __call__(self, curr_position, position):
         """
-        :param opponent_moveset: all possible moves the other player's
-                                 pieces can make. We need this to verify
-                                 that the king can't move to any position
-                                 threatened by the other player's pieces
+        One square in any direction not occupied by a friendly piece nor
+        attacked by the opponent, plus castling if the rights are still
+        available, the squares between king and rook are empty and the king
+        doesn't move out of, through or into check. The attack map doesn't
+        see past the king itself, so when in check, moves away from a
+        checking slider still have to go through leaves_king_safe()
         """
-        (curr_y, curr_x) = curr_position
-
-        moveset = [
-            (curr_y+1, curr_x),
-            (curr_y-1, curr_x),
-            (curr_y+1, curr_x+1),
-            (curr_y-1, curr_x+1),
-            (curr_y+1, curr_x-1),
-            (curr_y-1, curr_x-1),
-            (curr_y, curr_x+1),
-            (curr_y, curr_x-1)
-        ]
-
-        # Filter for positions that are being occupied by the player's pieces
-        for move in moveset:
-            (y, x) = move
-            piece = board[y][x]
-
-            if not piece:
-                continue
-
-            (color, _) = piece
-
-            if color == self.owner:
-                moveset.remove(move)
-
-            # Filter out moves that would place the king in check
-            # TODO: put in check that sees if king is being supported
-            #       by another piece. If it is, it can move to a position
-            #       that would normally be threatened by the opponent king
-            #       and, thus, place the opponent's king in check
-            if move in opponent_moveset:
-                if move not in player_moveset:
-                    moveset.remove(move)
+        moveset = (KING_ATTACKS[curr_position] &
+                   ~position.occupancy[self.color] &
+                   ~position.attacks[self.color ^ 1])
+
+        if position.castling and position.side == self.color:
+            opponent = self.color ^ 1
+            for right, color, destination, empty, passes in _CASTLING:
+                if color != self.color or not position.castling & right:
+                    continue
+                if position.occupied & empty:
+                    continue
+                if is_square_attacked(position, curr_position, opponent):
+                    continue
+                if any(is_square_attacked(position, square, opponent) for square in passes):
+                    continue
+                moveset |= 1 << destination
 
         return moveset
-
@@ -0,0 +1,83 @@
+"""
+Reference neural network for guiding the search: a multi-layer perceptron
+written in plain NumPy
+
+It takes positions encoded as by tensors.py, (N, NUM_PLANES, 8, 8), and
+gives for each:
+
+    policy: (POLICY_SIZE,) logits, one per from and to square pair, indexed
+            by the lowest 12 bits of a move (move & 4095). Promotions to
+            different pieces share the same logit
+    value:  expected result for the side to move, in (-1, 1)
+
+The weights are random until trained elsewhere and loaded with MLP.load().
+"""
+import numpy as np
+
+# Custom Modules
+from tensors import NUM_PLANES
+
+INPUT_SIZE = NUM_PLANES * 64
+POLICY_SIZE = 64 * 64
+DEFAULT_HIDDEN_SIZES = (256, 256)
+
+
+class MLP(object):
+    """
+    :param hidden_sizes: width of each hidden (ReLU) layer
+    :param seed:         seed of the random initial weights
+    :param dtype:        dtype of the weights and of the forward pass
+    """
+    def __init__(self, hidden_sizes=DEFAULT_HIDDEN_SIZES, seed=None, dtype=np.float32):
+        rng = np.random.default_rng(seed)
+        self.dtype = dtype
+
+        # He initialisation, suited to ReLU layers
+        self.layers = []
+        fan_in = INPUT_SIZE
+        for size in hidden_sizes:
+            weights = rng.standard_normal((fan_in, size)) * np.sqrt(2.0 / fan_in)
+            self.layers.append((weights.astype(dtype), np.zeros(size, dtype=dtype)))
+            fan_in = size
+        self.policy_head = ((rng.standard_normal((fan_in, POLICY_SIZE)) *
+                             np.sqrt(1.0 / fan_in)).astype(dtype),
+                            np.zeros(POLICY_SIZE, dtype=dtype))
+        self.value_head = ((rng.standard_normal((fan_in, 1)) *
+                            np.sqrt(1.0 / fan_in)).astype(dtype),
+                           np.zeros(1, dtype=dtype))
+
+    def predict(self, planes):
+        """
+        Forward pass over a batch of encoded positions
+
+        :param planes: (N, NUM_PLANES, 8, 8) array
+        :return (policy, value): (N, POLICY_SIZE) logits, and (N,) values
+        """
+        x = np.asarray(planes, dtype=self.dtype).reshape(len(planes), INPUT_SIZE)
+        for (weights, bias) in self.layers:
+            x = np.maximum(x @ weights + bias, 0)
+        policy = x @ self.policy_head[0] + self.policy_head[1]
+        value = np.tanh(x @ self.value_head[0] + self.value_head[1])[:, 0]
+        return policy, value
+
+    def save(self, path):
+        arrays = {}
+        for (i, (weights, bias)) in enumerate(self.layers):
+            arrays['w{0}'.format(i)] = weights
+            arrays['b{0}'.format(i)] = bias
+        (arrays['policy_w'], arrays['policy_b']) = self.policy_head
+        (arrays['value_w'], arrays['value_b']) = self.value_head
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            hidden_sizes = []
+            while 'w{0}'.format(len(hidden_sizes)) in arrays:
+                hidden_sizes.append(arrays['w{0}'.format(len(hidden_sizes))].shape[1])
+            model = cls(hidden_sizes, dtype=arrays['policy_w'].dtype)
+            model.layers = [(arrays['w{0}'.format(i)], arrays['b{0}'.format(i)])
+                            for i in range(len(hidden_sizes))]
+            model.policy_head = (arrays['policy_w'], arrays['policy_b'])
+            model.value_head = (arrays['value_w'], arrays['value_b'])
+        return model
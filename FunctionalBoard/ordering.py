@@ -0,0 +1,149 @@
+"""
+Move ordering for the search (see search.py)
+
+Alpha-beta prunes the most when the best move of a node is searched first,
+so every move is given a score guessing how good it is, best first:
+
+    1. the hash move: the best move found for the position by a previous
+       search, kept in the transposition table
+    2. captures and promotions, most valuable victim first and, for the same
+       victim, least valuable attacker first (MVV-LVA)
+    3. killer moves: quiet moves that caused a cutoff at the same ply in
+       another branch of the tree
+    4. every other quiet move, by its butterfly history score: how often
+       (and how deep) the same from/to move caused a cutoff for that side
+
+Moves are picked lazily with pick_next(), one selection sort step at a
+time, so a node that cuts off on its first move never sorts the rest.
+"""
+from bitboard import PAWN, NUM_PIECE_TYPES
+
+# Score bands, so every kind of move stays in its place in the order
+HASH_MOVE_SCORE = 1 << 30
+CAPTURE_SCORE = 1 << 26
+KILLER_SCORE = 1 << 25
+HISTORY_MAX = 1 << 24
+
+MAX_PLY = 128
+
+
+def is_quiet(position, move):
+    """
+    Is the move neither a capture (en-passant included) nor a promotion?
+    """
+    if move >> 12:
+        return False
+    to_square = (move >> 6) & 63
+    if position.squares[to_square] is not None:
+        return False
+    return not (to_square == position.en_passant and
+                position.squares[move & 63] % NUM_PIECE_TYPES == PAWN)
+
+def pick_next(moves, scores, start):
+    """
+    One step of a selection sort: swap the best scored move from start on
+    into moves[start], and return it
+    """
+    best = start
+    best_score = scores[start]
+    for i in range(start + 1, len(moves)):
+        if scores[i] > best_score:
+            best = i
+            best_score = scores[i]
+    if best != start:
+        moves[start], moves[best] = moves[best], moves[start]
+        scores[start], scores[best] = scores[best], scores[start]
+    return moves[start]
+
+
+class MoveOrderer(object):
+    """
+    Killer moves and history scores learnt during a search
+    """
+    def __init__(self):
+        # Two killer moves per ply, most recent first
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+
+        # Butterfly history of each side, indexed by the from and to
+        # squares of a move (its lowest 12 bits)
+        self.history = [[0] * 4096, [0] * 4096]
+
+    def clear(self):
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+        self.history = [[0] * 4096, [0] * 4096]
+
+    def new_search(self):
+        """
+        Killers only apply to the tree they were found in, but history is
+        still a good guide for the next search. It's scaled down so the
+        new search's own results soon outweigh it
+        """
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+        for table in self.history:
+            table[:] = [score >> 2 for score in table]
+
+    def score_moves(self, position, moves, ply, hash_move=0):
+        """
+        :return scores: score of each move, higher to be searched first
+        """
+        squares = position.squares
+        en_passant = position.en_passant
+        killers = self.killers[ply] if ply < MAX_PLY else (0, 0)
+        history = self.history[position.side]
+
+        scores = []
+        for move in moves:
+            if move == hash_move:
+                scores.append(HASH_MOVE_SCORE)
+                continue
+
+            to_square = (move >> 6) & 63
+            victim = squares[to_square]
+            promotion = move >> 12
+            if victim is not None or promotion:
+                attacker = squares[move & 63] % NUM_PIECE_TYPES
+                score = CAPTURE_SCORE + (NUM_PIECE_TYPES - attacker)
+                if victim is not None:
+                    score += (victim % NUM_PIECE_TYPES + 1) << 4
+                if promotion:
+                    score += promotion << 8
+                scores.append(score)
+            elif to_square == en_passant and squares[move & 63] % NUM_PIECE_TYPES == PAWN:
+                scores.append(CAPTURE_SCORE + ((PAWN + 1) << 4) + NUM_PIECE_TYPES - PAWN)
+            elif move == killers[0]:
+                scores.append(KILLER_SCORE + 1)
+            elif move == killers[1]:
+                scores.append(KILLER_SCORE)
+            else:
+                scores.append(history[move & 4095])
+
+        return scores
+
+    def add_killer(self, ply, move):
+        if ply >= MAX_PLY:
+            return
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+
+    def update_history(self, side, best_move, depth, tried=()):
+        """
+        Reward the quiet move that caused a cutoff, and penalise the quiet
+        moves searched before it that didn't
+
+        :param tried: quiet moves searched before best_move at the node
+        """
+        history = self.history[side]
+        bonus = depth * depth
+        history[best_move & 4095] += bonus
+        for move in tried:
+            idx = move & 4095
+            history[idx] = max(history[idx] - bonus, 0)
+
+        # Keep every score below the killers'
+        if history[best_move & 4095] >= HISTORY_MAX:
+            history[:] = [score >> 1 for score in history]
+
+    def history_score(self, side, move):
+        return self.history[side][move & 4095]
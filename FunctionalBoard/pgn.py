@@ -0,0 +1,419 @@
+"""
+Streaming reader of PGN (Portable Game Notation) game archives
+
+    for (headers, position, move) in read_pgn('games.pgn'):
+        ...
+
+The file is read in fixed-size chunks of bytes and tokenized lazily, so
+neither a whole file nor a whole game is ever held in memory: archives
+larger than RAM are read at a steady footprint of about one chunk. Every
+move of the main line is resolved from its SAN (Standard Algebraic
+Notation) against a bitboard Position, and yielded as a record:
+
+    headers:  dict of the game's tag pairs, e.g. {'White': 'Tal', ...}
+    position: Position the move is played from
+    move:     the move, packed as in bitboard.py
+
+The position is updated in place once the next record is asked for, so
+copy it to keep it. Comments, NAGs and variations are skipped. A game
+whose movetext can't be resolved is skipped from the bad move on, and
+counted in PGNReader.errors.
+
+To fan out over several processes, split_archive() cuts a file into byte
+ranges that each hold whole games, and process_archive() runs a function
+over the records of every range in a pool of processes.
+"""
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+# Custom Modules
+from bitboard import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, NUM_PIECE_TYPES, starting_position
+from board import generate_movesets
+from fen import parse_square, position_from_fen, square_name
+from movesets import in_check
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+# Start of a game, for splitting archives. Games usually start with an
+# Event tag
+_GAME_START = b'\n[Event '
+
+# Tokens of a PGN file. Whitespace, escape lines, move numbers and NAGs
+# match none of the named groups, and are skipped
+_TOKEN = re.compile(rb'''
+      \s+
+    | \[\s*(?P<tag>[A-Za-z0-9_]+)\s+"(?P<value>(?:[^"\\]|\\.)*)"\s*\]
+    | \{[^}]*\}
+    | ;[^\n]*\n
+    | %[^\n]*\n
+    | (?P<open>\()
+    | (?P<close>\))
+    | \$\d+
+    | (?P<castle>(?:O-O(?:-O)?|0-0(?:-0)?)[+#]?[!?]*)
+    | (?P<result>1-0|0-1|1/2-1/2|\*)
+    | \d+\.*
+    | (?P<san>[A-Za-z][A-Za-z0-9=+#:\-]*[!?]*)
+''', re.VERBOSE)
+
+# Tokens that can't be matched until they're closed, and the longest one
+# waited for before giving up on the opening character as garbage
+_UNCLOSED = (b'{', b'[', b';', b'%')
+_MAX_TOKEN_BYTES = 1 << 16
+
+# Tokens ending this close to the end of the buffer wait for the next
+# chunk, as they may be the start of a longer one (a result cut after
+# '1-' reads as a move number). Longer than the longest result, 1/2-1/2
+_LOOKAHEAD = 8
+
+# SAN of a move other than castling
+_SAN = re.compile(r'^([NBRQK])?([a-h])?([1-8])?[x:]?-?([a-h][1-8])(?:=?([NBRQ]))?$')
+
+_PIECE_LETTERS = {
+    'N': KNIGHT,
+    'B': BISHOP,
+    'R': ROOK,
+    'Q': QUEEN,
+    'K': KING,
+}
+_LETTERS = {piece_type: letter for letter, piece_type in _PIECE_LETTERS.items()}
+
+
+class PGNError(ValueError):
+    """
+    Raised for a move that can't be resolved in its position
+    """
+    pass
+
+
+def parse_san(position, san, moves=None):
+    """
+    Resolve a move in SAN against a position
+
+    :param moves: the legal moves of the position, if already generated
+    :return move: the move, packed as in bitboard.py
+    :raise PGNError: if the SAN isn't exactly one legal move
+    """
+    if moves is None:
+        moves = generate_movesets(position)
+    text = san.rstrip('+#!?')
+    if text.endswith('e.p.'):
+        text = text[:-4]
+
+    if text in ('O-O', '0-0', 'O-O-O', '0-0-0'):
+        king = position.king_square(position.side)
+        to_square = king + 2 if len(text) == 3 else king - 2
+        candidates = [move for move in moves
+                      if move & 63 == king and (move >> 6) & 63 == to_square]
+    else:
+        match = _SAN.match(text)
+        if match is None:
+            raise PGNError("Invalid SAN: {0!r}".format(san))
+        (piece, from_file, from_rank, to_name, promotion) = match.groups()
+        piece_type = _PIECE_LETTERS[piece] if piece else PAWN
+        to_square = parse_square(to_name)
+        promotion = _PIECE_LETTERS[promotion] if promotion else 0
+        squares = position.squares
+
+        candidates = []
+        for move in moves:
+            from_square = move & 63
+            if ((move >> 6) & 63 != to_square or
+                    move >> 12 != promotion or
+                    squares[from_square] % NUM_PIECE_TYPES != piece_type):
+                continue
+            if from_file and from_square % 8 != ord(from_file) - ord('a'):
+                continue
+            if from_rank and from_square // 8 != int(from_rank) - 1:
+                continue
+            candidates.append(move)
+
+    if len(candidates) != 1:
+        raise PGNError("{0} move: {1!r}".format('Ambiguous' if candidates else 'Illegal', san))
+    return candidates[0]
+
+def move_to_san(position, move, moves=None):
+    """
+    SAN of a legal move in a position, with a check or mate suffix
+
+    :param moves: the legal moves of the position, if already generated
+    """
+    if moves is None:
+        moves = generate_movesets(position)
+    from_square = move & 63
+    to_square = (move >> 6) & 63
+    promotion = move >> 12
+    piece_type = position.squares[from_square] % NUM_PIECE_TYPES
+
+    if piece_type == KING and to_square - from_square in (2, -2):
+        san = 'O-O' if to_square > from_square else 'O-O-O'
+    elif piece_type == PAWN:
+        san = ''
+        if from_square % 8 != to_square % 8:
+            san = square_name(from_square)[0] + 'x'
+        san += square_name(to_square)
+        if promotion:
+            san += '=' + _LETTERS[promotion]
+    else:
+        # Name as much of the from square as needed to tell the move apart
+        # from the same kind of piece moving to the same square
+        others = [other & 63 for other in moves
+                  if other != move and (other >> 6) & 63 == to_square and
+                  position.squares[other & 63] % NUM_PIECE_TYPES == piece_type]
+        from_name = square_name(from_square)
+        san = _LETTERS[piece_type]
+        if others:
+            if all(other % 8 != from_square % 8 for other in others):
+                san += from_name[0]
+            elif all(other // 8 != from_square // 8 for other in others):
+                san += from_name[1]
+            else:
+                san += from_name
+        if position.squares[to_square] is not None:
+            san += 'x'
+        san += square_name(to_square)
+
+    undo = position.make_move(move)
+    if in_check(position, position.side):
+        san += '+' if generate_movesets(position) else '#'
+    position.unmake_move(undo)
+    return san
+
+def _game_position(headers):
+    """
+    Position a game starts from: its FEN tag, or the usual starting position
+    """
+    fen = headers.get('FEN')
+    if fen:
+        return position_from_fen(fen)
+    return starting_position()
+
+
+class PGNReader(object):
+    """
+    :param source:     path of a PGN file, or a file opened in binary mode
+    :param chunk_size: number of bytes read at a time
+    :param start:      byte offset to start reading at, which should be the
+                       start of a game (see split_archive)
+    :param end:        byte offset to stop reading at (None for the end of
+                       the file)
+    :param strict:     raise PGNError on a bad move, rather than skipping
+                       the rest of the game
+    """
+    def __init__(self, source, chunk_size=DEFAULT_CHUNK_SIZE, start=0, end=None, strict=False):
+        self.source = source
+        self.chunk_size = chunk_size
+        self.start = start
+        self.end = end
+        self.strict = strict
+
+        # Games read, and games cut short by a bad move
+        self.games = 0
+        self.errors = 0
+
+    def _chunks(self, stream):
+        stream.seek(self.start)
+        remaining = None if self.end is None else self.end - self.start
+        while remaining is None or remaining > 0:
+            size = self.chunk_size if remaining is None else min(self.chunk_size, remaining)
+            chunk = stream.read(size)
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+    def tokens(self):
+        """
+        Yield the tokens of the file as (kind, value) pairs, kind being
+        'tag' (value is a (name, value) pair), 'open', 'close', 'result' or
+        'san'
+        """
+        if isinstance(self.source, (str, bytes, os.PathLike)):
+            with open(self.source, 'rb') as stream:
+                yield from self._tokens(stream)
+        else:
+            yield from self._tokens(self.source)
+
+    def _tokens(self, stream):
+        buffer = b''
+        chunks = self._chunks(stream)
+        at_end = False
+        while True:
+            if not at_end:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    at_end = True
+                else:
+                    buffer += chunk
+
+            pos = 0
+            length = len(buffer)
+            while pos < length:
+                match = _TOKEN.match(buffer, pos)
+                # A token running to (or nearly to) the end of the buffer, or
+                # one that doesn't match yet (an unclosed comment, say), may
+                # carry on in the next chunk
+                if not at_end:
+                    if match is not None and match.end() > length - _LOOKAHEAD:
+                        break
+                    if (match is None and buffer[pos:pos + 1] in _UNCLOSED and
+                            length - pos < _MAX_TOKEN_BYTES):
+                        break
+                if match is None:
+                    # Not PGN: skip a character
+                    pos += 1
+                    continue
+                pos = match.end()
+
+                # The last group matched by a tag pair is its value
+                kind = match.lastgroup
+                if kind is None:
+                    continue
+                if kind == 'value':
+                    yield 'tag', (match.group('tag').decode('utf-8', 'replace'),
+                                  match.group('value').decode('utf-8', 'replace')
+                                  .replace('\\"', '"').replace('\\\\', '\\'))
+                elif kind == 'castle':
+                    yield 'san', match.group('castle').decode('ascii')
+                else:
+                    yield kind, match.group(kind).decode('ascii', 'replace')
+
+            buffer = buffer[pos:]
+            if at_end:
+                return
+
+    def __iter__(self):
+        """
+        Yield (headers, position, move) for every move of the main line of
+        every game
+        """
+        headers = {}
+        position = None
+        moves_ok = True
+        depth = 0
+        for (kind, value) in self.tokens():
+            if kind == 'tag':
+                if position is not None:
+                    # A game without a result: it ends at the next tags
+                    self.games += 1
+                    headers = {}
+                    position = None
+                (name, tag_value) = value
+                headers[name] = tag_value
+                continue
+
+            if kind == 'open':
+                depth += 1
+                continue
+            if kind == 'close':
+                depth = max(depth - 1, 0)
+                continue
+            if depth:
+                # Inside a variation
+                continue
+
+            if position is None:
+                try:
+                    position = _game_position(headers)
+                except ValueError:
+                    if self.strict:
+                        raise
+                    position = starting_position()
+                    moves_ok = False
+                    self.errors += 1
+                else:
+                    moves_ok = True
+
+            if kind == 'result':
+                self.games += 1
+                headers = {}
+                position = None
+                continue
+
+            if not moves_ok:
+                continue
+            try:
+                move = parse_san(position, value)
+            except PGNError:
+                if self.strict:
+                    raise
+                moves_ok = False
+                self.errors += 1
+                continue
+
+            yield headers, position, move
+            position.make_move(move)
+
+        if position is not None:
+            self.games += 1
+
+
+def read_pgn(source, **kwargs):
+    """
+    Yield (headers, position, move) for every move of every game of a PGN
+    file. Takes the same arguments as PGNReader
+    """
+    return iter(PGNReader(source, **kwargs))
+
+def split_archive(path, parts, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Cut a PGN file into byte ranges holding whole games, for reading in
+    parallel. The file is cut at the Event tags that start games
+
+    :param parts: number of ranges to aim for. Fewer are returned if there
+                  are too few games to go round
+    :return ranges: list of (start, end) byte offsets
+    """
+    size = os.path.getsize(path)
+    offsets = [0]
+    with open(path, 'rb') as stream:
+        for i in range(1, parts):
+            target = max(size * i // parts, offsets[-1] + 1)
+            offset = _next_game_start(stream, target, chunk_size)
+            if offset is None:
+                break
+            if offset > offsets[-1]:
+                offsets.append(offset)
+    offsets.append(size)
+    return list(zip(offsets[:-1], offsets[1:]))
+
+def _next_game_start(stream, offset, chunk_size):
+    """
+    Offset of the first game starting at or after the offset, or None
+    """
+    # Back up a byte so a game starting right at the offset is found too
+    position = max(offset - 1, 0)
+    stream.seek(position)
+    tail = b''
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return None
+        data = tail + chunk
+        found = data.find(_GAME_START)
+        if found >= 0:
+            return position - len(tail) + found + 1
+        tail = data[-(len(_GAME_START) - 1):]
+        position += len(chunk)
+
+def _process_range(path, start, end, function, chunk_size):
+    return function(PGNReader(path, chunk_size=chunk_size, start=start, end=end))
+
+def process_archive(path, function, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Run a function over the records of a PGN file, in parallel over byte
+    ranges of the file
+
+    :param function: function(reader) -> result, where iterating over the
+                     PGNReader gives the records of its range. It has to be
+                     defined at module level, to be sent to the processes
+    :param workers:  number of processes (defaults to the number of CPUs)
+    :return results: result of the function for every range, in file order
+    """
+    workers = workers or os.cpu_count() or 1
+    ranges = split_archive(path, workers, chunk_size)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_process_range, path, start, end, function, chunk_size)
+                   for (start, end) in ranges]
+        return [future.result() for future in futures]
@@ -0,0 +1,327 @@
+"""
+Vectorised random playouts: plays thousands of games of random moves in
+lockstep, as NumPy arrays
+
+    playouts = Playouts.from_position(position, 10000, seed=1)
+    results = playouts.run()
+
+Every board is held as a row of a (K, 12) uint64 array of piece bitboards
+(in the order of Position.pieces), plus arrays for the side to move and
+the en-passant square. A ply is played on all unfinished boards at once:
+the pseudo-legal moves of every board are generated set-wise, as a stack
+of destination bitboards (one per piece set, direction and distance),
+and one move is picked at random per board out of the total count.
+
+Playouts trade accuracy for speed, as Monte-Carlo evaluation only needs
+a rough result of many games:
+
+    * Moves aren't checked for leaving the king in check. Instead a game
+      ends when a king is captured, and the side that captured it wins
+    * Pawns always promote to a queen
+    * There is no castling
+    * A game with no moves, or that reaches max_plies, is a draw
+"""
+import numpy as np
+
+# Custom Modules
+from attacks import (
+    FULL_BOARD,
+    NOT_FILE_A,
+    NOT_FILE_H,
+    NOT_FILE_AB,
+    NOT_FILE_GH,
+    RANK_1,
+    RANK_3,
+    RANK_6,
+    RANK_8,
+)
+from bitboard import (
+    WHITE,
+    PAWN,
+    KNIGHT,
+    BISHOP,
+    ROOK,
+    QUEEN,
+    KING,
+    NUM_PIECE_TYPES,
+    NUM_PIECE_SETS,
+)
+
+# Results, from white's point of view
+WHITE_WINS = 1
+DRAW = 0
+BLACK_WINS = -1
+
+DEFAULT_MAX_PLIES = 200
+
+# Directions pieces move in, as (shift, mask) pairs. The mask removes
+# destination squares that wrapped around to the other side of the board
+_ROOK_DIRECTIONS = (
+    (8, FULL_BOARD),
+    (-8, FULL_BOARD),
+    (1, NOT_FILE_A),
+    (-1, NOT_FILE_H),
+)
+_BISHOP_DIRECTIONS = (
+    (9, NOT_FILE_A),
+    (7, NOT_FILE_H),
+    (-7, NOT_FILE_A),
+    (-9, NOT_FILE_H),
+)
+_KNIGHT_JUMPS = (
+    (17, NOT_FILE_A),
+    (15, NOT_FILE_H),
+    (10, NOT_FILE_AB),
+    (6, NOT_FILE_GH),
+    (-6, NOT_FILE_AB),
+    (-10, NOT_FILE_GH),
+    (-15, NOT_FILE_A),
+    (-17, NOT_FILE_H),
+)
+
+# Indices, in the stack of destination bitboards, of the pawns' double
+# pushes and en-passant captures (see Playouts._generate_moves())
+_DOUBLE_PUSH = 1
+_EN_PASSANT_CAPTURES = (3, 5)
+
+_ZERO = np.uint64(0)
+_ONE = np.uint64(1)
+_PROMOTION_RANKS = np.uint64(RANK_1 | RANK_8)
+
+# Constants for the SWAR popcount, used if NumPy is too old to have
+# np.bitwise_count (added in 2.0)
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0F0F0F0F0F0F0F0F)
+_H01 = np.uint64(0x0101010101010101)
+
+
+def _shift(bitboards, shift, mask):
+    if shift > 0:
+        return (bitboards << np.uint64(shift)) & np.uint64(mask)
+    return (bitboards >> np.uint64(-shift)) & np.uint64(mask)
+
+def _swar_popcount(bitboards):
+    x = bitboards - ((bitboards >> _ONE) & _M1)
+    x = (x & _M2) + ((x >> np.uint64(2)) & _M2)
+    x = (x + (x >> np.uint64(4))) & _M4
+    return ((x * _H01) >> np.uint64(56)).astype(np.uint8)
+
+# Number of squares set in each of an array of bitboards
+_popcount = getattr(np, 'bitwise_count', _swar_popcount)
+
+
+class Playouts(object):
+    """
+    :param pieces:     (K, 12) uint64 array of piece bitboards
+    :param side:       (K,) array of the side to move
+    :param en_passant: (K,) array of en-passant squares, -1 if there isn't one
+    :param max_plies:  number of plies after which a game is a draw
+    :param seed:       seed of the random number generator
+    """
+    def __init__(self, pieces, side, en_passant, max_plies=DEFAULT_MAX_PLIES, seed=None):
+        self.pieces = np.array(pieces, dtype=np.uint64).reshape(-1, NUM_PIECE_SETS)
+        num_boards = len(self.pieces)
+        self.side = np.array(side, dtype=np.int64).reshape(num_boards)
+        self.en_passant = np.array(en_passant, dtype=np.int64).reshape(num_boards)
+        self.max_plies = max_plies
+        self.rng = np.random.default_rng(seed)
+
+        self.plies = np.zeros(num_boards, dtype=np.int64)
+        self.done = np.zeros(num_boards, dtype=bool)
+        self.result = np.zeros(num_boards, dtype=np.int8)
+
+    @classmethod
+    def from_positions(cls, positions, **kwargs):
+        """
+        Start a playout from each of a list of bitboard Positions
+        """
+        return cls([position.pieces for position in positions],
+                   [position.side for position in positions],
+                   [-1 if position.en_passant is None else position.en_passant
+                    for position in positions],
+                   **kwargs)
+
+    @classmethod
+    def from_position(cls, position, num_playouts, **kwargs):
+        """
+        Start num_playouts playouts from the same Position
+        """
+        return cls([position.pieces] * num_playouts,
+                   [position.side] * num_playouts,
+                   [-1 if position.en_passant is None else position.en_passant] * num_playouts,
+                   **kwargs)
+
+    def __len__(self):
+        return len(self.pieces)
+
+    def _generate_moves(self, pieces, side, en_passant):
+        """
+        Pseudo-legal moves of a batch of boards
+
+        :return (targets, white_deltas, black_deltas):
+            targets: (M, K) array of destination bitboards
+            white_deltas, black_deltas: (M,) arrays of the square offset
+                     from the origin of a move to its destination, for each
+                     bitboard. They only differ for the pawns' moves
+        """
+        num_boards = len(pieces)
+        rows = np.arange(num_boards)[:, None]
+        white = side == WHITE
+        own_sets = pieces[rows, side[:, None] * NUM_PIECE_TYPES + np.arange(NUM_PIECE_TYPES)]
+        opponent_sets = pieces[rows, (side[:, None] ^ 1) * NUM_PIECE_TYPES + np.arange(NUM_PIECE_TYPES)]
+        own = np.bitwise_or.reduce(own_sets, axis=1)
+        opponent = np.bitwise_or.reduce(opponent_sets, axis=1)
+        empty = ~(own | opponent)
+        not_own = ~own
+
+        targets = []
+        white_deltas = []
+        black_deltas = []
+
+        # Pawns. Black's moves are white's mirrored, so only the direction
+        # of the shifts and the double push rank depend on the side
+        pawns = own_sets[:, PAWN]
+        single_push = np.where(white, pawns << np.uint64(8), pawns >> np.uint64(8)) & empty
+        double_from = single_push & np.where(white, np.uint64(RANK_3), np.uint64(RANK_6))
+        double_push = np.where(white, double_from << np.uint64(8), double_from >> np.uint64(8)) & empty
+        en_passant_bit = np.where(en_passant >= 0,
+                                  _ONE << np.maximum(en_passant, 0).astype(np.uint64),
+                                  _ZERO)
+        targets += [single_push, double_push]
+        white_deltas += [8, 16]
+        black_deltas += [-8, -16]
+        for (white_shift, black_shift, mask) in ((9, -7, NOT_FILE_A), (7, -9, NOT_FILE_H)):
+            captures = np.where(white,
+                                _shift(pawns, white_shift, mask),
+                                _shift(pawns, black_shift, mask))
+            targets += [captures & opponent, captures & en_passant_bit]
+            white_deltas += [white_shift, white_shift]
+            black_deltas += [black_shift, black_shift]
+
+        # Knights and kings move a single step in each direction
+        for (shift, mask) in _KNIGHT_JUMPS:
+            targets.append(_shift(own_sets[:, KNIGHT], shift, mask) & not_own)
+            white_deltas.append(shift)
+        for (shift, mask) in _ROOK_DIRECTIONS + _BISHOP_DIRECTIONS:
+            targets.append(_shift(own_sets[:, KING], shift, mask) & not_own)
+            white_deltas.append(shift)
+
+        # Sliders: one bitboard per direction and distance. The pieces that
+        # reached an empty square carry on to the next distance
+        queens = own_sets[:, QUEEN]
+        for sliders, directions in ((own_sets[:, ROOK] | queens, _ROOK_DIRECTIONS),
+                                    (own_sets[:, BISHOP] | queens, _BISHOP_DIRECTIONS)):
+            for (shift, mask) in directions:
+                frontier = sliders
+                for distance in range(1, 8):
+                    frontier = _shift(frontier, shift, mask) & not_own
+                    if not frontier.any():
+                        break
+                    targets.append(frontier)
+                    white_deltas.append(shift * distance)
+                    frontier = frontier & empty
+
+        # Only the pawns move differently for black
+        black_deltas += white_deltas[len(black_deltas):]
+        return np.stack(targets), np.array(white_deltas), np.array(black_deltas)
+
+    def step(self):
+        """
+        Play one random move on every unfinished board
+
+        :return num_active: number of boards that were still playing
+        """
+        active = np.flatnonzero(~self.done)
+        if not len(active):
+            return 0
+
+        pieces = self.pieces[active]
+        side = self.side[active]
+        (targets, white_deltas, black_deltas) = self._generate_moves(
+            pieces, side, self.en_passant[active])
+
+        # Boards without a single move are drawn
+        counts = _popcount(targets)
+        cumulative = counts.cumsum(axis=0, dtype=np.int32)
+        totals = cumulative[-1]
+        stuck = totals == 0
+        if stuck.any():
+            self.done[active[stuck]] = True
+            self.result[active[stuck]] = DRAW
+            keep = ~stuck
+            (active, pieces, side, targets, counts, cumulative, totals) = (
+                active[keep], pieces[keep], side[keep], targets[:, keep],
+                counts[:, keep], cumulative[:, keep], totals[keep])
+            if not len(active):
+                return 0
+
+        # Pick the r-th move of every board: first the bitboard it's in,
+        # then the bit within that bitboard
+        rows = np.arange(len(active))
+        choice = (self.rng.random(len(active)) * totals).astype(np.int32)
+        move_set = (cumulative > choice).argmax(axis=0)
+        nth = choice - (cumulative[move_set, rows] - counts[move_set, rows])
+
+        chosen = targets[move_set, rows]
+        bits = np.unpackbits(chosen.astype('<u8').view(np.uint8).reshape(-1, 8),
+                             axis=1, bitorder='little')
+        to_square = (bits.cumsum(axis=1) > nth[:, None]).argmax(axis=1)
+        from_square = to_square - np.where(side == WHITE,
+                                           white_deltas[move_set],
+                                           black_deltas[move_set])
+        to_bit = _ONE << to_square.astype(np.uint64)
+        from_bit = _ONE << from_square.astype(np.uint64)
+
+        # Piece sets the moving and captured pieces belong to
+        moving = ((pieces & from_bit[:, None]) != 0).argmax(axis=1)
+        on_target = (pieces & to_bit[:, None]) != 0
+        captured = on_target.any(axis=1)
+        captured_set = on_target.argmax(axis=1)
+
+        is_en_passant = np.isin(move_set, _EN_PASSANT_CAPTURES)
+        if is_en_passant.any():
+            captured_square = to_square - np.where(side == WHITE, 8, -8)
+            captured_bit = np.where(is_en_passant,
+                                    _ONE << captured_square.astype(np.uint64),
+                                    to_bit)
+            captured |= is_en_passant
+            captured_set = np.where(is_en_passant,
+                                    (side ^ 1) * NUM_PIECE_TYPES + PAWN,
+                                    captured_set)
+        else:
+            captured_bit = to_bit
+
+        pieces[rows[captured], captured_set[captured]] ^= captured_bit[captured]
+        pieces[rows, moving] ^= from_bit | to_bit
+
+        promoted = (moving % NUM_PIECE_TYPES == PAWN) & ((to_bit & _PROMOTION_RANKS) != 0)
+        if promoted.any():
+            pieces[rows[promoted], moving[promoted]] ^= to_bit[promoted]
+            pieces[rows[promoted], moving[promoted] + (QUEEN - PAWN)] |= to_bit[promoted]
+
+        self.pieces[active] = pieces
+        self.en_passant[active] = np.where(move_set == _DOUBLE_PUSH,
+                                           (from_square + to_square) // 2,
+                                           -1)
+        self.side[active] = side ^ 1
+        self.plies[active] += 1
+
+        # Capturing the king wins the game
+        king_captured = captured & (captured_set % NUM_PIECE_TYPES == KING)
+        self.result[active[king_captured]] = np.where(side[king_captured] == WHITE,
+                                                      WHITE_WINS, BLACK_WINS)
+        finished = king_captured | (self.plies[active] >= self.max_plies)
+        self.done[active[finished]] = True
+
+        return len(active)
+
+    def run(self):
+        """
+        Play every game to the end
+
+        :return results: (K,) array of results, from white's point of view
+        """
+        while self.step():
+            pass
+        return self.result
@@ -0,0 +1,576 @@
+"""
+Alpha-beta search: picks the move to play in a position
+
+The search is a negamax alpha-beta with principal variation search (PVS):
+the first move of every node is searched with the full window, and the
+rest with a null window that only has to prove them worse, re-searching
+the few that turn out better. Where the depth runs out, a quiescence
+search carries on with captures only (every evasion when in check) until
+the position is quiet, so a leaf in the middle of an exchange isn't
+scored as if the exchange was over. Captures that lose material by static
+exchange evaluation (see exchange.py) are pruned there, which keeps the
+quiescence trees small.
+
+Away from the principal variation the search is selective: null-move
+pruning, late move reductions (deeper for moves with no history of
+cutoffs), futility pruning and razoring cut down the nodes spent on moves
+that are very unlikely to matter. Each can be turned off, and the Searcher
+counts how often each one kicked in.
+
+The search deepens iteratively, one ply at a time, until it runs out of
+depth, nodes or time, and plays the best move of the deepest search that
+got far enough.
+
+Each iteration starts from what the previous ones learnt: the best move
+found for every position is kept in the transposition table (see
+transposition.py) and tried first, the killer moves and history scores
+that order the other moves carry over (see ordering.py), and the best root
+move of each iteration is searched first in the next. Keep the same
+Searcher for a whole game, and consecutive moves reuse all of it too.
+"""
+import math
+import time
+
+# Custom Modules
+from bitboard import KNIGHT, QUEEN, NUM_PIECE_TYPES
+from board import generate_movesets
+from evaluation import evaluate
+from exchange import see
+from movesets import in_check
+from ordering import MAX_PLY, MoveOrderer, is_quiet, pick_next
+from transposition import (
+    BOUND_EXACT,
+    BOUND_LOWER,
+    BOUND_UPPER,
+    TranspositionTable,
+)
+
+# Scores, in centipawns. A mate found n plies from the root scores
+# MATE_SCORE - n, so nearer mates are preferred
+INFINITY = 32000
+MATE_SCORE = 30000
+MATE_BOUND = MATE_SCORE - 1000
+
+DEFAULT_MAX_DEPTH = 64
+
+# How often (in nodes) the budgets are checked
+_CHECK_EVERY = 1024
+
+# Null-move pruning: the null move is searched this many plies shallower
+# (one more above NULL_MOVE_DEEP_DEPTH), and from NULL_MOVE_VERIFY_DEPTH on
+# a cutoff is verified by a reduced search without the null move
+NULL_MOVE_MIN_DEPTH = 3
+NULL_MOVE_REDUCTION = 2
+NULL_MOVE_DEEP_DEPTH = 6
+NULL_MOVE_VERIFY_DEPTH = 7
+
+# Late move reductions: from the LMR_MIN_MOVES-th move on, at depth
+# LMR_MIN_DEPTH or more, reduced by LMR_REDUCTIONS[depth][move number]
+LMR_MIN_MOVES = 3
+LMR_MIN_DEPTH = 3
+LMR_REDUCTIONS = [[0] * 64] + [
+    [0] + [int(0.5 + math.log(depth) * math.log(number) / 2.25) for number in range(1, 64)]
+    for depth in range(1, 64)]
+
+# Margins (in centipawns) by remaining depth for futility pruning and razoring
+FUTILITY_MARGINS = (0, 200, 350, 500)
+RAZOR_MARGINS = (0, 300, 500)
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside the search when it runs out of nodes or time
+    """
+    pass
+
+
+def _has_pieces(position, side):
+    """
+    Has the side anything besides its king and pawns? Without, zugzwang is
+    common and passing the turn is no guide to the position
+    """
+    pieces = position.pieces
+    offset = side * NUM_PIECE_TYPES
+    return any(pieces[offset + piece_type] for piece_type in range(KNIGHT, QUEEN + 1))
+
+def _score_to_table(score, ply):
+    # Mate scores are stored relative to the position, rather than the root
+    if score > MATE_BOUND:
+        return score + ply
+    if score < -MATE_BOUND:
+        return score - ply
+    return score
+
+def _score_from_table(score, ply):
+    if score > MATE_BOUND:
+        return score - ply
+    if score < -MATE_BOUND:
+        return score + ply
+    return score
+
+
+class Searcher(object):
+    """
+    :param tt_size_mb: memory budget of the transposition table, in megabytes
+    :param max_depth:  default depth limit of a search
+    :param max_nodes:  default node budget of a search (None for no limit)
+    :param max_time:   default time budget of a search, in seconds (None for
+                       no limit)
+
+    Selective search, each of which can be turned off:
+
+    :param null_move:            null-move pruning
+    :param late_move_reductions: late move reductions
+    :param futility:             futility pruning
+    :param razoring:             razoring
+
+    :param tt:         transposition table to use, rather than a new one of
+                       tt_size_mb (such as one shared with other searchers)
+    :param stop_event: event (threading or multiprocessing) that stops the
+                       search when set, like running out of time
+    """
+    def __init__(self,
+                 tt_size_mb=16,
+                 max_depth=DEFAULT_MAX_DEPTH,
+                 max_nodes=None,
+                 max_time=None,
+                 null_move=True,
+                 late_move_reductions=True,
+                 futility=True,
+                 razoring=True,
+                 tt=None,
+                 stop_event=None):
+        self.tt = tt if tt is not None else TranspositionTable(tt_size_mb)
+        self.stop_event = stop_event
+        self.orderer = MoveOrderer()
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self.max_time = max_time
+        self.null_move = null_move
+        self.late_move_reductions = late_move_reductions
+        self.futility = futility
+        self.razoring = razoring
+
+        # Keys of the positions played in the game and along the current
+        # line of the search, for spotting repetitions
+        self._keys = []
+
+        self.nodes = 0
+        # Nodes of the quiescence search (counted in nodes as well), and the
+        # captures it skipped as losing material
+        self.qnodes = 0
+        self.see_pruned = 0
+        # Cutoffs, and how many of them were on the first move searched: a
+        # measure of how good the move ordering is
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        # What the selective search pruned or reduced
+        self.null_move_cutoffs = 0
+        self.lmr_reductions = 0
+        self.lmr_researches = 0
+        self.futility_pruned = 0
+        self.razored = 0
+        self._node_limit = None
+        self._deadline = None
+
+        # Results of the last search
+        self.best_move = 0
+        self.best_score = 0
+        self.depth = 0
+        self.pv = []
+
+    def _check_limits(self):
+        if self._node_limit is not None and self.nodes >= self._node_limit:
+            raise SearchTimeout()
+        if self._deadline is not None and time.perf_counter() >= self._deadline:
+            raise SearchTimeout()
+        if self.stop_event is not None and self.stop_event.is_set():
+            raise SearchTimeout()
+
+    def _is_repetition(self, position):
+        """
+        Has the position occurred before? Only positions since the last
+        capture or pawn move can repeat, and only with the same side to move
+        """
+        keys = self._keys
+        key = position.key
+        stop = max(len(keys) - position.halfmove_clock - 2, -1)
+        for i in range(len(keys) - 3, stop, -2):
+            if keys[i] == key:
+                return True
+        return False
+
+    def _negamax(self, position, depth, alpha, beta, ply, allow_null=True):
+        self.nodes += 1
+        if not self.nodes % _CHECK_EVERY:
+            self._check_limits()
+
+        if position.halfmove_clock >= 100 or self._is_repetition(position):
+            return 0
+
+        if depth <= 0:
+            return self._quiescence(position, alpha, beta, ply)
+
+        key = position.key
+        hash_move = 0
+        entry = self.tt.probe(key)
+        if entry is not None:
+            (hash_move, score, entry_depth, bound) = entry
+            if entry_depth >= depth and beta - alpha == 1:
+                score = _score_from_table(score, ply)
+                if (bound == BOUND_EXACT or
+                        (bound == BOUND_LOWER and score >= beta) or
+                        (bound == BOUND_UPPER and score <= alpha)):
+                    return score
+
+        side = position.side
+        checked = in_check(position, side)
+        keys = self._keys
+
+        # Selective search, only away from the principal variation (in null
+        # windows) and never when in check
+        futile = False
+        futility_score = -INFINITY
+        if beta - alpha == 1 and not checked:
+            static_eval = evaluate(position)
+
+            # Razoring: so far below alpha that only a capture could make up
+            # for it, so let the quiescence search decide
+            if (self.razoring and depth < len(RAZOR_MARGINS) and not hash_move and
+                    static_eval + RAZOR_MARGINS[depth] <= alpha):
+                score = self._quiescence(position, alpha, beta, ply)
+                if score <= alpha:
+                    self.razored += 1
+                    return score
+
+            # Null-move pruning: if passing the turn still leaves the side to
+            # move above beta, a real move would too. Not in zugzwang-prone
+            # positions (only pawns left), and not twice in a row
+            if (self.null_move and allow_null and depth >= NULL_MOVE_MIN_DEPTH and
+                    static_eval >= beta and abs(beta) < MATE_BOUND and
+                    _has_pieces(position, side)):
+                reduction = NULL_MOVE_REDUCTION + (depth > NULL_MOVE_DEEP_DEPTH)
+                undo = position.make_null_move()
+                keys.append(position.key)
+                try:
+                    score = -self._negamax(position, depth - 1 - reduction, -beta, -beta + 1,
+                                           ply + 1, False)
+                finally:
+                    keys.pop()
+                    position.unmake_null_move(undo)
+                if score >= beta:
+                    # Deep down, a zugzwang would cut off whole subtrees, so
+                    # check with a reduced search that doesn't pass
+                    if depth >= NULL_MOVE_VERIFY_DEPTH:
+                        score = self._negamax(position, depth - 1 - reduction, beta - 1, beta,
+                                              ply, False)
+                    if score >= beta:
+                        self.null_move_cutoffs += 1
+                        # Mates found after passing aren't real mates
+                        return beta if score > MATE_BOUND else score
+
+            # Futility pruning: near the leaves, quiet moves can't raise the
+            # score above alpha by more than the margin
+            if (self.futility and depth < len(FUTILITY_MARGINS) and
+                    abs(alpha) < MATE_BOUND):
+                futility_score = static_eval + FUTILITY_MARGINS[depth]
+                futile = futility_score <= alpha
+
+        moves = generate_movesets(position)
+        if not moves:
+            # Checkmate or stalemate
+            return -MATE_SCORE + ply if checked else 0
+
+        alpha_orig = alpha
+        best_score = -INFINITY
+        best_move = 0
+        orderer = self.orderer
+        killers = orderer.killers[ply] if ply < MAX_PLY else ()
+        scores = orderer.score_moves(position, moves, ply, hash_move)
+        quiets_tried = []
+        for i in range(len(moves)):
+            move = pick_next(moves, scores, i)
+            quiet = is_quiet(position, move)
+            undo = position.make_move(move)
+            gives_check = in_check(position, side ^ 1)
+
+            if futile and quiet and i > 0 and not gives_check:
+                position.unmake_move(undo)
+                self.futility_pruned += 1
+                if futility_score > best_score:
+                    best_score = futility_score
+                continue
+
+            # Late move reductions: quiet moves ordered late are unlikely to
+            # be best, the more so if they seldom caused cutoffs before, so
+            # they're searched less deep unless they turn out better than
+            # alpha
+            reduction = 0
+            if (self.late_move_reductions and quiet and i >= LMR_MIN_MOVES and
+                    depth >= LMR_MIN_DEPTH and not checked and not gives_check and
+                    move not in killers):
+                reduction = LMR_REDUCTIONS[min(depth, 63)][min(i, 63)]
+                if not orderer.history_score(side, move):
+                    reduction += 1
+                reduction = min(reduction, depth - 2)
+                if reduction > 0:
+                    self.lmr_reductions += 1
+
+            keys.append(position.key)
+            try:
+                if i == 0:
+                    score = -self._negamax(position, depth - 1, -beta, -alpha, ply + 1)
+                else:
+                    # Null window: prove the move is no better than alpha
+                    score = -self._negamax(position, depth - 1 - reduction, -alpha - 1, -alpha,
+                                           ply + 1)
+                    if reduction > 0 and score > alpha:
+                        self.lmr_researches += 1
+                        score = -self._negamax(position, depth - 1, -alpha - 1, -alpha, ply + 1)
+                    if alpha < score < beta:
+                        score = -self._negamax(position, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                keys.pop()
+                position.unmake_move(undo)
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        self.cutoffs += 1
+                        if i == 0:
+                            self.first_move_cutoffs += 1
+                        if quiet:
+                            orderer.add_killer(ply, move)
+                            orderer.update_history(side, move, depth, quiets_tried)
+                        break
+            if quiet:
+                quiets_tried.append(move)
+
+        if best_score >= beta:
+            bound = BOUND_LOWER
+        elif best_score > alpha_orig:
+            bound = BOUND_EXACT
+        else:
+            bound = BOUND_UPPER
+        self.tt.store(key, depth, _score_to_table(best_score, ply), bound, best_move)
+
+        return best_score
+
+    def _quiescence(self, position, alpha, beta, ply):
+        """
+        Search captures (and queen promotions) until the position is quiet.
+        The side to move can always stand pat on the static evaluation
+        instead, unless in check, when every evasion is searched
+        """
+        self.nodes += 1
+        self.qnodes += 1
+        if not self.nodes % _CHECK_EVERY:
+            self._check_limits()
+
+        if ply >= MAX_PLY:
+            return evaluate(position)
+        checked = in_check(position, position.side)
+
+        moves = generate_movesets(position)
+        if checked:
+            if not moves:
+                return -MATE_SCORE + ply
+            best_score = -INFINITY
+        else:
+            best_score = evaluate(position)
+            if best_score >= beta:
+                return best_score
+            if best_score > alpha:
+                alpha = best_score
+            moves = [move for move in moves
+                     if not is_quiet(position, move) and move >> 12 in (0, QUEEN)]
+
+        scores = self.orderer.score_moves(position, moves, ply)
+        for i in range(len(moves)):
+            move = pick_next(moves, scores, i)
+            # Losing captures: the opponent comes out ahead by trading on
+            # the square, whatever the rest of the position
+            if not checked and see(position, move) < 0:
+                self.see_pruned += 1
+                continue
+
+            undo = position.make_move(move)
+            try:
+                score = -self._quiescence(position, -beta, -alpha, ply + 1)
+            finally:
+                position.unmake_move(undo)
+
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+
+        return best_score
+
+    def _search_root(self, position, moves, depth):
+        """
+        Search every root move to the given depth
+
+        :return (best move, score): the root moves are reordered so the best
+                                    comes first, followed by the rest in the
+                                    order they were searched
+        """
+        alpha = -INFINITY
+        beta = INFINITY
+        best_move = moves[0]
+        keys = self._keys
+        for i, move in enumerate(list(moves)):
+            undo = position.make_move(move)
+            keys.append(position.key)
+            try:
+                if i == 0:
+                    score = -self._negamax(position, depth - 1, -beta, -alpha, 1)
+                else:
+                    score = -self._negamax(position, depth - 1, -alpha - 1, -alpha, 1)
+                    if score > alpha:
+                        score = -self._negamax(position, depth - 1, -beta, -alpha, 1)
+            finally:
+                keys.pop()
+                position.unmake_move(undo)
+
+            if score > alpha:
+                alpha = score
+                best_move = move
+                # A move that beats the first is good enough to play even if
+                # the iteration doesn't finish
+                self.best_move = move
+                self.best_score = score
+                moves.remove(move)
+                moves.insert(0, move)
+
+        self.tt.store(position.key, depth, _score_to_table(alpha, 0), BOUND_EXACT, best_move)
+        return best_move, alpha
+
+    def principal_variation(self, position, first_move=0, max_length=None):
+        """
+        Line of best moves from the position, read back from the
+        transposition table
+
+        :param first_move: move to start the line with, rather than the one
+                           stored for the position
+        """
+        max_length = max_length or self.depth or 1
+        pv = []
+        undos = []
+        seen = set()
+        while len(pv) < max_length and position.key not in seen:
+            seen.add(position.key)
+            if first_move:
+                move = first_move
+                first_move = 0
+            else:
+                entry = self.tt.probe(position.key)
+                if entry is None or not entry[0] or entry[0] not in generate_movesets(position):
+                    break
+                move = entry[0]
+            pv.append(move)
+            undos.append(position.make_move(move))
+        for undo in reversed(undos):
+            position.unmake_move(undo)
+        return pv
+
+    def search(self,
+               position,
+               max_depth=None,
+               max_nodes=None,
+               max_time=None,
+               history=None,
+               root_moves=None,
+               skip=None):
+        """
+        Search the position by iterative deepening
+
+        :param position:   Position to search. Left as it was when done
+        :param max_depth:  depth limit (defaults to the Searcher's)
+        :param max_nodes:  node budget (defaults to the Searcher's)
+        :param max_time:   time budget in seconds (defaults to the Searcher's)
+        :param history:    keys of the positions played before this one in
+                           the game, for spotting repetitions
+        :param root_moves: only consider these moves (defaults to all the
+                           legal moves)
+        :param skip:       (size, phase) to leave out some depths of the
+                           iterative deepening: depth d is skipped when
+                           (d + phase) // size is odd. Lets searchers
+                           sharing a table search different depths (see
+                           smp.py). The first depth is never skipped
+
+        :return (best move, score): score is in centipawns, from the point
+                                    of view of the side to move. The best
+                                    move is 0 if there are no legal moves
+        """
+        max_depth = max_depth or self.max_depth
+        max_nodes = max_nodes if max_nodes is not None else self.max_nodes
+        max_time = max_time if max_time is not None else self.max_time
+
+        self.tt.new_search()
+        self.orderer.new_search()
+        self.nodes = 0
+        self.qnodes = 0
+        self.see_pruned = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.null_move_cutoffs = 0
+        self.lmr_reductions = 0
+        self.lmr_researches = 0
+        self.futility_pruned = 0
+        self.razored = 0
+        self._node_limit = max_nodes
+        self._deadline = None if max_time is None else time.perf_counter() + max_time
+        self._keys = list(history or []) + [position.key]
+        self.depth = 0
+        self.pv = []
+
+        legal_moves = generate_movesets(position)
+        if root_moves is not None:
+            moves = [move for move in legal_moves if move in root_moves]
+        else:
+            moves = legal_moves
+        if not moves:
+            self.best_move = 0
+            self.best_score = -MATE_SCORE if in_check(position, position.side) else 0
+            return self.best_move, self.best_score
+
+        # Before the first iteration, the root moves are searched in the
+        # same order as any other node's
+        entry = self.tt.probe(position.key)
+        scores = self.orderer.score_moves(position, moves, 0, entry[0] if entry else 0)
+        moves = [move for (_, move) in sorted(zip(scores, moves), key=lambda pair: -pair[0])]
+        self.best_move = moves[0]
+        self.best_score = 0
+
+        for depth in range(1, max_depth + 1):
+            if skip is not None and depth > 1 and ((depth + skip[1]) // skip[0]) % 2:
+                continue
+            try:
+                (best_move, best_score) = self._search_root(position, moves, depth)
+            except SearchTimeout:
+                break
+            self.best_move = best_move
+            self.best_score = best_score
+            self.depth = depth
+
+            # No point searching deeper once a forced mate is found
+            if abs(best_score) > MATE_BOUND:
+                break
+
+        self._node_limit = None
+        self._deadline = None
+        self.pv = self.principal_variation(position, self.best_move)
+        return self.best_move, self.best_score
+
+    def choose_move(self, position, history=None, root_moves=None):
+        """
+        Move to play in the position, searched within the Searcher's
+        default budgets
+        """
+        return self.search(position, history=history, root_moves=root_moves)[0]
@@ -0,0 +1,230 @@
+"""
+Headless self-play: plays games of random moves against itself on every
+core, to generate training data
+
+    python selfplay.py --games 10000 --workers 8
+
+Games are split into batches and farmed out to a ProcessPoolExecutor, and
+finished games are yielded as soon as their batch comes back. Every game
+is played with its own random number generator, seeded from the base seed
+and the game's index, so any game can be replayed on its own by index,
+however many workers were used.
+
+Each game is returned as a compact GameRecord, holding its moves as an
+array of 16-bit encoded moves (see bitboard.encode_move()). With --output,
+the games are written to a compressed binary file (see gamefile.py)
+"""
+import argparse
+import collections
+import os
+import random
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+
+# Custom Modules
+from bitboard import (
+    BLACK,
+    WHITE,
+    PAWN,
+    KNIGHT,
+    BISHOP,
+    ROOK,
+    QUEEN,
+    NUM_PIECE_TYPES,
+    popcount,
+    starting_position,
+)
+from board import generate_movesets
+from movesets import in_check
+
+# Same default seed as the OO engine's Board.seed
+DEFAULT_SEED = 1024
+
+# Results, from white's point of view
+WHITE_WINS = 1
+DRAW = 0
+BLACK_WINS = -1
+
+# Ways a game can end
+CHECKMATE = 'checkmate'
+STALEMATE = 'stalemate'
+FIFTY_MOVES = 'fifty moves'
+REPETITION = 'repetition'
+INSUFFICIENT_MATERIAL = 'insufficient material'
+MAX_PLIES = 'max plies'
+
+# A game longer than this is stopped and scored as a draw
+DEFAULT_MAX_PLIES = 400
+
+GameRecord = collections.namedtuple('GameRecord', 'index seed result termination moves')
+
+
+def game_seed(base_seed, index):
+    """
+    Seed of the index-th game of a self-play run. Derived with a NumPy
+    SeedSequence, so the streams of different games are independent
+    """
+    sequence = np.random.SeedSequence(base_seed, spawn_key=(index,))
+    return int(sequence.generate_state(1, np.uint64)[0])
+
+# Light squares (b1, a2, ...), to tell which colour of squares bishops are on
+_LIGHT_SQUARES = 0x55AA55AA55AA55AA
+
+def _insufficient_material(position):
+    """
+    Neither side can possibly checkmate: only the kings are left, plus a
+    single knight or bishop, or one bishop each on squares of the same
+    colour. Other endings with minor pieces (such as a knight against a
+    bishop) are rarely won, but a mate is still possible
+    """
+    pieces = position.pieces
+    minors = []
+    for color in (BLACK, WHITE):
+        offset = color * NUM_PIECE_TYPES
+        if pieces[offset + PAWN] or pieces[offset + ROOK] or pieces[offset + QUEEN]:
+            return False
+        minors += [(piece_type, pieces[offset + piece_type]) for piece_type in (KNIGHT, BISHOP)
+                   if pieces[offset + piece_type]]
+
+    if sum(popcount(bitboard) for (_, bitboard) in minors) <= 1:
+        return True
+    if len(minors) == 2 and all(piece_type == BISHOP and popcount(bitboard) == 1
+                                for (piece_type, bitboard) in minors):
+        on_light = [bool(bitboard & _LIGHT_SQUARES) for (_, bitboard) in minors]
+        return on_light[0] == on_light[1]
+    return False
+
+def play_game(index, base_seed=DEFAULT_SEED, max_plies=DEFAULT_MAX_PLIES):
+    """
+    Play one game of random moves from the starting position
+
+    :return record: GameRecord of the game
+    """
+    seed = game_seed(base_seed, index)
+    rng = random.Random(seed)
+    position = starting_position()
+    moves = array('H')
+
+    # Number of times each position has occurred, for threefold repetition
+    seen = collections.Counter([position.key])
+
+    while True:
+        moveset = generate_movesets(position)
+        if not moveset:
+            if in_check(position, position.side):
+                result = BLACK_WINS if position.side == WHITE else WHITE_WINS
+                termination = CHECKMATE
+            else:
+                (result, termination) = (DRAW, STALEMATE)
+            break
+        if position.halfmove_clock >= 100:
+            (result, termination) = (DRAW, FIFTY_MOVES)
+            break
+        if seen[position.key] >= 3:
+            (result, termination) = (DRAW, REPETITION)
+            break
+        if _insufficient_material(position):
+            (result, termination) = (DRAW, INSUFFICIENT_MATERIAL)
+            break
+        if len(moves) >= max_plies:
+            (result, termination) = (DRAW, MAX_PLIES)
+            break
+
+        move = moveset[rng.randrange(len(moveset))]
+        position.make_move(move)
+        moves.append(move)
+        seen[position.key] += 1
+
+    return GameRecord(index, seed, result, termination, moves)
+
+def play_games(indices, base_seed=DEFAULT_SEED, max_plies=DEFAULT_MAX_PLIES):
+    """
+    Play a batch of games in a worker process
+    """
+    return [play_game(index, base_seed, max_plies) for index in indices]
+
+def self_play(num_games,
+              workers=None,
+              base_seed=DEFAULT_SEED,
+              max_plies=DEFAULT_MAX_PLIES,
+              batch_size=16,
+              first_index=0):
+    """
+    Play games across a pool of processes
+
+    :param num_games:   number of games to play
+    :param workers:     number of worker processes (defaults to one per core)
+    :param base_seed:   seed the seed of every game is derived from
+    :param max_plies:   length after which a game is scored as a draw
+    :param batch_size:  number of games sent to a worker at a time
+    :param first_index: index of the first game, to continue a previous run
+
+    :return records: generator of GameRecords, in the order games finish
+    """
+    workers = workers or os.cpu_count() or 1
+    batches = (range(start, min(start + batch_size, first_index + num_games))
+               for start in range(first_index, first_index + num_games, batch_size))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Keep a few batches per worker in flight, rather than submitting
+        # every game up front
+        pending = set()
+        for batch in batches:
+            pending.add(executor.submit(play_games, batch, base_seed, max_plies))
+            if len(pending) < 4 * workers:
+                continue
+            (done, pending) = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+
+        while pending:
+            (done, pending) = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play games of random moves across all cores")
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--max-plies', type=int, default=DEFAULT_MAX_PLIES)
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--output', default=None,
+                        help="file to write the games to (see gamefile.py)")
+    parser.add_argument('--codec', choices=('zlib', 'lzma', 'none'), default='zlib',
+                        help="compression of the output file")
+    args = parser.parse_args(argv)
+
+    writer = None
+    if args.output:
+        # gamefile.py imports this module for GameRecord
+        from gamefile import GameWriter
+        writer = GameWriter(args.output, codec=args.codec)
+
+    results = collections.Counter()
+    terminations = collections.Counter()
+    plies = 0
+
+    start = time.perf_counter()
+    for record in self_play(args.games, args.workers, args.seed, args.max_plies, args.batch_size):
+        results[record.result] += 1
+        terminations[record.termination] += 1
+        plies += len(record.moves)
+        if writer is not None:
+            writer.write(record)
+    if writer is not None:
+        writer.close()
+    seconds = time.perf_counter() - start
+
+    print("{} games, {} plies in {:.1f}s ({:.1f} games/s)".format(
+        args.games, plies, seconds, args.games / seconds if seconds else 0.0))
+    print("white wins: {}, draws: {}, black wins: {}".format(
+        results[WHITE_WINS], results[DRAW], results[BLACK_WINS]))
+    for termination, count in terminations.most_common():
+        print("  {}: {}".format(termination, count))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,274 @@
+"""
+Training data shards: positions encoded once (see tensors.py) into fixed
+size .npy files, for training to read straight from disk
+
+A directory of shards holds, for every shard n:
+
+    shard-0000n.planes.npy: (shard_size, NUM_PLANES, 8, 8) encoded positions
+    shard-0000n.moves.npy:  (shard_size,) move played in each position,
+                            packed as in bitboard.py (uint16)
+    shard-0000n.values.npy: (shard_size,) result of the game for the side to
+                            move in the position: 1, 0 or -1 (int8)
+
+plus a manifest.json listing the shards and how many positions each holds
+(only the last can be partly filled). The arrays are created with
+np.lib.format.open_memmap and filled in place, a batch of positions at a
+time, so a shard never has to fit in memory.
+
+Consecutive positions of a game are much alike, so samples go through a
+shuffle buffer on their way to the shards: once it's full, it's shuffled
+and half of it is written out, so positions are spread over a window of
+the stream about the size of the buffer (which holds Positions, not the
+shards themselves). The loader can then hand out mini-batches as
+contiguous slices of the memory-mapped shards, which are views, not
+copies: the batches are shuffled, by picking the slices in a random
+order, without any data being copied. The slices are fixed when the
+shards are written, though, so every epoch has the same batches, only in
+a different order.
+
+Shards can instead hold positions packed as by tensors.pack_positions(),
+in shard-0000n.packed.npy files ((shard_size, PACKED_SIZE) uint64, 104
+bytes a position against 896 for uint8 planes). The loader then unpacks
+each mini-batch into planes as it hands it out.
+"""
+import json
+import os
+
+import numpy as np
+
+# Custom Modules
+from bitboard import WHITE, starting_position
+from fen import position_from_fen
+from tensors import NUM_PLANES, PACKED_SIZE, encode_positions, pack_positions, unpack_planes
+
+DEFAULT_SHARD_SIZE = 1 << 16
+DEFAULT_SHUFFLE_BUFFER = 1 << 14
+_ENCODE_BATCH = 1024
+_MANIFEST = 'manifest.json'
+
+# Game results, as in PGN tags
+_PGN_RESULTS = {'1-0': 1, '0-1': -1, '1/2-1/2': 0}
+
+
+def record_samples(records):
+    """
+    Replay game records (see selfplay.py and gamefile.py) into training
+    samples
+
+    :return samples: generator of (position, move, result), result being
+                     from white's point of view. The position is updated in
+                     place after the sample is used
+    """
+    for record in records:
+        fen = getattr(record, 'fen', None)
+        position = position_from_fen(fen) if fen else starting_position()
+        for move in record.moves:
+            move = int(move)
+            yield position, move, record.result
+            position.make_move(move)
+
+def pgn_samples(records):
+    """
+    Training samples from the records of a PGN reader (see pgn.py). Games
+    without a decisive or drawn result are skipped
+
+    :return samples: generator of (position, move, result), result being
+                     from white's point of view
+    """
+    for (headers, position, move) in records:
+        result = _PGN_RESULTS.get(headers.get('Result'))
+        if result is not None:
+            yield position, move, result
+
+
+class ShardWriter(object):
+    """
+    Write training samples into shards. Close it (or use it as a context
+    manager) to write the last shard and the manifest
+
+    :param directory:  directory to write the shards to (made if need be)
+    :param shard_size: number of positions in a shard
+    :param dtype:      dtype of the encoded planes. They only hold 0 and 1,
+                       so uint8 keeps them small
+    :param shuffle:    shuffle the samples through a buffer of this many
+                       (0 or None to write them in the order they come)
+    :param seed:       seed of the shuffles
+    :param packed:     store packed positions rather than planes (dtype
+                       is then unused)
+    """
+    def __init__(self, directory, shard_size=DEFAULT_SHARD_SIZE, dtype=np.uint8,
+                 shuffle=DEFAULT_SHUFFLE_BUFFER, seed=None, packed=False):
+        self.directory = directory
+        self.shard_size = shard_size
+        self.dtype = np.dtype(dtype)
+        self.packed = packed
+        self.shuffle = shuffle
+        self.rng = np.random.default_rng(seed)
+        os.makedirs(directory, exist_ok=True)
+
+        self.shards = []
+        self._arrays = None
+        self._count = 0
+        self._pending = []
+
+    def _open_shard(self):
+        prefix = os.path.join(self.directory, 'shard-{0:05d}'.format(len(self.shards)))
+        self._prefix = prefix
+        if self.packed:
+            positions = np.lib.format.open_memmap(prefix + '.packed.npy', mode='w+', dtype='<u8',
+                                                  shape=(self.shard_size, PACKED_SIZE))
+        else:
+            positions = np.lib.format.open_memmap(prefix + '.planes.npy', mode='w+', dtype=self.dtype,
+                                                  shape=(self.shard_size, NUM_PLANES, 8, 8))
+        self._arrays = (
+            positions,
+            np.lib.format.open_memmap(prefix + '.moves.npy', mode='w+', dtype=np.uint16,
+                                      shape=(self.shard_size,)),
+            np.lib.format.open_memmap(prefix + '.values.npy', mode='w+', dtype=np.int8,
+                                      shape=(self.shard_size,)),
+        )
+        self._count = 0
+
+    def add(self, position, move, result):
+        """
+        Add a sample
+
+        :param position: Position (copied), or a Board of the OO engine
+        :param move:     move played in the position
+        :param result:   result of the game from white's point of view
+        """
+        if hasattr(position, 'to_position'):
+            position = position.to_position()
+        else:
+            position = position.copy()
+        value = result if position.side == WHITE else -result
+        self._pending.append((position, move, value))
+        if self.shuffle:
+            if len(self._pending) >= self.shuffle:
+                # Write out a random half of the buffer
+                self._shuffle_pending()
+                half = len(self._pending) // 2
+                self._encode(self._pending[:half])
+                self._pending = self._pending[half:]
+        elif len(self._pending) >= _ENCODE_BATCH:
+            self._encode(self._pending)
+            self._pending = []
+
+    def add_samples(self, samples):
+        """
+        Add every (position, move, result) sample, as from record_samples()
+        or pgn_samples()
+        """
+        for (position, move, result) in samples:
+            self.add(position, move, result)
+
+    def _shuffle_pending(self):
+        pending = self._pending
+        self._pending = [pending[i] for i in self.rng.permutation(len(pending))]
+
+    def _encode(self, pending):
+        start = 0
+        while start < len(pending):
+            if self._arrays is None:
+                self._open_shard()
+            (positions, moves, values) = self._arrays
+            batch = pending[start:start + self.shard_size - self._count]
+            end = self._count + len(batch)
+            if self.packed:
+                positions[self._count:end] = pack_positions([position for (position, _, _) in batch])
+            else:
+                positions[self._count:end] = encode_positions([position for (position, _, _) in batch],
+                                                              dtype=self.dtype)
+            moves[self._count:end] = [move for (_, move, _) in batch]
+            values[self._count:end] = [value for (_, _, value) in batch]
+            self._count = end
+            start += len(batch)
+            if self._count == self.shard_size:
+                self._close_shard()
+
+    def _close_shard(self):
+        for array in self._arrays:
+            array.flush()
+        self.shards.append({'prefix': os.path.basename(self._prefix), 'count': self._count})
+        self._arrays = None
+        self._count = 0
+
+    def close(self):
+        if self._pending:
+            if self.shuffle:
+                self._shuffle_pending()
+            self._encode(self._pending)
+            self._pending = []
+        if self._arrays is not None:
+            self._close_shard()
+        with open(os.path.join(self.directory, _MANIFEST), 'w') as manifest:
+            json.dump({'shard_size': self.shard_size,
+                       'dtype': self.dtype.str,
+                       'packed': self.packed,
+                       'shards': self.shards}, manifest, indent=2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ShardDataset(object):
+    """
+    Read-only, memory-mapped view of a directory of shards
+
+    :param directory: directory the shards were written to
+    """
+    def __init__(self, directory):
+        with open(os.path.join(directory, _MANIFEST)) as manifest:
+            self.manifest = json.load(manifest)
+        self.packed = self.manifest.get('packed', False)
+
+        positions = '.packed.npy' if self.packed else '.planes.npy'
+        self.shards = []
+        for shard in self.manifest['shards']:
+            prefix = os.path.join(directory, shard['prefix'])
+            count = shard['count']
+            self.shards.append(tuple(
+                np.load(prefix + suffix, mmap_mode='r')[:count]
+                for suffix in (positions, '.moves.npy', '.values.npy')))
+
+    def __len__(self):
+        return sum(len(positions) for (positions, _, _) in self.shards)
+
+    def batches(self, batch_size, shuffle=True, rng=None, drop_last=False, dtype=np.float32):
+        """
+        Mini-batches covering every position once. Each batch is a slice
+        of a shard, so the same positions are batched together every time:
+        only the order of the batches is shuffled
+
+        :param batch_size: number of positions in a batch
+        :param shuffle:    hand out the batches in a random order
+        :param rng:        NumPy random Generator for the order
+        :param drop_last:  leave out the smaller batch at the end of each
+                           shard
+        :param dtype:      dtype of the planes unpacked from packed shards
+        :return batches: generator of (planes, moves, values), read-only
+                         views of the shards (but for the planes of packed
+                         shards, unpacked into a new array)
+        """
+        slices = []
+        for (i, (positions, _, _)) in enumerate(self.shards):
+            for start in range(0, len(positions), batch_size):
+                if drop_last and start + batch_size > len(positions):
+                    break
+                slices.append((i, start))
+
+        if shuffle:
+            rng = rng if rng is not None else np.random.default_rng()
+            slices = [slices[i] for i in rng.permutation(len(slices))]
+
+        for (i, start) in slices:
+            (positions, moves, values) = self.shards[i]
+            planes = positions[start:start + batch_size]
+            if self.packed:
+                planes = unpack_planes(planes, dtype=dtype)
+            yield (planes,
+                   moves[start:start + batch_size],
+                   values[start:start + batch_size])
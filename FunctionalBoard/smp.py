@@ -0,0 +1,204 @@
+"""
+Lazy SMP: a parallel search over several processes (threads wouldn't run
+the search in parallel, because of the GIL)
+
+Every process searches the same root position with its own Searcher (see
+search.py), and all of them share one transposition table held in
+multiprocessing shared memory. Nothing else is shared: the searches help
+each other only by what they leave in the table. The helper processes
+skip some depths of their iterative deepening, each a different pattern,
+so they spread out over the tree and fill the table with results the
+main search will soon need.
+
+The main search runs in the calling process within the time and node
+budgets. When it's done it stops the helpers, and the deepest result of
+all of them is played.
+"""
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+
+# Custom Modules
+from bitboard import Position
+from search import DEFAULT_MAX_DEPTH, Searcher
+from transposition import TranspositionTable, table_bytes
+
+# Depths the helpers skip, as (size, phase) for Searcher.search(), taken in
+# turn by helper 1, 2, ... Helpers sharing a pattern search the same depths
+SKIP_PATTERNS = (
+    (1, 0), (1, 1),
+    (2, 0), (2, 1), (2, 2), (2, 3),
+    (3, 0), (3, 1), (3, 2), (3, 3), (3, 4), (3, 5),
+    (4, 0), (4, 1), (4, 2), (4, 3), (4, 4), (4, 5), (4, 6), (4, 7),
+)
+
+
+def _helper(conn, shm_name, tt_size_mb, stop_event, options):
+    """
+    Helper process: search the positions received from the main process
+    until told to stop, and send back the results
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    tt = TranspositionTable(tt_size_mb, buffer=shm.buf)
+    searcher = Searcher(tt=tt, stop_event=stop_event, **options)
+    try:
+        while True:
+            job = conn.recv()
+            if job is None:
+                break
+            (position, max_depth, history, root_moves, skip) = job
+            (best_move, best_score) = searcher.search(position,
+                                                      max_depth=max_depth,
+                                                      history=history,
+                                                      root_moves=root_moves,
+                                                      skip=skip)
+            conn.send((best_move, best_score, searcher.depth, searcher.nodes))
+    finally:
+        tt.release()
+        shm.close()
+
+
+class ParallelSearcher(object):
+    """
+    Searcher running on several processes. Close it (or use it as a context
+    manager) to stop the helpers and free the shared memory
+
+    :param workers:    number of processes searching, the calling one
+                       included (defaults to the number of CPUs)
+    :param tt_size_mb: memory budget of the shared transposition table, in
+                       megabytes
+    :param max_depth:  default depth limit of a search
+    :param max_nodes:  default node budget of the main search (None for no
+                       limit)
+    :param max_time:   default time budget of a search, in seconds (None for
+                       no limit)
+    :param options:    selective search options passed on to every Searcher
+                       (null_move, late_move_reductions, futility, razoring)
+    """
+    def __init__(self,
+                 workers=None,
+                 tt_size_mb=64,
+                 max_depth=DEFAULT_MAX_DEPTH,
+                 max_nodes=None,
+                 max_time=None,
+                 **options):
+        workers = max(1, workers or os.cpu_count() or 1)
+        self.workers = workers
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self.max_time = max_time
+
+        self._shm = shared_memory.SharedMemory(create=True, size=table_bytes(tt_size_mb))
+        self.tt = TranspositionTable(tt_size_mb, buffer=self._shm.buf)
+        self.tt.clear()
+        self._stop_event = multiprocessing.Event()
+        self.searcher = Searcher(tt=self.tt, **options)
+
+        self._helpers = []
+        self._conns = []
+        for _ in range(workers - 1):
+            (conn, helper_conn) = multiprocessing.Pipe()
+            helper = multiprocessing.Process(target=_helper,
+                                             args=(helper_conn,
+                                                   self._shm.name,
+                                                   tt_size_mb,
+                                                   self._stop_event,
+                                                   options),
+                                             daemon=True)
+            helper.start()
+            helper_conn.close()
+            self._helpers.append(helper)
+            self._conns.append(conn)
+
+        # Results of the last search
+        self.best_move = 0
+        self.best_score = 0
+        self.depth = 0
+        self.nodes = 0
+        self.pv = []
+
+    def search(self,
+               root,
+               max_depth=None,
+               max_nodes=None,
+               max_time=None,
+               history=None,
+               root_moves=None):
+        """
+        Search the position on every process
+
+        :param root: Position of the FunctionalBoard engine, or anything
+                     with a to_position() method converting to one (such as
+                     the Board engine's Board)
+
+        The other parameters are as for Searcher.search()
+
+        :return (best move, score): of the deepest search that finished
+        """
+        position = root if isinstance(root, Position) else root.to_position()
+        max_depth = max_depth or self.max_depth
+        max_nodes = max_nodes if max_nodes is not None else self.max_nodes
+        max_time = max_time if max_time is not None else self.max_time
+
+        # Every process starts a search at the same time, so the table's
+        # age moves on in step in all of them
+        self._stop_event.clear()
+        for (i, conn) in enumerate(self._conns):
+            skip = SKIP_PATTERNS[i % len(SKIP_PATTERNS)]
+            conn.send((position, max_depth, history, root_moves, skip))
+
+        searcher = self.searcher
+        try:
+            searcher.search(position,
+                            max_depth=max_depth,
+                            max_nodes=max_nodes,
+                            max_time=max_time,
+                            history=history,
+                            root_moves=root_moves)
+        finally:
+            self._stop_event.set()
+            results = [conn.recv() for conn in self._conns]
+
+        # The main search wins ties, as it searched every depth in turn
+        best = (searcher.best_move, searcher.best_score, searcher.depth)
+        self.nodes = searcher.nodes
+        for (best_move, best_score, depth, nodes) in results:
+            self.nodes += nodes
+            if best_move and depth > best[2]:
+                best = (best_move, best_score, depth)
+
+        (self.best_move, self.best_score, self.depth) = best
+        self.pv = searcher.principal_variation(position, self.best_move, self.depth)
+        return self.best_move, self.best_score
+
+    def choose_move(self, root, history=None, root_moves=None):
+        """
+        Move to play in the position, searched within the default budgets
+        """
+        return self.search(root, history=history, root_moves=root_moves)[0]
+
+    def close(self):
+        """
+        Stop the helper processes and free the shared transposition table
+        """
+        if self._shm is None:
+            return
+        for conn in self._conns:
+            conn.send(None)
+        for helper in self._helpers:
+            helper.join()
+        for conn in self._conns:
+            conn.close()
+        self._helpers = []
+        self._conns = []
+
+        self.tt.release()
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,145 @@
+"""
+Batched encoding of positions into NumPy tensors, to feed a neural network
+
+A batch of N positions is encoded as an (N, NUM_PLANES, 8, 8) array, each
+plane indexed [row][col] like the squares of the board:
+
+    planes 0-11: occupancy of each set of pieces, in the order of
+                 Position.pieces (color * NUM_PIECE_TYPES + piece type)
+    plane 12:    side to move (all ones if white is to move)
+    plane 13:    en-passant square (a single one, if there is one)
+
+The whole batch is filled at once: the piece bitboards are unpacked into
+planes with np.unpackbits rather than walked square by square.
+
+For storing datasets, positions can also be packed into PACKED_SIZE uint64
+words (104 bytes, against 896 for the planes as uint8), and unpacked into
+planes a batch at a time when they're needed:
+
+    words 0-11: the piece bitboards, in the order of Position.pieces
+    word 12:    flags: side to move (bit 0), castling rights (bits 1-4),
+                en-passant square + 1, or 0 if there's none (bits 8-14),
+                halfmove clock (bits 16-31), fullmove number (bits 32-47)
+"""
+import numpy as np
+
+# Custom Modules
+from bitboard import NUM_PIECE_SETS, WHITE, Position
+
+SIDE_TO_MOVE_PLANE = NUM_PIECE_SETS
+EN_PASSANT_PLANE = NUM_PIECE_SETS + 1
+NUM_PLANES = NUM_PIECE_SETS + 2
+
+FLAGS_WORD = NUM_PIECE_SETS
+PACKED_SIZE = NUM_PIECE_SETS + 1
+
+_CASTLING_SHIFT = 1
+_EN_PASSANT_SHIFT = 8
+_HALFMOVE_SHIFT = 16
+_FULLMOVE_SHIFT = 32
+
+
+def encode_positions(positions, dtype=np.float32):
+    """
+    Encode a batch of positions
+
+    :param positions: sequence of bitboard Positions
+    :param dtype:     dtype of the tensor
+    :return tensor: (len(positions), NUM_PLANES, 8, 8) array
+    """
+    num_positions = len(positions)
+    tensor = np.zeros((num_positions, NUM_PLANES, 8, 8), dtype=dtype)
+    if not num_positions:
+        return tensor
+
+    # Unpacking the bytes of each (little-endian) bitboard least significant
+    # bit first gives the squares in index order, a1 = 0 to h8 = 63
+    pieces = np.array([position.pieces for position in positions], dtype='<u8')
+    bits = np.unpackbits(pieces.view(np.uint8), bitorder='little')
+    tensor[:, :NUM_PIECE_SETS] = bits.reshape(num_positions, NUM_PIECE_SETS, 8, 8)
+
+    white_to_move = np.array([position.side == WHITE for position in positions])
+    tensor[white_to_move, SIDE_TO_MOVE_PLANE] = 1
+
+    en_passant = [(i, position.en_passant) for i, position in enumerate(positions)
+                  if position.en_passant is not None]
+    if en_passant:
+        (batch, squares) = np.array(en_passant).T
+        tensor[batch, EN_PASSANT_PLANE, squares >> 3, squares & 7] = 1
+
+    return tensor
+
+def encode_position(position, dtype=np.float32):
+    """
+    Encode a single position as a (NUM_PLANES, 8, 8) array
+    """
+    return encode_positions([position], dtype=dtype)[0]
+
+def pack_positions(positions):
+    """
+    Pack a batch of positions
+
+    :param positions: sequence of bitboard Positions
+    :return packed: (len(positions), PACKED_SIZE) uint64 array
+    """
+    packed = np.zeros((len(positions), PACKED_SIZE), dtype='<u8')
+    for (i, position) in enumerate(positions):
+        row = packed[i]
+        row[:NUM_PIECE_SETS] = position.pieces
+        en_passant = 0 if position.en_passant is None else position.en_passant + 1
+        row[FLAGS_WORD] = ((position.side == WHITE)
+                           | position.castling << _CASTLING_SHIFT
+                           | en_passant << _EN_PASSANT_SHIFT
+                           | min(position.halfmove_clock, 0xFFFF) << _HALFMOVE_SHIFT
+                           | min(position.fullmove_number, 0xFFFF) << _FULLMOVE_SHIFT)
+    return packed
+
+def unpack_planes(packed, dtype=np.float32):
+    """
+    Expand a batch of packed positions into planes, as encode_positions()
+    would have encoded them
+
+    :param packed: (N, PACKED_SIZE) uint64 array, as from pack_positions()
+    :param dtype:  dtype of the tensor
+    :return tensor: (N, NUM_PLANES, 8, 8) array
+    """
+    packed = np.ascontiguousarray(packed, dtype='<u8')
+    num_positions = len(packed)
+    tensor = np.zeros((num_positions, NUM_PLANES, 8, 8), dtype=dtype)
+    if not num_positions:
+        return tensor
+
+    # As in encode_positions(), least significant bit first
+    pieces = np.ascontiguousarray(packed[:, :NUM_PIECE_SETS])
+    bits = np.unpackbits(pieces.view(np.uint8), bitorder='little')
+    tensor[:, :NUM_PIECE_SETS] = bits.reshape(num_positions, NUM_PIECE_SETS, 8, 8)
+
+    flags = packed[:, FLAGS_WORD]
+    tensor[(flags & 1).astype(bool), SIDE_TO_MOVE_PLANE] = 1
+
+    en_passant = (flags >> _EN_PASSANT_SHIFT & 0x7F).astype(np.intp)
+    batch = np.flatnonzero(en_passant)
+    if len(batch):
+        squares = en_passant[batch] - 1
+        tensor[batch, EN_PASSANT_PLANE, squares >> 3, squares & 7] = 1
+
+    return tensor
+
+def unpack_positions(packed):
+    """
+    Positions of a batch of packed positions
+
+    :param packed: (N, PACKED_SIZE) uint64 array, as from pack_positions()
+    :return positions: list of Positions
+    """
+    positions = []
+    for row in np.asarray(packed, dtype='<u8').tolist():
+        flags = row[FLAGS_WORD]
+        en_passant = flags >> _EN_PASSANT_SHIFT & 0x7F
+        positions.append(Position(row[:NUM_PIECE_SETS],
+                                  side=flags & 1,
+                                  en_passant=en_passant - 1 if en_passant else None,
+                                  castling=flags >> _CASTLING_SHIFT & 0xF,
+                                  halfmove_clock=flags >> _HALFMOVE_SHIFT & 0xFFFF,
+                                  fullmove_number=flags >> _FULLMOVE_SHIFT & 0xFFFF))
+    return positions
@@ -0,0 +1,231 @@
+"""
+Transposition table: a fixed-size cache of search results, keyed by the
+Zobrist key of the position (see bitboard.py)
+
+The table is preallocated from a memory budget given in megabytes and
+never grows. Each entry is two unsigned 64-bit words held in an array
+buffer: the position's key, and the packed search result (best move,
+score, depth, bound type and search age). Entries are grouped in buckets
+of two slots:
+
+    slot 0: depth-preferred. Only replaced by a search at least as deep,
+            or by any search once the entry is left over from an older one
+    slot 1: always-replace. Takes every result slot 0 turns down
+
+The table can live in a buffer shared between processes (see smp.py), which
+read and write it without locks. The two words of an entry are written one
+after the other, so a process can read an entry another is halfway through
+writing. To catch this, the key word holds the position's key XORed with
+the data word: an entry only matches a key when both words come from the
+same write.
+"""
+from array import array
+
+# Bound types, saying how the stored score relates to the true score
+# of the position
+BOUND_EXACT = 0
+BOUND_LOWER = 1     # search failed high: true score >= stored score
+BOUND_UPPER = 2     # search failed low: true score <= stored score
+
+_ENTRY_BYTES = 16
+_SLOTS_PER_BUCKET = 2
+
+# Layout of the packed data word
+_MOVE_BITS = 16
+_SCORE_SHIFT = 16
+_SCORE_BITS = 18
+_SCORE_OFFSET = 1 << (_SCORE_BITS - 1)
+_DEPTH_SHIFT = _SCORE_SHIFT + _SCORE_BITS
+_BOUND_SHIFT = _DEPTH_SHIFT + 8
+_AGE_SHIFT = _BOUND_SHIFT + 2
+
+_MOVE_MASK = (1 << _MOVE_BITS) - 1
+_SCORE_MASK = (1 << _SCORE_BITS) - 1
+
+
+def _num_buckets(size_mb):
+    num_buckets = max(1, (size_mb * 1024 * 1024) // (_ENTRY_BYTES * _SLOTS_PER_BUCKET))
+    return 1 << (num_buckets.bit_length() - 1)
+
+def table_bytes(size_mb):
+    """
+    Size in bytes of the buffer holding a table of the given budget
+    """
+    return _num_buckets(size_mb) * _SLOTS_PER_BUCKET * _ENTRY_BYTES
+
+def _pack(move, score, depth, bound, age):
+    # The score is stored with an offset, so a valid entry never packs to 0
+    # (an empty slot)
+    return (move |
+            ((score + _SCORE_OFFSET) << _SCORE_SHIFT) |
+            (depth << _DEPTH_SHIFT) |
+            (bound << _BOUND_SHIFT) |
+            (age << _AGE_SHIFT))
+
+
+class TranspositionTable(object):
+    """
+    :param size_mb: memory budget of the table, in megabytes. The number of
+                    buckets is rounded down to a power of two
+    :param buffer:  writable buffer of table_bytes(size_mb) bytes to hold the
+                    table, such as a multiprocessing shared memory block, or
+                    None to allocate one. A shared buffer isn't cleared
+    """
+    def __init__(self, size_mb=16, buffer=None):
+        num_buckets = _num_buckets(size_mb)
+
+        self.num_buckets = num_buckets
+        self.size_mb = size_mb
+        self._bucket_mask = num_buckets - 1
+        num_slots = num_buckets * _SLOTS_PER_BUCKET
+        if buffer is None:
+            self._buffer = None
+            self.keys = array('Q', bytes(8 * num_slots))
+            self.data = array('Q', bytes(8 * num_slots))
+        else:
+            self._buffer = memoryview(buffer)[:16 * num_slots]
+            self.keys = self._buffer[:8 * num_slots].cast('Q')
+            self.data = self._buffer[8 * num_slots:].cast('Q')
+
+        # Age of the current search. Entries from older searches can be
+        # replaced regardless of their depth
+        self.age = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def __len__(self):
+        return len(self.keys)
+
+    def new_search(self):
+        """
+        Call at the start of every search, so entries left over from
+        previous searches lose their claim on the depth-preferred slots
+        """
+        self.age = (self.age + 1) & 0xFF
+
+    def clear(self):
+        num_slots = len(self.keys)
+        if self._buffer is None:
+            self.keys = array('Q', bytes(8 * num_slots))
+            self.data = array('Q', bytes(8 * num_slots))
+        else:
+            self._buffer[:] = bytes(16 * num_slots)
+        self.age = 0
+        self.reset_stats()
+
+    def release(self):
+        """
+        Let go of a shared buffer, which can't be closed while the table
+        still holds views of it
+        """
+        if self._buffer is not None:
+            self.keys.release()
+            self.data.release()
+            self._buffer.release()
+            self._buffer = None
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def probe(self, key):
+        """
+        Look up a position
+
+        :return entry: (move, score, depth, bound) stored for the position,
+                       or None if it isn't in the table
+        """
+        slot = (key & self._bucket_mask) << 1
+        keys = self.keys
+        data = self.data[slot]
+        if keys[slot] ^ data != key:
+            data = self.data[slot + 1]
+            if keys[slot + 1] ^ data != key:
+                data = 0
+
+        if not data:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return (data & _MOVE_MASK,
+                ((data >> _SCORE_SHIFT) & _SCORE_MASK) - _SCORE_OFFSET,
+                (data >> _DEPTH_SHIFT) & 0xFF,
+                (data >> _BOUND_SHIFT) & 3)
+
+    def store(self, key, depth, score, bound, move=0):
+        """
+        Store the result of searching a position
+
+        :param key:   Zobrist key of the position
+        :param depth: depth the position was searched to (0-255)
+        :param score: score found by the search
+        :param bound: BOUND_EXACT, BOUND_LOWER or BOUND_UPPER
+        :param move:  best move found (0 if there isn't one)
+        """
+        keys = self.keys
+        data = self.data
+        slot = (key & self._bucket_mask) << 1
+        depth = min(max(depth, 0), 0xFF)
+
+        # Keep the best move of a previous search of the same position if
+        # this one didn't find any
+        if not move:
+            for same in (slot, slot + 1):
+                same_data = data[same]
+                if same_data and keys[same] ^ same_data == key:
+                    move = same_data & _MOVE_MASK
+                    break
+
+        # Depth-preferred slot: take it if it's empty, holds the same
+        # position, is from an older search, or was searched less deeply
+        preferred = data[slot]
+        if (not preferred or
+                keys[slot] ^ preferred == key or
+                ((preferred >> _AGE_SHIFT) & 0xFF) != self.age or
+                depth >= (preferred >> _DEPTH_SHIFT) & 0xFF):
+            if preferred and keys[slot] ^ preferred != key:
+                self.overwrites += 1
+            # Don't leave a stale copy of the position in the other slot
+            if keys[slot + 1] ^ data[slot + 1] == key:
+                keys[slot + 1] = 0
+                data[slot + 1] = 0
+        else:
+            # Otherwise, the always-replace slot
+            slot += 1
+            if data[slot] and keys[slot] ^ data[slot] != key:
+                self.overwrites += 1
+
+        packed = _pack(move, score, depth, bound, self.age)
+        keys[slot] = key ^ packed
+        data[slot] = packed
+        self.stores += 1
+
+    def hashfull(self):
+        """
+        Fraction (per mille) of the slots holding an entry from the current
+        search, estimated from the first thousand slots
+        """
+        sample = min(1000, len(self.data))
+        used = sum(1 for data in self.data[:sample]
+                   if data and ((data >> _AGE_SHIFT) & 0xFF) == self.age)
+        return used * 1000 // sample
+
+    def stats(self):
+        """
+        Counters of how the table has been used since the last reset
+        """
+        probes = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / probes if probes else 0.0,
+            'stores': self.stores,
+            'overwrites': self.overwrites,
+            'hashfull': self.hashfull(),
+        }
@@ -0,0 +1,173 @@
+"""
+Perft benchmark for both board engines
+
+Perft counts the leaf nodes of the full move tree of a position down to a
+given depth. Comparing the count against known reference values checks
+the move generator is correct, and timing it gives a repeatable measure
+of how fast move generation (and make/unmake) is.
+
+    python benchmarks/perft.py --depth 3
+    python benchmarks/perft.py --engine functional --depth 4 --position kiwipete
+
+For every engine and position this prints the node count against the
+reference value, the nodes searched per second and the peak memory
+allocated while searching. Exits with status 1 if any count is wrong.
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(_ROOT, 'FunctionalBoard'))
+sys.path.insert(0, os.path.join(_ROOT, 'Board'))
+
+# Custom Modules
+from board import generate_movesets
+from chess_board import Board
+from fen import position_from_fen
+
+# Standard perft positions, with reference node counts for depths 1, 2, ...
+PERFT_POSITIONS = [
+    ('startpos',
+     "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+     [20, 400, 8902, 197281, 4865609, 119060324]),
+    ('kiwipete',
+     "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     [48, 2039, 97862, 4085603, 193690690]),
+    ('endgame',
+     "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     [14, 191, 2812, 43238, 674624, 11030083]),
+    ('promotions',
+     "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     [6, 264, 9467, 422333, 15833292]),
+    ('talkchess',
+     "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     [44, 1486, 62379, 2103487, 89941194]),
+    ('middlegame',
+     "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     [46, 2079, 89890, 3894594, 164075551]),
+    # Pieces pinned on a diagonal, which may only move along the pin
+    ('bishop-pin',
+     "4k3/8/8/8/b7/8/2Q5/3K4 w - - 0 1",
+     [6, 52, 1146, 11126]),
+    ('pinned-rook',
+     "1nk4r/7p/4rbpR/1qP1p3/p1R1PP2/P1P1B2B/2P1K2P/8 b - - 0 44",
+     [31, 752, 23493, 585187]),
+]
+
+##########################
+# FunctionalBoard engine #
+##########################
+
+def perft_functional(position, depth):
+    moves = generate_movesets(position)
+    if depth == 1:
+        return len(moves)
+
+    nodes = 0
+    for move in moves:
+        undo = position.make_move(move)
+        nodes += perft_functional(position, depth - 1)
+        position.unmake_move(undo)
+
+    return nodes
+
+
+#############
+# OO engine #
+#############
+
+def perft_board(board, depth):
+    turn = 'white' if board.player_flag == 0 else 'black'
+
+    # The board only presents legal moves, promotions and castling
+    # included
+    moves = board.present_movesets(turn)
+    if depth == 1:
+        return len(moves)
+
+    nodes = 0
+    for move in moves:
+        undo = board.make_move(move)
+        nodes += perft_board(board, depth - 1)
+        board.unmake_move(undo)
+
+    return nodes
+
+
+ENGINES = {
+    'functional': (position_from_fen, perft_functional),
+    'oo': (Board.from_fen, perft_board),
+}
+
+
+def run_perft(engine, fen, depth, measure_memory=True):
+    """
+    Run perft on a position with one of the engines
+
+    :return (nodes, seconds, peak memory in bytes or None)
+    """
+    (load, perft) = ENGINES[engine]
+
+    start = time.perf_counter()
+    nodes = perft(load(fen), depth)
+    seconds = time.perf_counter() - start
+
+    # Tracing allocations slows the search down, so memory is measured on
+    # a separate run
+    peak = None
+    if measure_memory:
+        tracemalloc.start()
+        perft(load(fen), depth)
+        (_, peak) = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return nodes, seconds, peak
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--engine', choices=sorted(ENGINES) + ['both'], default='both')
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--position', action='append',
+                        choices=[name for (name, _, _) in PERFT_POSITIONS],
+                        help="position to run (can be repeated). Defaults to all")
+    parser.add_argument('--no-memory', action='store_true',
+                        help="skip the (slower) peak memory measurement")
+    args = parser.parse_args(argv)
+
+    engines = sorted(ENGINES) if args.engine == 'both' else [args.engine]
+
+    print("{:<11} {:<11} {:>5} {:>12} {:>12} {:>4} {:>9} {:>10} {:>10}".format(
+        'engine', 'position', 'depth', 'nodes', 'expected', 'ok', 'seconds', 'nodes/s', 'peak KiB'))
+
+    all_ok = True
+    for engine in engines:
+        for (name, fen, expected) in PERFT_POSITIONS:
+            if args.position and name not in args.position:
+                continue
+            depth = min(args.depth, len(expected))
+
+            try:
+                nodes, seconds, peak = run_perft(engine, fen, depth,
+                                                 measure_memory=not args.no_memory)
+            except Exception as error:
+                # The OO engine's generators can crash on positions they
+                # don't handle. Report it as a failure and move on
+                print("{:<11} {:<11} {:>5} failed: {!r}".format(engine, name, depth, error))
+                all_ok = False
+                continue
+
+            ok = nodes == expected[depth - 1]
+            all_ok = all_ok and ok
+            print("{:<11} {:<11} {:>5} {:>12} {:>12} {:>4} {:>9.3f} {:>10.0f} {:>10}".format(
+                engine, name, depth, nodes, expected[depth - 1],
+                'yes' if ok else 'NO', seconds,
+                nodes / seconds if seconds else 0.0,
+                '-' if peak is None else peak // 1024))
+
+    return 0 if all_ok else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,10 @@
+"""
+The engines are written as flat modules importing each other by name, so
+their directories are put on the path, as the scripts in them expect
+"""
+import os
+import sys
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(_ROOT, 'FunctionalBoard'))
+sys.path.insert(0, os.path.join(_ROOT, 'Board'))
@@ -0,0 +1,43 @@
+import pytest
+
+from attacks import BETWEEN, LINE
+
+
+def _geometric_tables():
+    """
+    BETWEEN and LINE built square by square from (row, col) coordinates,
+    independently of the shifts and masks of the attack tables
+    """
+    between = [[0] * 64 for _ in range(64)]
+    line = [[0] * 64 for _ in range(64)]
+    steps = [(1, 0), (0, 1), (1, 1), (1, -1)]
+    for a in range(64):
+        (row, col) = divmod(a, 8)
+        for (d_row, d_col) in steps:
+            # Every square of the line through a in this direction
+            squares = []
+            for k in range(-7, 8):
+                (r, c) = (row + k * d_row, col + k * d_col)
+                if 0 <= r < 8 and 0 <= c < 8:
+                    squares.append((k, r * 8 + c))
+            full_line = 0
+            for (_, square) in squares:
+                full_line |= 1 << square
+            for (k, b) in squares:
+                if b == a:
+                    continue
+                line[a][b] = full_line
+                for (j, square) in squares:
+                    if min(0, k) < j < max(0, k):
+                        between[a][b] |= 1 << square
+    return between, line
+
+_BETWEEN, _LINE = _geometric_tables()
+
+@pytest.mark.parametrize('a', range(64))
+def test_line(a):
+    assert LINE[a] == _LINE[a]
+
+@pytest.mark.parametrize('a', range(64))
+def test_between(a):
+    assert BETWEEN[a] == _BETWEEN[a]
@@ -0,0 +1,34 @@
+import pytest
+
+from bitboard import QUEEN, encode_move
+from exchange import see
+from fen import parse_square, position_from_fen
+
+
+def _move(from_name, to_name, promotion=0):
+    return encode_move(parse_square(from_name), parse_square(to_name), promotion)
+
+@pytest.mark.parametrize('fen, move, gain', [
+    # Undefended pawn
+    ("1k1r4/1pp4p/p7/4p3/8/P5P1/1PP4P/2K1R3 w - - 0 1", _move('e1', 'e5'), 100),
+    # Knight for a pawn: the exchange goes on with x-rays behind both the
+    # rook and the bishop, but white does best to stop after Nxe5 Nxe5
+    ("1k1r3q/1ppn3p/p4b2/4p3/8/P2N2P1/1PP1R1BP/2K1Q3 w - - 0 1", _move('d3', 'e5'), -220),
+    # Queen takes a pawn defended by a pawn
+    ("4k3/8/3p4/4p3/8/8/8/4Q1K1 w - - 0 1", _move('e1', 'e5'), -800),
+    # Doubled rooks: the second recaptures through the first (x-ray)
+    ("4k3/8/3p4/4p3/8/8/4R3/4R1K1 w - - 0 1", _move('e2', 'e5'), -300),
+    # En-passant capture
+    ("4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1", _move('e5', 'd6'), 100),
+    # Promotion, undefended and defended
+    ("4k3/P7/8/8/8/8/8/4K3 w - - 0 1", _move('a7', 'a8', QUEEN), 800),
+    ("1r2k3/P7/8/8/8/8/8/4K3 w - - 0 1", _move('a7', 'a8', QUEEN), -100),
+    # The king recaptures only if the square isn't defended
+    ("8/8/8/3k4/4p3/8/8/4R1K1 w - - 0 1", _move('e1', 'e4'), -400),
+    ("8/8/8/3k4/R3p3/8/8/4R1K1 w - - 0 1", _move('e1', 'e4'), 100),
+    # Quiet move onto an attacked square
+    ("4k3/8/8/3p4/8/8/8/4KN2 w - - 0 1", _move('f1', 'e3'), 0),
+    ("4k3/8/8/8/3p4/8/8/4KN2 w - - 0 1", _move('f1', 'e3'), -320),
+])
+def test_see(fen, move, gain):
+    assert see(position_from_fen(fen), move) == gain
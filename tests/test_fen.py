@@ -0,0 +1,50 @@
+import pytest
+
+from chess_board import Board
+from fen import STARTING_FEN, parse_fen, position_from_fen, position_to_fen, positions_from_fens
+
+
+@pytest.mark.parametrize('fen', [
+    STARTING_FEN,
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "rnbqkbnr/pppp1ppp/8/8/3Pp3/8/PPP1PPPP/RNBQKBNR b Kq d3 0 3",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 37 60",
+])
+def test_round_trip(fen):
+    assert position_to_fen(position_from_fen(fen)) == fen
+    # The OO board doesn't keep the move counters
+    assert Board.from_fen(fen).to_fen().split()[:4] == fen.split()[:4]
+
+def test_missing_counters():
+    assert position_to_fen(position_from_fen("4k3/8/8/8/8/8/8/4K3 w - -")) == \
+        "4k3/8/8/8/8/8/8/4K3 w - - 0 1"
+
+@pytest.mark.parametrize('fen', [
+    # Missing kings
+    "8/8/8/8/8/8/8/4K3 w - - 0 1",
+    "4k3/8/8/8/8/8/8/8 b - - 0 1",
+    "8/8/8/8/8/8/8/8 w - - 0 1",
+    # Extra kings
+    "4k3/8/8/8/8/8/8/2K1K3 w - - 0 1",
+    "k3k3/8/8/8/8/8/8/4K3 w - - 0 1",
+])
+def test_one_king_each(fen):
+    with pytest.raises(ValueError, match='one king'):
+        parse_fen(fen)
+    with pytest.raises(ValueError):
+        position_from_fen(fen)
+    with pytest.raises(ValueError):
+        positions_from_fens([STARTING_FEN, fen])
+    with pytest.raises(ValueError):
+        Board.from_fen(fen)
+
+@pytest.mark.parametrize('fen', [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP w KQkq - 0 1",
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNX w KQkq - 0 1",
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR x KQkq - 0 1",
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkx - 0 1",
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq",
+])
+def test_invalid(fen):
+    with pytest.raises(ValueError):
+        position_from_fen(fen)
@@ -0,0 +1,93 @@
+import mmap
+
+import numpy as np
+import pytest
+
+import gamefile
+from gamefile import GameReader, GameWriter, StartedGameRecord
+from selfplay import CHECKMATE, GameRecord, play_games
+
+
+def _records():
+    records = play_games(range(12))
+    records.append(StartedGameRecord(12, 0, 1, None, [0x0E30, 0x0C79], fen="4k3/P7/8/8/8/8/8/4K3 w - - 0 1"))
+    records.append(GameRecord(13, 5, -1, CHECKMATE, []))
+    return records
+
+def _assert_same(read, record):
+    assert type(read) is type(record)
+    assert (read.index, read.seed, read.result, read.termination) == (
+        record.index, record.seed, record.result, record.termination)
+    assert read.moves.dtype == np.dtype('<u2')
+    assert list(read.moves) == list(record.moves)
+    if isinstance(record, StartedGameRecord):
+        assert read.fen == record.fen
+
+@pytest.mark.parametrize('codec', ['none', 'zlib', 'lzma'])
+def test_round_trip(tmp_path, codec):
+    records = _records()
+    path = str(tmp_path / 'games.bin')
+    # Small blocks, so the games span several of them
+    with GameWriter(path, codec=codec, block_size=512) as writer:
+        writer.write_all(records)
+
+    with GameReader(path, cached_blocks=2) as reader:
+        assert len(reader) == len(records)
+        assert len(reader.blocks) > 1
+        for (read, record) in zip(reader, records):
+            _assert_same(read, record)
+        for i in (7, 0, len(records) - 1, -2, 3):
+            _assert_same(reader[i], records[i])
+        with pytest.raises(IndexError):
+            reader[len(records)]
+
+        sample = reader.sample(6, rng=np.random.default_rng(1))
+        assert len({game.index for game in sample}) == 6
+        for game in sample:
+            _assert_same(game, records[game.index])
+
+def test_moves_are_read_only(tmp_path):
+    path = str(tmp_path / 'games.bin')
+    with GameWriter(path) as writer:
+        writer.write_all(_records())
+    with GameReader(path) as reader:
+        with pytest.raises(ValueError):
+            reader[0].moves[0] = 0
+
+@pytest.mark.parametrize('data', [b'', b'CHGR', b'PK\x03\x04' + bytes(40)])
+def test_not_a_game_file(tmp_path, data):
+    path = tmp_path / 'games.bin'
+    path.write_bytes(data)
+    with pytest.raises(ValueError):
+        GameReader(str(path))
+
+@pytest.mark.parametrize('data', [b'', b'PK\x03\x04' + bytes(40)])
+def test_rejected_file_is_closed(tmp_path, monkeypatch, data):
+    # Keep hold of the file and map the reader opens
+    opened = []
+    real_open = open
+    real_mmap = mmap.mmap
+    def recording_open(*args, **kwargs):
+        opened.append(real_open(*args, **kwargs))
+        return opened[-1]
+    def recording_mmap(*args, **kwargs):
+        opened.append(real_mmap(*args, **kwargs))
+        return opened[-1]
+    monkeypatch.setattr(gamefile, 'open', recording_open, raising=False)
+    monkeypatch.setattr(mmap, 'mmap', recording_mmap)
+
+    path = tmp_path / 'games.bin'
+    path.write_bytes(data)
+    with pytest.raises(ValueError):
+        GameReader(str(path))
+    assert opened
+    assert all(handle.closed for handle in opened)
+
+def test_unclosed_file(tmp_path):
+    path = str(tmp_path / 'games.bin')
+    writer = GameWriter(path, block_size=64)
+    writer.write_all(_records())
+    writer._file.flush()
+    with pytest.raises(ValueError):
+        GameReader(path)
+    writer.close()
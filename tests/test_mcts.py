@@ -0,0 +1,50 @@
+from bitboard import encode_move, starting_position
+from board import generate_movesets
+from fen import parse_square, position_from_fen
+from mcts import MCTS
+
+
+def _move(from_name, to_name):
+    return encode_move(parse_square(from_name), parse_square(to_name))
+
+def _play(position, moves):
+    """
+    Play the moves, returning the keys of the positions before each
+    """
+    history = []
+    for move in moves:
+        history.append(position.key)
+        position.make_move(move)
+    return history
+
+def test_visits_add_up():
+    mcts = MCTS(capacity=1 << 14)
+    mcts.search(starting_position(), num_simulations=200)
+    statistics = mcts.root_statistics()
+    assert int(mcts.visits[0]) == sum(visits for (_, visits, _, _) in statistics) + 1
+
+def test_finds_mate_in_one():
+    position = position_from_fen("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+    assert MCTS(capacity=1 << 14).search(position, num_simulations=400) == _move('a1', 'a8')
+
+def test_root_that_repeats_an_earlier_position_is_searched():
+    position = starting_position()
+    history = _play(position, [_move('g1', 'f3'), _move('g8', 'f6'),
+                               _move('f3', 'g1'), _move('f6', 'g8')])
+    move = MCTS(capacity=1 << 14).search(position, num_simulations=50, history=history)
+    assert move in generate_movesets(position)
+
+def test_repetition_draws_are_not_stored_on_nodes():
+    position = starting_position()
+    history = _play(position, [_move('g1', 'f3'), _move('g8', 'f6'), _move('f3', 'g1')])
+    mcts = MCTS(capacity=1 << 14)
+    mcts.search(position, num_simulations=300, history=history)
+
+    # Ng8 repeats the starting position, a draw given this history
+    child = mcts._find_child(0, _move('f6', 'g8'))
+    assert mcts.visits[child] > 0
+    assert mcts.first_child[child] == -1
+
+    # Without the history it's an ordinary move, and gets expanded
+    mcts.search(position, num_simulations=300)
+    assert mcts.num_children[child] > 0
@@ -0,0 +1,30 @@
+import pytest
+
+from board import generate_movesets
+from fen import position_from_fen
+
+
+def _perft(position, depth):
+    moves = generate_movesets(position)
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        undo = position.make_move(move)
+        nodes += _perft(position, depth - 1)
+        position.unmake_move(undo)
+    return nodes
+
+@pytest.mark.parametrize('fen, counts', [
+    ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", [20, 400, 8902]),
+    ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", [48, 2039]),
+    ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812]),
+    # The queen is pinned on the a4-e8 diagonal: it can only move along it
+    ("4k3/8/8/8/b7/8/2Q5/3K4 w - - 0 1", [6, 52, 1146, 11126]),
+    # The rook on e6 is pinned by the bishop on h3
+    ("1nk4r/7p/4rbpR/1qP1p3/p1R1PP2/P1P1B2B/2P1K2P/8 b - - 0 44", [31, 752, 23493]),
+])
+def test_perft(fen, counts):
+    position = position_from_fen(fen)
+    for (depth, count) in enumerate(counts, 1):
+        assert _perft(position, depth) == count
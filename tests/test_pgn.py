@@ -0,0 +1,101 @@
+import io
+
+import pytest
+
+from board import generate_movesets
+from fen import position_from_fen, position_to_fen
+from pgn import PGNError, PGNReader, move_to_san, parse_san, split_archive
+
+ARCHIVE = b'''[Event "Opera game"]
+[Site "Paris"]
+[White "Morphy, \\"Paul\\""]
+[Result "1-0"]
+
+1. e4 e5 2. Nf3 d6 3. d4 Bg4 {This is a weak move} 4. dxe5 Bxf3 5. Qxf3 dxe5
+6. Bc4 Nf6 7. Qb3 Qe7 8. Nc3 c6 9. Bg5 $2 b5 (9... Qb4+ 10. Qxb4) 10. Nxb5 cxb5
+11. Bxb5+ Nbd7 12. O-O-O Rd8 13. Rxd7 Rxd7 14. Rd1 Qe6 15. Bxd7+ Nxd7
+16. Qb8+ Nxb8 17. Rd8# 1-0
+
+[Event "From a position"]
+[SetUp "1"]
+[FEN "4k3/P7/8/8/8/8/8/4K3 w - - 0 1"]
+[Result "1/2-1/2"]
+
+1. a8=Q+ Ke7 ; a line comment
+2. Qb7+ Kf6 1/2-1/2
+
+[Event "Bad move"]
+[Result "0-1"]
+
+1. e4 e5 2. Ke3 Nc6 0-1
+
+[Event "Castling and en passant"]
+[Result "*"]
+
+1. e4 Nf6 2. e5 d5 3. exd6 e6 4. Nf3 Be7 5. Bc4 O-O 6. O-O *
+'''
+
+EXPECTED = [
+    ("Opera game",
+     "e4 e5 Nf3 d6 d4 Bg4 dxe5 Bxf3 Qxf3 dxe5 Bc4 Nf6 Qb3 Qe7 Nc3 c6 Bg5 b5 Nxb5 "
+     "cxb5 Bxb5+ Nbd7 O-O-O Rd8 Rxd7 Rxd7 Rd1 Qe6 Bxd7+ Nxd7 Qb8+ Nxb8 Rd8#"),
+    ("From a position", "a8=Q+ Ke7 Qb7+ Kf6"),
+    ("Bad move", "e4 e5"),
+    ("Castling and en passant", "e4 Nf6 e5 d5 exd6 e6 Nf3 Be7 Bc4 O-O O-O"),
+]
+
+
+def _read(reader):
+    games = []
+    for (headers, position, move) in reader:
+        if not games or games[-1][0] != headers['Event']:
+            games.append((headers['Event'], []))
+        games[-1][1].append(move_to_san(position, move))
+    return [(event, ' '.join(moves)) for (event, moves) in games]
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 5, 7, 13, 64, 1 << 20])
+def test_reader_gives_the_same_moves_at_any_chunk_size(chunk_size):
+    reader = PGNReader(io.BytesIO(ARCHIVE), chunk_size=chunk_size)
+    assert _read(reader) == EXPECTED
+    assert reader.games == 4
+    assert reader.errors == 1
+
+def test_results_are_tokenized_across_chunks():
+    for chunk_size in range(1, 12):
+        reader = PGNReader(io.BytesIO(b'1. e4 1/2-1/2 1. d4 0-1 1. c4 1-0'), chunk_size=chunk_size)
+        assert [token for token in reader.tokens() if token[0] == 'result'] == [
+            ('result', '1/2-1/2'), ('result', '0-1'), ('result', '1-0')]
+
+def test_tags():
+    reader = PGNReader(io.BytesIO(ARCHIVE))
+    (headers, _, _) = next(iter(reader))
+    assert headers == {'Event': 'Opera game', 'Site': 'Paris',
+                       'White': 'Morphy, "Paul"', 'Result': '1-0'}
+
+def test_strict_reader_raises_on_a_bad_move():
+    with pytest.raises(PGNError):
+        list(PGNReader(io.BytesIO(ARCHIVE), strict=True))
+
+@pytest.mark.parametrize('fen', [
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+    "1k6/8/8/8/8/8/8/R3K2R w KQ - 0 1",
+    "7k/8/8/2N1N3/8/2N1N3/8/K7 w - - 0 1",
+])
+def test_san_round_trip(fen):
+    position = position_from_fen(fen)
+    moves = generate_movesets(position)
+    for move in moves:
+        assert parse_san(position, move_to_san(position, move, moves), moves) == move
+    assert position_to_fen(position) == fen
+
+def test_split_archive_ranges_cover_every_game(tmp_path):
+    path = tmp_path / 'games.pgn'
+    path.write_bytes(ARCHIVE * 5)
+    ranges = split_archive(str(path), 4, chunk_size=16)
+    assert len(ranges) == 4
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(ARCHIVE) * 5
+    games = []
+    for (start, end) in ranges:
+        games += _read(PGNReader(str(path), start=start, end=end, chunk_size=16))
+    assert games == EXPECTED * 5
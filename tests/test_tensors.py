@@ -0,0 +1,104 @@
+import random
+
+import numpy as np
+import pytest
+
+from board import generate_movesets
+from bitboard import starting_position
+from fen import position_from_fen, position_to_fen
+from shards import ShardDataset, ShardWriter
+from tensors import PACKED_SIZE, encode_positions, pack_positions, unpack_planes, unpack_positions
+
+FENS = [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3",
+    "rnbqkbnr/pppp1ppp/8/8/3Pp3/8/PPP1PPPP/RNBQKBNR b Kq d3 0 3",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 37 60",
+]
+
+
+def _random_positions(count, seed=0):
+    """
+    Positions of random games, from the start and from the FENs above
+    """
+    rng = random.Random(seed)
+    positions = [position_from_fen(fen) for fen in FENS]
+    position = starting_position()
+    while len(positions) < count:
+        moves = generate_movesets(position)
+        if not moves or position.halfmove_clock >= 100:
+            position = starting_position()
+            continue
+        position.make_move(rng.choice(moves))
+        positions.append(position.copy())
+    return positions
+
+def test_positions_round_trip():
+    positions = _random_positions(300)
+    packed = pack_positions(positions)
+    assert packed.shape == (len(positions), PACKED_SIZE)
+    assert packed.dtype == np.dtype('<u8')
+
+    for (unpacked, position) in zip(unpack_positions(packed), positions):
+        assert position_to_fen(unpacked) == position_to_fen(position)
+        assert unpacked.key == position.key
+        assert generate_movesets(unpacked) == generate_movesets(position)
+
+@pytest.mark.parametrize('dtype', [np.float32, np.uint8])
+def test_planes_match_encoding(dtype):
+    positions = _random_positions(300)
+    assert any(position.en_passant is not None for position in positions)
+    planes = unpack_planes(pack_positions(positions), dtype=dtype)
+    assert planes.dtype == np.dtype(dtype)
+    np.testing.assert_array_equal(planes, encode_positions(positions, dtype=dtype))
+
+def test_empty_batch():
+    packed = pack_positions([])
+    assert packed.shape == (0, PACKED_SIZE)
+    assert unpack_planes(packed).shape[0] == 0
+    assert unpack_positions(packed) == []
+
+@pytest.mark.parametrize('packed', [False, True])
+def test_shards_round_trip(tmp_path, packed):
+    positions = _random_positions(250)
+    directory = str(tmp_path / 'shards')
+    with ShardWriter(directory, shard_size=64, shuffle=None, packed=packed) as writer:
+        for (i, position) in enumerate(positions):
+            writer.add(position, i, 1)
+
+    dataset = ShardDataset(directory)
+    assert dataset.packed == packed
+    assert len(dataset) == len(positions)
+
+    # Unshuffled, the batches come in the order the samples were added
+    planes = []
+    moves = []
+    for (batch_planes, batch_moves, batch_values) in dataset.batches(16, shuffle=False):
+        planes.append(batch_planes)
+        moves.extend(batch_moves.tolist())
+    assert moves == list(range(len(positions)))
+    np.testing.assert_array_equal(np.concatenate(planes), encode_positions(positions))
+
+def test_shuffled_shards_hold_every_sample(tmp_path):
+    positions = _random_positions(250)
+    directory = str(tmp_path / 'shards')
+    with ShardWriter(directory, shard_size=64, shuffle=32, seed=1, packed=True) as writer:
+        for (i, position) in enumerate(positions):
+            writer.add(position, i, 1 if i % 2 else -1)
+
+    dataset = ShardDataset(directory)
+    seen = {}
+    for (planes, moves, values) in dataset.batches(10, rng=np.random.default_rng(0)):
+        for (plane, move, value) in zip(planes, moves.tolist(), values.tolist()):
+            seen[move] = (plane, value)
+    assert sorted(seen) == list(range(len(positions)))
+    assert [move for (_, moves, _) in dataset.batches(len(positions), shuffle=False)
+            for move in moves.tolist()] != list(range(len(positions)))
+
+    expected = encode_positions(positions)
+    for (i, position) in enumerate(positions):
+        (plane, value) = seen[i]
+        np.testing.assert_array_equal(plane, expected[i])
+        # Values are from the point of view of the side to move
+        assert value == (1 if i % 2 else -1) * (1 if position.side else -1)
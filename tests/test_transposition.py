@@ -0,0 +1,70 @@
+from transposition import (
+    BOUND_EXACT,
+    BOUND_LOWER,
+    BOUND_UPPER,
+    TranspositionTable,
+    table_bytes,
+)
+
+
+def _colliding_keys(count):
+    # Keys that all land in bucket 5
+    return [5 | (i << 40) for i in range(1, count + 1)]
+
+def test_store_and_probe_round_trip():
+    table = TranspositionTable(size_mb=1)
+    for (key, depth, score, bound, move) in [
+            (0x123456789ABCDEF0, 7, 35, BOUND_EXACT, 0x0C1C),
+            (0xFEDCBA9876543210, 0, -29990, BOUND_UPPER, 0),
+            (0x0F0F0F0F0F0F0F0F, 255, 29990, BOUND_LOWER, 0x7FFF)]:
+        table.store(key, depth, score, bound, move)
+        assert table.probe(key) == (move, score, depth, bound)
+
+def test_probe_misses_other_keys_in_the_bucket():
+    table = TranspositionTable(size_mb=1)
+    (key, other) = _colliding_keys(2)
+    table.store(key, 3, 10, BOUND_EXACT, 1)
+    assert table.probe(other) is None
+    assert table.stats()['hits'] == 0 and table.stats()['misses'] == 1
+
+def test_torn_entry_is_rejected():
+    table = TranspositionTable(size_mb=1)
+    key = _colliding_keys(1)[0]
+    table.store(key, 4, 100, BOUND_EXACT, 77)
+    slot = (key & table._bucket_mask) << 1
+    # Another writer's data word, next to this entry's key word
+    table.data[slot] ^= 1 << 20
+    assert table.probe(key) is None
+
+def test_depth_preferred_and_always_replace_slots():
+    table = TranspositionTable(size_mb=1)
+    (deep, shallow, newer) = _colliding_keys(3)
+    table.store(deep, 8, 1, BOUND_EXACT, 1)
+    table.store(shallow, 2, 2, BOUND_EXACT, 2)
+    table.store(newer, 3, 3, BOUND_EXACT, 3)
+    assert table.probe(deep) == (1, 1, 8, BOUND_EXACT)
+    assert table.probe(shallow) is None
+    assert table.probe(newer) == (3, 3, 3, BOUND_EXACT)
+
+    # Entries from an older search lose their claim on the preferred slot
+    table.new_search()
+    table.store(shallow, 1, 4, BOUND_UPPER, 4)
+    assert table.probe(deep) is None
+    assert table.probe(shallow) == (4, 4, 1, BOUND_UPPER)
+
+def test_store_without_move_keeps_previous_move():
+    table = TranspositionTable(size_mb=1)
+    table.store(42, 5, 10, BOUND_LOWER, 0x0A0B)
+    table.store(42, 6, -10, BOUND_UPPER)
+    assert table.probe(42) == (0x0A0B, -10, 6, BOUND_UPPER)
+
+def test_tables_sharing_a_buffer_see_each_others_entries():
+    buffer = bytearray(table_bytes(1))
+    writer = TranspositionTable(size_mb=1, buffer=buffer)
+    reader = TranspositionTable(size_mb=1, buffer=buffer)
+    writer.store(0xABCDEF, 9, -250, BOUND_EXACT, 0x1234)
+    assert reader.probe(0xABCDEF) == (0x1234, -250, 9, BOUND_EXACT)
+    reader.clear()
+    assert writer.probe(0xABCDEF) is None
+    writer.release()
+    reader.release()
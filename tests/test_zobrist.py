@@ -0,0 +1,70 @@
+import pytest
+
+from bitboard import encode_move
+from chess_board import Board
+from fen import parse_square, position_from_fen
+
+START = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+
+def _coords(name):
+    (row, col) = divmod(parse_square(name), 8)
+    return (col, row)
+
+def _play_board(board, moves):
+    for (from_name, to_name) in moves:
+        turn = 'white' if board.player_flag == 0 else 'black'
+        move = (_square(board, from_name), _coords(to_name), None)
+        assert move in board.present_movesets(turn)
+        board.make_move(move)
+    return board
+
+def _play_position(position, moves):
+    for (from_name, to_name) in moves:
+        position.make_move(encode_move(parse_square(from_name), parse_square(to_name)))
+    return position
+
+# The same position reached by two move orders: in the first the last move
+# is a double push no pawn can capture en-passant
+_ORDERS = [
+    ([('g1', 'f3'), ('g8', 'f6'), ('e2', 'e4')],
+     [('e2', 'e4'), ('g8', 'f6'), ('g1', 'f3'), ('f6', 'g8'), ('f3', 'g1'), ('g8', 'f6'), ('g1', 'f3')]),
+]
+
+@pytest.mark.parametrize('first, second', _ORDERS)
+def test_board_transposition_keys(first, second):
+    board_a = _play_board(Board.from_fen(START), first)
+    board_b = _play_board(Board.from_fen(START), second)
+    assert board_a.en_passant is not None and board_b.en_passant is None
+    assert board_a.key == board_b.key
+    assert board_a.key == board_a.compute_key()
+
+@pytest.mark.parametrize('first, second', _ORDERS)
+def test_position_transposition_keys(first, second):
+    position_a = _play_position(position_from_fen(START), first)
+    position_b = _play_position(position_from_fen(START), second)
+    assert position_a.key == position_b.key
+
+def _square(board, name):
+    (x, y) = _coords(name)
+    return board.squares[x + 8 * y]
+
+def test_capturable_en_passant_is_hashed():
+    # The pawn on d4 can take the e-pawn en-passant after the double push
+    fen = "rnbqkbnr/ppp1pppp/8/8/3p4/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+    board_a = _play_board(Board.from_fen(fen), [('g1', 'f3'), ('g8', 'f6'), ('e2', 'e4')])
+    board_b = _play_board(Board.from_fen(fen), [('e2', 'e4'), ('g8', 'f6'), ('g1', 'f3')])
+    assert board_a.to_fen().split()[:3] == board_b.to_fen().split()[:3]
+    assert board_a.key != board_b.key
+    assert board_a.key == board_a.compute_key()
+
+    undo = board_a.make_move((_square(board_a, 'd4'), _coords('e3'), None))
+    assert board_a.key == board_a.compute_key()
+    board_a.unmake_move(undo)
+    assert board_a.key == board_a.compute_key()
+
+def test_board_keys_after_from_fen():
+    # An en-passant square nobody can capture on doesn't change the key
+    board_a = Board.from_fen("rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1")
+    board_b = Board.from_fen("rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1")
+    assert board_a.key == board_b.key